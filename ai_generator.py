@@ -2,153 +2,46 @@
 """
 Gemini AI yordamida SEO-optimallashtirilgan kontent generatsiya qilish moduli.
 TrendoAI uchun moslashtirilgan.
-Zaxira API kalit va model bilan fallback qo'llab-quvvatlash.
+Chaqiruvlar ai_router orqali: har bir generatorning vazifa profili (model,
+max_output_tokens, temperature, timeout), slotlar — gemini_pool.
+JSON qaytaruvchi generatorlar ai_router.generate_json() orqali (structured_output sxemalari).
 """
-import os
-import json
-import re
-import time
-import google.generativeai as genai
 from datetime import datetime
-from config import GEMINI_API_KEY, GEMINI_MODEL, GEMINI_MODEL_BACKUP, AI_RETRY_ATTEMPTS, AI_RETRY_DELAY
+from ai_router import ai_router
+from gemini_pool import gemini_pool
 
-# Zaxira API kalit
-GEMINI_API_KEY2 = os.getenv("GEMINI_API_KEY2")
 
-# Hozirgi faol API kalit va model
-current_api_key = GEMINI_API_KEY
-current_model_name = GEMINI_MODEL
-
-def _configure_api(api_key):
-    """API kalitni sozlash"""
-    global current_api_key
-    if api_key:
-        genai.configure(api_key=api_key)
-        current_api_key = api_key
-        return True
-    return False
-
-def _switch_to_backup():
-    """Zaxira API kalitga yoki modelga o'tish"""
-    global current_api_key, current_model_name, model
-    
-    # Avval zaxira modelga o'tish
-    if current_model_name != GEMINI_MODEL_BACKUP:
-        print(f"🔄 Zaxira modelga o'tilmoqda: {GEMINI_MODEL_BACKUP}...")
-        current_model_name = GEMINI_MODEL_BACKUP
-        model = genai.GenerativeModel(current_model_name)
-        return True
-    
-    # Keyin zaxira API kalitga o'tish
-    if GEMINI_API_KEY2 and current_api_key != GEMINI_API_KEY2:
-        print("🔄 Zaxira API kalitga o'tilmoqda (GEMINI_API_KEY2)...")
-        _configure_api(GEMINI_API_KEY2)
-        current_model_name = GEMINI_MODEL  # Asosiy model bilan
-        model = genai.GenerativeModel(current_model_name)
-        return True
-    
-    return False
-
-# Dastlabki API kalitni sozlash
-_configure_api(GEMINI_API_KEY)
-
-# Modelni yaratish
-# Note: Google Search grounding requires specific API setup
-model = genai.GenerativeModel(GEMINI_MODEL)
-
-
-
-def _retry_with_backoff(func, *args, **kwargs):
-    """
-    Funksiyani retry mehanizmi bilan ishga tushiradi.
-    Exponential backoff: 2s, 4s, 8s
-    Agar barcha urinishlar muvaffaqiyatsiz bo'lsa, zaxira model/API kalitga o'tadi.
-    """
-    global model
-    last_exception = None
-    
-    for attempt in range(AI_RETRY_ATTEMPTS):
-        try:
-            return func(*args, **kwargs)
-        except Exception as e:
-            last_exception = e
-            wait_time = AI_RETRY_DELAY * (2 ** attempt)
-            print(f"🔄 AI xatolik (urinish {attempt + 1}/{AI_RETRY_ATTEMPTS}): {e}")
-            print(f"⏳ {wait_time} soniya kutilmoqda...")
-            time.sleep(wait_time)
-    
-    # Asosiy model/kalit bilan muvaffaqiyatsiz - zaxiraga o'tish
-    if _switch_to_backup():
-        print("🔄 Zaxira sozlama bilan qayta urinilmoqda...")
-        
-        for attempt in range(AI_RETRY_ATTEMPTS):
-            try:
-                return func(*args, **kwargs)
-            except Exception as e:
-                last_exception = e
-                wait_time = AI_RETRY_DELAY * (2 ** attempt)
-                print(f"🔄 Zaxira sozlama xatolik (urinish {attempt + 1}/{AI_RETRY_ATTEMPTS}): {e}")
-                time.sleep(wait_time)
-        
-        # Yana bir urinish - ikkinchi zaxira variantga o'tish
-        if _switch_to_backup():
-            print("🔄 Ikkinchi zaxira sozlama bilan urinilmoqda...")
-            for attempt in range(AI_RETRY_ATTEMPTS):
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    last_exception = e
-                    time.sleep(AI_RETRY_DELAY)
-    
-    print(f"❌ Barcha urinishlar muvaffaqiyatsiz. Oxirgi xato: {last_exception}")
-    return None
-
-
-def _parse_json_response(response_text):
+def quota_backoff_remaining():
     """
-    AI javobidan JSON ni xavfsiz ajratib olish.
-    ```json ... ``` bloklarini tozalaydi.
+    Barcha Gemini slotlari o'chirilgan (kvota/xatolar) bo'lsa tiklanguncha soniyalar, aks holda 0.
+    Kvota bloklari bazadan o'qiladi — boshqa web/worker jarayonida ko'rilgan 429 ham hisobga olinadi.
     """
-    cleaned = response_text.strip()
-    
-    # JSON blokni tozalash
-    if cleaned.startswith("```json"):
-        cleaned = cleaned[7:]
-    elif cleaned.startswith("```"):
-        cleaned = cleaned[3:]
-    
-    if cleaned.endswith("```"):
-        cleaned = cleaned[:-3]
-    
-    cleaned = cleaned.strip()
-    
-    try:
-        return json.loads(cleaned)
-    except json.JSONDecodeError as e:
-        print(f"⚠️ JSON parse xatosi: {e}")
-        # Regex orqali urinib ko'rish
-        try:
-            match = re.search(r"\{.*\}", response_text, re.DOTALL)
-            if match:
-                return json.loads(match.group(0))
-        except:
-            pass
-            
-        print(f"📄 Raw javob: {cleaned[:200]}...")
-        return None
+    return gemini_pool.blocked_remaining()
 
 
-def generate_post_for_seo(topic):
+def generate_post_for_seo(topic, avoid_titles=()):
     """
     Berilgan mavzu bo'yicha SEO'ga moslashtirilgan maqola generatsiya qiladi.
     
     Args:
         topic: Maqola mavzusi
+        avoid_titles: Shu mavzuda allaqachon bor maqolalar sarlavhalari — yangi maqola
+            ularni takrorlamasligi, boshqa jihatdan yozilishi uchun
         
     Returns:
         dict: {"title": str, "keywords": str, "content": str} yoki None
     """
     current_date_str = datetime.now().strftime("%Y-yil %B")
+    avoid_block = ""
+    if avoid_titles:
+        listed = "\n".join(f'    - {title}' for title in avoid_titles)
+        avoid_block = f"""
+    === TAKRORLAMANG ===
+    Bu mavzuda quyidagi maqolalar allaqachon chop etilgan:
+{listed}
+    Ularning yondashuvi, tuzilishi va misollarini takrorlamang — mavzuni boshqa
+    burchakdan yoriting (boshqa auditoriya, boshqa muammo yoki amaliy holat).
+"""
     
     prompt = f"""
     Siz TrendoAI uchun professional SEO-maqola yozuvchi ekspertisiz.
@@ -170,6 +63,7 @@ def generate_post_for_seo(topic):
     
     === VAZIFA ===
     "{topic}" mavzusida professional maqola yozing.
+    {avoid_block}
 
     
     === SEO TALABLARI (Google/Yandex uchun - JUDA MUHIM!) ===
@@ -218,13 +112,9 @@ def generate_post_for_seo(topic):
 
 
     
-    def _generate():
-        response = model.generate_content(prompt)
-        return _parse_json_response(response.text)
+    result = ai_router.generate_json('seo_post', prompt)
     
-    result = _retry_with_backoff(_generate)
-    
-    if result and all(k in result for k in ['title', 'keywords', 'content']):
+    if result:
         return result
     
     print("⚠️ AI javobi noto'g'ri formatda")
@@ -257,12 +147,8 @@ def generate_marketing_post_for_telegram():
     Faqat post matnini yozing.
     """
     
-    def _generate():
-        response = model.generate_content(prompt)
-        return response.text.strip()
-    
-    result = _retry_with_backoff(_generate)
-    return result
+    result = ai_router.generate('marketing', prompt)
+    return result.strip() if result else None
 
 
 def generate_custom_content(prompt_text):
@@ -275,11 +161,8 @@ def generate_custom_content(prompt_text):
     Returns:
         str: Generatsiya qilingan matn yoki None
     """
-    def _generate():
-        response = model.generate_content(prompt_text)
-        return response.text.strip()
-    
-    return _retry_with_backoff(_generate)
+    result = ai_router.generate('custom', prompt_text)
+    return result.strip() if result else None
 
 
 def generate_portfolio_content(title, category):
@@ -325,11 +208,7 @@ def generate_portfolio_content(title, category):
     Faqat JSON qaytaring!
     """
     
-    def _generate():
-        response = model.generate_content(prompt)
-        return _parse_json_response(response.text)
-    
-    result = _retry_with_backoff(_generate)
+    result = ai_router.generate_json('portfolio', prompt, priority='admin')
     
     if result:
         return result
@@ -0,0 +1,214 @@
+# ai_governor.py
+"""
+Barcha AI chaqiruvlari uchun umumiy yuklama boshqaruvchisi.
+- Ustuvorlik sinflari: chat (interaktiv) → admin → background (scheduler, partiya)
+- Jarayon bo'yicha umumiy chegara (AI_MAX_CONCURRENCY) va sinf chegaralari
+  (AI_CLASS_CONCURRENCY); AI_CHAT_RESERVED joy faqat chat uchun — admin va fon
+  chaqiruvlari barcha joylarni egallay olmaydi
+- Har bir sinfning cheklangan navbati (AI_QUEUE_LIMITS) va navbatda kutish
+  muddati (AI_QUEUE_DEADLINES)
+- Navbat to'la yoki kutish muddatidan oshishi kutilsa — darhol AIOverloaded
+  (retry_after bilan); interaktiv endpoint'lar 503 + Retry-After qaytaradi
+"""
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from config import (
+    AI_MAX_CONCURRENCY, AI_CLASS_CONCURRENCY, AI_CHAT_RESERVED, AI_QUEUE_LIMITS, AI_QUEUE_DEADLINES
+)
+
+# Ustuvorlik tartibida
+PRIORITIES = ('chat', 'admin', 'background')
+
+# O'lchov bo'lmaguncha taxminiy bitta chaqiruv vaqti (soniya)
+_DEFAULT_SERVICE_TIME = 5.0
+_EWMA_ALPHA = 0.2
+
+
+class AIOverloaded(RuntimeError):
+    """AI chaqiruvi navbatga sig'madi yoki kutish muddati o'tdi"""
+
+    def __init__(self, priority, retry_after, reason):
+        super().__init__(f"AI band ({priority}): {reason}, {retry_after}s dan keyin urinib ko'ring")
+        self.priority = priority
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class ClassStats:
+    """Bitta ustuvorlik sinfi statistikasi"""
+
+    def __init__(self):
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait = 0.0
+        self.service = 0.0
+
+    def to_dict(self):
+        return {
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+            'avg_wait_ms': round(self.wait * 1000, 1),
+            'avg_service_ms': round(self.service * 1000, 1),
+        }
+
+
+class AIGovernor:
+    """Ustuvorlikli semafor: bo'shagan joy eng yuqori sinfdagi birinchi kutuvchiga beriladi"""
+
+    def __init__(self, concurrency=AI_MAX_CONCURRENCY, class_limits=AI_CLASS_CONCURRENCY,
+                 queue_limits=AI_QUEUE_LIMITS, deadlines=AI_QUEUE_DEADLINES, chat_reserved=AI_CHAT_RESERVED):
+        self.concurrency = concurrency
+        self.class_limits = {p: min(concurrency, class_limits.get(p, concurrency)) for p in PRIORITIES}
+        # Kamida bitta joy chat'dan boshqa sinflarga ham qoladi
+        self.chat_reserved = max(0, min(chat_reserved, concurrency - 1))
+        self.queue_limits = {p: queue_limits.get(p, 0) for p in PRIORITIES}
+        self.deadlines = {p: deadlines.get(p, 60) for p in PRIORITIES}
+        self._cond = threading.Condition()
+        self._running = {p: 0 for p in PRIORITIES}
+        self._started = {p: [] for p in PRIORITIES}   # ishlayotgan chaqiruvlar boshlangan vaqtlar
+        self._queues = {p: deque() for p in PRIORITIES}
+        self._stats = {p: ClassStats() for p in PRIORITIES}
+
+    # ---------- Navbat ----------
+
+    def _non_chat_running(self):
+        return sum(self._running[p] for p in PRIORITIES if p != 'chat')
+
+    def _can_run(self, priority):
+        if sum(self._running.values()) >= self.concurrency:
+            return False
+        if self._running[priority] >= self.class_limits[priority]:
+            return False
+        return priority == 'chat' or self._non_chat_running() < self.concurrency - self.chat_reserved
+
+    def _time_to_free(self, priority):
+        """
+        Shu sinf uchun joy bo'shashigacha taxminiy vaqt: to'sib turgan ishlayotgan
+        chaqiruvlarning eng tez tugaydiganigacha (sinf o'rtacha vaqti - o'tgan vaqt)
+        """
+        if self._can_run(priority):
+            return 0.0
+        if self._running[priority] >= self.class_limits[priority]:
+            blocking = (priority,)
+        elif priority != 'chat' and self._non_chat_running() >= self.concurrency - self.chat_reserved:
+            blocking = tuple(p for p in PRIORITIES if p != 'chat')
+        else:
+            blocking = PRIORITIES
+        now = time.monotonic()
+        remaining = [max(0.0, self._service_time(p) - (now - started))
+                     for p in blocking for started in self._started[p]]
+        return min(remaining, default=0.0)
+
+    def _head(self):
+        """Hozir ishga tushishi mumkin bo'lgan eng ustuvor kutuvchi"""
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            if queue and self._can_run(priority):
+                return queue[0]
+        return None
+
+    def _service_time(self, priority):
+        """Sinfning o'rtacha chaqiruv vaqti (o'lchov bo'lmaguncha _DEFAULT_SERVICE_TIME)"""
+        return self._stats[priority].service or _DEFAULT_SERVICE_TIME
+
+    def _estimate_wait(self, priority):
+        """
+        Taxminiy kutish: joy bo'shashigacha qolgan vaqt (ishlayotgan chaqiruvlar bo'yicha)
+        va oldindagi (shu va yuqori sinf) kutuvchilar — har biri o'z sinfi vaqti bilan.
+        Navbatdagi uzun fon generatsiyalari chat bahosini oshirmaydi; barcha joyni
+        egallab turgan chaqiruvlar esa hisobga olinadi.
+        """
+        rank = PRIORITIES.index(priority)
+        ahead = sum(len(self._queues[p]) * self._service_time(p) for p in PRIORITIES[:rank + 1])
+        if not ahead and self._can_run(priority):
+            return 0.0
+        slots = max(1, self.class_limits[priority])
+        return self._time_to_free(priority) + ahead / slots
+
+    def _reject(self, priority, retry_after, reason):
+        self._stats[priority].rejected += 1
+        raise AIOverloaded(priority, max(1, math.ceil(retry_after)), reason)
+
+    def acquire(self, priority='background'):
+        """
+        Navbat kelguncha kutish; sig'masa yoki muddat o'tsa AIOverloaded.
+        Qaytaradi: chaqiruv boshlangan vaqt (release'ga beriladi)
+        """
+        if priority not in self._queues:
+            raise ValueError(f"Noma'lum ustuvorlik: {priority}")
+        deadline = self.deadlines[priority]
+        started = time.monotonic()
+        with self._cond:
+            if len(self._queues[priority]) >= self.queue_limits[priority]:
+                self._reject(priority, self._estimate_wait(priority), "navbat to'la")
+            estimate = self._estimate_wait(priority)
+            if estimate > deadline:
+                # Baribir muddatida xizmat qilinmaydi — kuttirmasdan darhol rad etamiz
+                self._reject(priority, estimate, "kutish muddati yetmaydi")
+
+            waiter = object()
+            self._queues[priority].append(waiter)
+            while self._head() is not waiter:
+                remaining = started + deadline - time.monotonic()
+                if remaining <= 0:
+                    self._queues[priority].remove(waiter)
+                    self._stats[priority].timed_out += 1
+                    self._cond.notify_all()
+                    self._reject(priority, self._estimate_wait(priority), "kutish muddati o'tdi")
+                self._cond.wait(remaining)
+
+            self._queues[priority].popleft()
+            self._running[priority] += 1
+            admitted = time.monotonic()
+            self._started[priority].append(admitted)
+            stats = self._stats[priority]
+            stats.admitted += 1
+            stats.wait += _EWMA_ALPHA * (admitted - started - stats.wait)
+            # Bir nechta joy bo'shagan bo'lishi mumkin — keyingi kutuvchi ham tekshirsin
+            self._cond.notify_all()
+            return admitted
+
+    def release(self, priority, elapsed, started=None):
+        with self._cond:
+            self._running[priority] -= 1
+            running = self._started[priority]
+            running.remove(started if started in running else running[0])
+            stats = self._stats[priority]
+            stats.service = stats.service + _EWMA_ALPHA * (elapsed - stats.service) if stats.service else elapsed
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority='background'):
+        """with ai_governor.slot('chat'): ... — AI chaqiruvi uchun joy"""
+        started = self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release(priority, time.monotonic() - started, started)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'concurrency': self.concurrency,
+                'chat_reserved': self.chat_reserved,
+                'running': sum(self._running.values()),
+                'classes': {
+                    p: dict(
+                        self._stats[p].to_dict(),
+                        running=self._running[p],
+                        queued=len(self._queues[p]),
+                        limit=self.class_limits[p],
+                        queue_limit=self.queue_limits[p],
+                        deadline=self.deadlines[p],
+                    )
+                    for p in PRIORITIES
+                },
+            }
+
+
+ai_governor = AIGovernor()
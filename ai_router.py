@@ -0,0 +1,428 @@
+# ai_router.py
+"""
+Vazifa turiga qarab model tanlash (AI_TASK_PROFILES).
+- Har bir generator o'z profili bilan chaqiriladi: mos modellar, max_output_tokens,
+  temperature, timeout va kechikish maqsadi (latency_target)
+- (vazifa, model) bo'yicha oxirgi o'lchovlar: p50/p95 kechikish, token sarfi, xarajat
+- Tanlov: p95 maqsadga sig'adigan (yoki hali o'lchanmagan) eng arzon model birinchi,
+  keyin qolganlari, oxirida fallback modellar; slot tanlashni gemini_pool bajaradi
+- Hedging (generate(..., hedge=True)): asosiy so'rov o'z p95 vaqtida tugamasa, boshqa
+  slotga ikkinchi so'rov; birinchi javob g'olib, ikkinchisi bekor qilinadi. Hedge'lar
+  soni AI_HEDGE_BUDGET ulushi bilan cheklangan
+- generate_json(): response_mime_type="application/json" + vazifa sxemasi
+  (structured_output.SCHEMAS); buzilgan javob avval mahalliy, keyin arzon model
+  bilan tuzatiladi, faqat shundan keyin qayta generatsiya (AI_JSON_REGENERATIONS);
+  max_output_tokens'da uzilgan javob tuzatilmaydi — darhol qayta generatsiya
+"""
+import threading
+import time
+from collections import deque
+from config import (
+    AI_TASK_PROFILES, AI_MODEL_PRICES, AI_ROUTER_MIN_SAMPLES, GEMINI_SLOT_WAIT,
+    AI_HEDGE_ENABLED, AI_HEDGE_BUDGET, AI_HEDGE_BURST, AI_HEDGE_MIN_DELAY, AI_JSON_REGENERATIONS
+)
+from ai_governor import AIOverloaded
+from gemini_pool import gemini_pool
+from structured_output import schema_for, extract_json, validate, json_stats
+
+# Percentil hisoblash uchun saqlanadigan oxirgi o'lchovlar
+_LATENCY_WINDOW = 200
+
+
+def _finish_reason(response):
+    """Birinchi nomzodning tugash sababi nomi ('STOP', 'MAX_TOKENS', ...) yoki None"""
+    candidates = getattr(response, 'candidates', None)
+    if not candidates:
+        return None
+    reason = candidates[0].finish_reason
+    return getattr(reason, 'name', reason)
+
+
+class TaskProfile:
+    """Bitta vazifa turi uchun model va generatsiya sozlamalari"""
+
+    def __init__(self, name, models, fallback=(), max_output_tokens=None, temperature=None,
+                 timeout=None, latency_target=None):
+        self.name = name
+        self.models = list(models)
+        self.fallback = [model for model in fallback if model not in self.models]
+        self.max_output_tokens = max_output_tokens
+        self.temperature = temperature
+        self.timeout = timeout
+        self.latency_target = latency_target
+
+    def generation_config(self):
+        config = {}
+        if self.max_output_tokens is not None:
+            config['max_output_tokens'] = self.max_output_tokens
+        if self.temperature is not None:
+            config['temperature'] = self.temperature
+        return config
+
+    def request_options(self):
+        return {'timeout': self.timeout} if self.timeout else None
+
+    def to_dict(self):
+        return {
+            'models': self.models,
+            'fallback': self.fallback,
+            'max_output_tokens': self.max_output_tokens,
+            'temperature': self.temperature,
+            'timeout': self.timeout,
+            'latency_target': self.latency_target,
+        }
+
+
+class ModelStats:
+    """(vazifa, model) juftligi bo'yicha kechikish va token sarfi"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.max_tokens = 0     # max_output_tokens chegarasida uzilgan javoblar
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.recent = deque(maxlen=_LATENCY_WINDOW)
+
+    def record(self, seconds, usage, ok, truncated=False):
+        self.calls += 1
+        if truncated:
+            self.max_tokens += 1
+        if not ok:
+            self.errors += 1
+            return
+        self.recent.append(seconds)
+        if usage is not None:
+            prompt = getattr(usage, 'prompt_token_count', 0) or 0
+            total = getattr(usage, 'total_token_count', 0) or 0
+            self.prompt_tokens += prompt
+            # Chiqish = jami - kirish (2.5 modellarda "thinking" tokenlari ham chiqish narxida)
+            self.output_tokens += max(0, total - prompt) or (getattr(usage, 'candidates_token_count', 0) or 0)
+
+    def percentile(self, q):
+        recent = sorted(self.recent)
+        if not recent:
+            return None
+        return recent[min(len(recent) - 1, int(len(recent) * q))]
+
+    def to_dict(self, price):
+        succeeded = self.calls - self.errors
+        p50, p95 = self.percentile(0.5), self.percentile(0.95)
+        cost = None
+        if price is not None:
+            cost = round(self.prompt_tokens / 1e6 * price[0] + self.output_tokens / 1e6 * price[1], 4)
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'max_tokens': self.max_tokens,
+            'p50_ms': round(p50 * 1000, 1) if p50 is not None else None,
+            'p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+            'prompt_tokens': self.prompt_tokens,
+            'output_tokens': self.output_tokens,
+            'avg_output_tokens': round(self.output_tokens / succeeded) if succeeded else 0,
+            'cost_usd': cost,
+        }
+
+
+class HedgeBudget:
+    """Har bir hedge qilinadigan so'rov `ratio` kredit qo'shadi, har bir hedge 1 kredit sarflaydi"""
+
+    def __init__(self, ratio=AI_HEDGE_BUDGET, burst=AI_HEDGE_BURST):
+        self.ratio = ratio
+        self.burst = burst
+        self._credits = float(burst)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedges = 0
+        self.denied = 0
+        self.wins = 0
+
+    def on_request(self):
+        with self._lock:
+            self.requests += 1
+            self._credits = min(self.burst, self._credits + self.ratio)
+
+    def try_spend(self):
+        with self._lock:
+            if self._credits >= 1:
+                self._credits -= 1
+                self.hedges += 1
+                return True
+            self.denied += 1
+            return False
+
+    def record_win(self):
+        with self._lock:
+            self.wins += 1
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'hedges': self.hedges,
+                'hedge_wins': self.wins,
+                'denied_by_budget': self.denied,
+                'credits': round(self._credits, 2),
+            }
+
+
+class _Race:
+    """Asosiy va hedge so'rovlari poygasi: birinchi muvaffaqiyatli javob g'olib"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.cancel = threading.Event()
+        self.result = None
+        self.winner = None
+        self.error = None
+        self.used = []       # asosiy so'rov ishlatgan slotlar
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def start(self, target, name, *args):
+        with self._lock:
+            self._pending += 1
+        threading.Thread(target=self._run, args=(target, name) + args,
+                         name=f'ai-hedge-{name}', daemon=True).start()
+
+    def _run(self, target, name, *args):
+        result, error = None, None
+        try:
+            result = target(*args)
+        except Exception as e:
+            error = e
+        with self._lock:
+            self._pending -= 1
+            if result is not None and self.result is None:
+                self.result, self.winner = result, name
+                # Yutqazgan so'rov yangi urinish boshlamaydi, javobi tashlab yuboriladi
+                self.cancel.set()
+                self.done.set()
+            elif name == 'primary' and error is not None:
+                self.error = error
+            if self._pending == 0:
+                self.done.set()
+
+
+class ModelRouter:
+    """Profillar bo'yicha model tanlash va o'lchovlarni yig'ish"""
+
+    def __init__(self, profiles=AI_TASK_PROFILES, prices=AI_MODEL_PRICES, min_samples=AI_ROUTER_MIN_SAMPLES):
+        self.profiles = {name: TaskProfile(name, **options) for name, options in profiles.items()}
+        self.prices = dict(prices)
+        self.min_samples = min_samples
+        self._stats = {}
+        self._lock = threading.Lock()
+        self.hedge_budget = HedgeBudget()
+
+    def profile(self, task):
+        try:
+            return self.profiles[task]
+        except KeyError:
+            raise ValueError(f"Noma'lum AI vazifasi: {task}") from None
+
+    def _output_price(self, model):
+        price = self.prices.get(model)
+        # Narxi noma'lum model eng qimmat hisoblanadi
+        return price[1] if price else float('inf')
+
+    def p95(self, task, model):
+        """Yetarli o'lchov bo'lsa (vazifa, model) p95 kechikishi (soniya), aks holda None"""
+        with self._lock:
+            stats = self._stats.get((task, model))
+            if stats is None or len(stats.recent) < self.min_samples:
+                return None
+            return stats.percentile(0.95)
+
+    def route(self, task):
+        """Modellar tartibi: maqsadga sig'adigan eng arzon, qolganlari, keyin fallback"""
+        profile = self.profile(task)
+
+        def key(model):
+            p95 = self.p95(task, model)
+            meets = p95 is None or profile.latency_target is None or p95 <= profile.latency_target
+            return (not meets, self._output_price(model), profile.models.index(model))
+
+        return sorted(profile.models, key=key) + profile.fallback
+
+    def record(self, task, model, seconds, usage=None, ok=True, truncated=False):
+        with self._lock:
+            stats = self._stats.get((task, model))
+            if stats is None:
+                stats = self._stats[(task, model)] = ModelStats()
+            stats.record(seconds, usage, ok, truncated)
+
+    def generate(self, task, contents, priority='background', attempts=None, max_wait=GEMINI_SLOT_WAIT,
+                 hedge=False):
+        """
+        Vazifa profili bilan matn generatsiyasi (gemini_pool + ai_governor orqali).
+        hedge=True — interaktiv so'rovlar uchun kechikish "dumini" qisqartirish (AI_HEDGE_ENABLED).
+
+        Returns:
+            str: javob matni yoki None (barcha urinishlar muvaffaqiyatsiz)
+        """
+        if hedge and AI_HEDGE_ENABLED and len(gemini_pool.slots) > 1:
+            return self._generate_hedged(task, contents, priority, attempts, max_wait)
+        return self._generate(task, contents, priority, attempts, max_wait, self.route(task))
+
+    def _generate(self, task, contents, priority, attempts, max_wait, route, avoid=(), cancel=None, used=None,
+                  extra_config=None, truncated=None):
+        profile = self.profile(task)
+        generation_config = dict(profile.generation_config(), **(extra_config or {}))
+
+        def _run(model):
+            if used is not None:
+                used.append(gemini_pool.label_of(model))
+            name = model.model_name.split('/')[-1]
+            if truncated is not None:
+                # Faqat oxirgi (qaytariladigan) javob hisobga olinadi
+                truncated.clear()
+            started = time.monotonic()
+            cut = False
+            try:
+                response = model.generate_content(
+                    contents,
+                    generation_config=generation_config,
+                    request_options=profile.request_options(),
+                )
+                cut = _finish_reason(response) == 'MAX_TOKENS'
+                if cut:
+                    print(f"✂️ AI javobi ({task}, {name}) max_output_tokens chegarasida uzildi")
+                    if truncated is not None:
+                        truncated.append(name)
+                # MAX_TOKENS + faqat "thinking" bo'lsa response.text ValueError beradi
+                text = response.text
+            except Exception:
+                self.record(task, name, time.monotonic() - started, ok=False, truncated=cut)
+                raise
+            self.record(task, name, time.monotonic() - started, getattr(response, 'usage_metadata', None),
+                        truncated=cut)
+            return text
+
+        return gemini_pool.call(_run, attempts=attempts, max_wait=max_wait, models=route,
+                                priority=priority, avoid=avoid, cancel=cancel)
+
+    def generate_json(self, task, contents, priority='background', attempts=None, max_wait=GEMINI_SLOT_WAIT):
+        """
+        Vazifa sxemasi bo'yicha JSON generatsiya (SCHEMAS[task]).
+        Tartib: to'g'ridan-to'g'ri parse → mahalliy tiklash → model orqali tuzatish →
+        qayta generatsiya. Natija json_stats'ga yoziladi.
+
+        Returns:
+            dict: sxemaga mos javob yoki None
+        """
+        schema = schema_for(task)
+        json_config = {'response_mime_type': 'application/json', 'response_schema': schema}
+
+        for attempt in range(1 + AI_JSON_REGENERATIONS):
+            truncated = []
+            text = self._generate(task, contents, priority, attempts, max_wait, self.route(task),
+                                  extra_config=json_config, truncated=truncated)
+            if text is None:
+                # Model umuman javob bermadi — bu parse xatosi emas
+                return None
+
+            data, outcome = self._parse_json(task, text)
+            if truncated:
+                # Uzilgan javobning yo'qolgan qismini tuzatish tiklay olmaydi: to'liq maydonlar
+                # sxemaga yetarli bo'lmasa — faqat qayta generatsiya
+                json_stats.record_truncated(task)
+            elif data is None:
+                data = self._repair_json(task, text, json_config, priority, attempts, max_wait)
+                outcome = 'model_repaired'
+            if data is not None:
+                json_stats.record(task, 'regenerated' if attempt else outcome)
+                return data
+            print(f"🔁 AI JSON ({task}): tuzatib bo'lmadi, qayta generatsiya ({attempt + 1})")
+
+        json_stats.record(task, 'failed')
+        return None
+
+    @staticmethod
+    def _parse_json(task, text):
+        """Javobni parse qilish va sxema bo'yicha tekshirish: (data, outcome) yoki (None, None)"""
+        try:
+            data, outcome = extract_json(text)
+        except ValueError as e:
+            print(f"⚠️ AI JSON ({task}) parse xatosi: {e}; javob: {text[:200]}...")
+            return None, None
+        missing = validate(task, data)
+        if missing:
+            print(f"⚠️ AI JSON ({task}) maydonlar yetishmaydi: {', '.join(missing)}")
+            return None, None
+        if outcome != 'direct':
+            print(f"🩹 AI JSON ({task}) tiklandi: {outcome}")
+        return data, outcome
+
+    def _repair_json(self, task, text, json_config, priority, attempts, max_wait):
+        """Buzilgan javobni arzon model bilan sxemaga moslab qayta yozdirish"""
+        prompt = (
+            "Quyidagi matn JSON bo'lishi kerak edi, lekin sintaksisi buzilgan. "
+            "Uni berilgan sxemaga mos to'g'ri JSON ga aylantiring. Mazmunni o'zgartirmang, "
+            "qisqartirmang, tarjima qilmang va yangi matn qo'shmang.\n\n"
+            f"{text}"
+        )
+        try:
+            repaired = self._generate('json_repair', prompt, priority, attempts, max_wait,
+                                      self.route('json_repair'), extra_config=json_config)
+        except AIOverloaded:
+            return None
+        if repaired is None:
+            return None
+        return self._parse_json(task, repaired)[0]
+
+    def hedge_delay(self, task, model):
+        """Hedge'gacha kutish: modelning shu vazifadagi p95 i, o'lchov kam bo'lsa latency_target"""
+        p95 = self.p95(task, model)
+        if p95 is None:
+            p95 = self.profile(task).latency_target or GEMINI_SLOT_WAIT
+        return max(AI_HEDGE_MIN_DELAY, p95)
+
+    def _generate_hedged(self, task, contents, priority, attempts, max_wait):
+        route = self.route(task)
+        race = _Race()
+        self.hedge_budget.on_request()
+        race.start(self._generate, 'primary', task, contents, priority, attempts, max_wait,
+                   route, (), race.cancel, race.used)
+
+        if not race.done.wait(self.hedge_delay(task, route[0])) and race.used:
+            if self.hedge_budget.try_spend():
+                # Boshqa slot: zaxira model yoki shu modelning ikkinchi kaliti
+                primary_model = route[0]
+                hedge_route = [model for model in route if model != primary_model] + [primary_model]
+                print(f"🏁 AI hedge ({task}): {race.used[-1]} javobi kechikmoqda, parallel so'rov")
+                race.start(self._hedge_call, 'hedge', task, contents, priority, hedge_route,
+                           tuple(race.used), race.cancel)
+        race.done.wait()
+
+        if race.winner == 'hedge':
+            self.hedge_budget.record_win()
+        if race.result is None and isinstance(race.error, AIOverloaded):
+            raise race.error
+        return race.result
+
+    def _hedge_call(self, task, contents, priority, route, avoid, cancel):
+        try:
+            return self._generate(task, contents, priority, 1, AI_HEDGE_MIN_DELAY, route, avoid, cancel)
+        except AIOverloaded:
+            # Navbat to'la — hedge'siz asosiy javobni kutamiz
+            return None
+
+    def stats(self):
+        """Vazifalar bo'yicha profil, joriy tanlov tartibi va modellar statistikasi"""
+        result = {}
+        for task, profile in self.profiles.items():
+            route = self.route(task)
+            with self._lock:
+                models = {
+                    model: self._stats[(task, model)].to_dict(self.prices.get(model))
+                    for model in route if (task, model) in self._stats
+                }
+            result[task] = {'profile': profile.to_dict(), 'route': route, 'models': models}
+        return result
+
+    def hedge_stats(self):
+        return dict(self.hedge_budget.to_dict(), enabled=AI_HEDGE_ENABLED, budget=AI_HEDGE_BUDGET)
+
+
+ai_router = ModelRouter()
@@ -0,0 +1,168 @@
+# batch_generator.py
+"""
+Partiyaviy post generatsiyasi (yangi kategoriya to'ldirish, yangi deploy'ni boshlash).
+- Partiya ichida mavzular takrorlanmaydi (text_normalizer.unique_topics)
+- Gemini chaqiruvlari umumiy semafor bilan cheklanadi (BATCH_MAX_CONCURRENCY),
+  kalit bo'yicha tezlik chegarasi ai_generator'da (GEMINI_RPM)
+- Mavjud postlarga deyarli bir xil natijalar qayta generatsiya qilinadi yoki rad etiladi
+  (duplicate_index)
+- Natijalar bitta bulk INSERT va bitta commit bilan saqlanadi
+- Telegram/push e'lonlari BATCH_ANNOUNCE_STAGGER oralig'ida navbatga qo'yiladi
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from ai_generator import quota_backoff_remaining
+from config import (
+    BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY, BATCH_ANNOUNCE_STAGGER, CATEGORIES, DUPLICATE_THRESHOLD
+)
+from text_normalizer import unique_topics
+
+# Bir vaqtda ishlayotgan barcha partiyalar uchun umumiy Gemini chegarasi
+_gemini_slots = threading.BoundedSemaphore(BATCH_MAX_CONCURRENCY)
+
+
+def _print_progress(done, total, topic, ok, elapsed):
+    status = "✅" if ok else "❌"
+    print(f"📦 [{done}/{total}] {status} {topic[:60]} ({elapsed:.1f}s)")
+
+
+def _generate_one(topic):
+    """Bitta mavzu: matn (semafor ichida) va rasm. Muvaffaqiyatsiz bo'lsa None"""
+    from image_fetcher import get_image_for_topic, get_fallback_image
+    from scheduler import generate_unique_post
+    # Kvota tugagan bo'lsa, Gemini'ga urinmasdan kutamiz
+    remaining = quota_backoff_remaining()
+    if remaining:
+        print(f"⏳ Gemini kvotasi: {int(remaining)}s kutilmoqda...")
+        time.sleep(remaining)
+    with _gemini_slots:
+        post_data = generate_unique_post(topic)
+    if not post_data:
+        return None
+    try:
+        image_url = get_image_for_topic(topic)
+    except Exception as e:
+        print(f"⚠️ Rasm olishda xato: {e}")
+        image_url = get_fallback_image(topic)
+    return post_data, image_url
+
+
+def _drop_batch_duplicates(results, failed):
+    """Partiya ichidagi o'zaro deyarli bir xil natijalardan faqat birinchisi qoladi"""
+    from duplicate_index import minhash, similarity
+    kept, signatures = [], []
+    for topic, category, (post_data, image_url) in results:
+        signature = minhash(post_data['title'], post_data['content'])
+        if any(similarity(signature, other) >= DUPLICATE_THRESHOLD for other in signatures):
+            print(f"🧬 Partiya ichida dublikat: {topic[:60]}")
+            failed.append(topic)
+            continue
+        signatures.append(signature)
+        kept.append((topic, category, (post_data, image_url)))
+    return kept
+
+
+def _save_batch(results, publish):
+    """Barcha postlarni bitta bulk INSERT va bitta commit bilan saqlash"""
+    from app import app, db, Post, page_cache
+    with app.app_context():
+        posts = []
+        for topic, category, (post_data, image_url) in results:
+            post = Post(
+                title=post_data['title'],
+                content=post_data['content'],
+                topic=topic,
+                category=category,
+                keywords=post_data['keywords'],
+                image_url=image_url,
+                is_published=publish,
+            )
+            post.reading_time = post.calculate_reading_time()
+            post.render_content()
+            posts.append(post)
+        try:
+            db.session.add_all(posts)
+            db.session.flush()
+            for post in posts:
+                post.slug = post.generate_slug()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        if publish:
+            tags = {'posts'} | {f'category:{post.category}' for post in posts}
+            page_cache.invalidate(*tags)
+        # Session yopilgandan keyin e'lon qilish uchun kerakli maydonlar
+        return [{
+            'id': post.id, 'title': post.title, 'category': post.category,
+            'reading_time': post.reading_time, 'image_url': post.image_url,
+        } for post in posts]
+
+
+def _announce_staggered(saved, stagger):
+    """Har bir post e'loni oldingisidan `stagger` soniya keyin"""
+    from types import SimpleNamespace
+    from scheduler import announce_post, notify_post
+    for i, row in enumerate(saved):
+        post = SimpleNamespace(**row)
+        announce_post(post, delay=i * stagger)
+        notify_post(post, delay=i * stagger)
+
+
+def generate_batch(topics, concurrency=BATCH_CONCURRENCY, category=None, publish=True,
+                   announce=True, stagger=BATCH_ANNOUNCE_STAGGER, progress=_print_progress):
+    """
+    Ko'p mavzu bo'yicha postlarni parallel generatsiya qilish.
+
+    topics: mavzular ro'yxati (takrorlari olib tashlanadi)
+    concurrency: shu partiya uchun parallel Gemini chaqiruvlari (umumiy chegaradan oshmaydi)
+    category: barcha postlar uchun kategoriya; None bo'lsa har biriga tasodifiy
+    publish: False bo'lsa postlar qoralama sifatida saqlanadi (e'lon qilinmaydi)
+    progress: progress(done, total, topic, ok, elapsed) — har bir mavzu tugaganda
+
+    Returns:
+        dict: requested, unique, generated, failed (mavzular), post_ids, elapsed
+    """
+    started = time.monotonic()
+    unique = unique_topics(topics)
+    total = len(unique)
+    print(f"📦 Partiya: {total} ta mavzu ({len(topics) - total} ta takror olib tashlandi), "
+          f"parallel: {min(concurrency, BATCH_MAX_CONCURRENCY)}")
+
+    results = []
+    failed = []
+    done = 0
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, total or 1)), thread_name_prefix='batch') as pool:
+        futures = {pool.submit(_generate_one, topic): (topic, time.monotonic()) for topic in unique}
+        for future in as_completed(futures):
+            topic, submitted = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"⚠️ '{topic[:40]}' generatsiyasida xato: {e}")
+                result = None
+            done += 1
+            if result:
+                results.append((topic, category or random.choice(CATEGORIES), result))
+            else:
+                failed.append(topic)
+            if progress:
+                progress(done, total, topic, result is not None, time.monotonic() - submitted)
+
+    results = _drop_batch_duplicates(results, failed)
+    saved = _save_batch(results, publish) if results else []
+    if saved and publish and announce:
+        _announce_staggered(saved, stagger)
+
+    summary = {
+        'requested': len(topics),
+        'unique': total,
+        'generated': len(saved),
+        'failed': failed,
+        'post_ids': [row['id'] for row in saved],
+        'elapsed': round(time.monotonic() - started, 1),
+    }
+    print(f"📦 Partiya tugadi: {summary['generated']}/{total} ta post, {summary['elapsed']}s")
+    return summary
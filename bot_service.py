@@ -1,12 +1,9 @@
 import telebot
-import google.generativeai as genai
-from config import TELEGRAM_BOT_TOKEN, GEMINI_API_KEY, GEMINI_MODEL, SITE_URL
+from config import TELEGRAM_BOT_TOKEN, SITE_URL
 from datetime import datetime
 from flask import request, Blueprint
-
-# Configure Gemini
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel(GEMINI_MODEL)
+from ai_router import ai_router
+from ai_governor import AIOverloaded
 
 # Create bot instance safely
 bot = None
@@ -61,11 +58,16 @@ def get_ai_response(user_message):
         current_date = datetime.now().strftime("%Y-%m-%d")
         dynamic_prompt = f"{SYSTEM_PROMPT}\nBugungi sana: {current_date}"
         
-        chat = model.start_chat(history=[
-            {"role": "user", "parts": [dynamic_prompt]}
-        ])
-        response = chat.send_message(user_message)
-        return response.text
+        contents = [
+            {"role": "user", "parts": [dynamic_prompt]},
+            {"role": "user", "parts": [user_message]},
+        ]
+        answer = ai_router.generate('bot', contents, priority='chat', attempts=2, max_wait=15, hedge=True)
+        if answer is None:
+            raise RuntimeError("Gemini javob bermadi")
+        return answer
+    except AIOverloaded as e:
+        return f"⏳ Hozir so'rovlar ko'p. Iltimos, {e.retry_after} soniyadan so'ng qayta yozing."
     except Exception as e:
         print(f"❌ Gemini AI Error: {e}")
         return "Uzr, hozirda serverda xatolik yuz berdi. Birozdan so'ng urinib ko'ring."
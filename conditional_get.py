@@ -0,0 +1,97 @@
+# conditional_get.py
+"""
+Shartli GET (ETag / Last-Modified / 304 Not Modified).
+Har bir sahifa uchun arzon "validator" funksiyasi faqat vaqt belgilari yoki
+versiya hisoblagichlarini o'qiydi. Brauzer/robot yuborgan If-None-Match yoki
+If-Modified-Since mos kelsa, shablon render qilinmasdan 304 qaytariladi.
+"""
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+from flask import request, session, make_response
+from config import RELEASE_VERSION
+
+
+def make_etag(*parts):
+    """Qismlardan qisqa, barqaror ETag qiymati (shablonlar deploy bilan o'zgaradi)"""
+    raw = '|'.join('' if part is None else str(part) for part in (RELEASE_VERSION,) + parts)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:20]
+
+
+def to_http_datetime(value):
+    """datetime (UTC deb hisoblanadi) yoki epoch soniyani HTTP uchun datetime ga"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        if not value:
+            return None
+        return datetime.fromtimestamp(value, tz=timezone.utc).replace(microsecond=0)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    # HTTP sanalari soniya aniqligida
+    return value.replace(microsecond=0)
+
+
+def latest(*values):
+    """Vaqt belgilarining eng kechi (None'lar e'tiborsiz)"""
+    values = [to_http_datetime(value) for value in values]
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def _is_conditional_request():
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    # Admin va flash xabarli sahifalar foydalanuvchiga xos
+    if session.get('logged_in') or session.get('_flashes'):
+        return False
+    return True
+
+
+def _not_modified(etag, last_modified):
+    # If-None-Match bo'lsa, If-Modified-Since e'tiborga olinmaydi (RFC 9110)
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def _apply_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Keshlash mumkin, lekin har safar tekshirib olinsin
+    response.cache_control.no_cache = True
+    return response
+
+
+def conditional(validator, on_not_modified=None):
+    """
+    View uchun shartli GET dekoratori.
+    validator(*args, **kwargs) -> (etag, last_modified) yoki None (tekshiruvsiz render).
+    on_not_modified() — 304 qaytarilganda chaqiriladi (masalan ko'rishni hisoblash).
+    page_cache.cached dan tashqarida (yuqorida) qo'yiladi — 304 keshga ham murojaat qilmaydi.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not _is_conditional_request():
+                return view(*args, **kwargs)
+
+            validators = validator(*args, **kwargs)
+            if validators is None:
+                return view(*args, **kwargs)
+            etag, last_modified = validators
+
+            if _not_modified(etag, last_modified):
+                if on_not_modified:
+                    on_not_modified()
+                return _apply_validators(make_response('', 304), etag, last_modified)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                _apply_validators(response, etag, last_modified)
+            return response
+        return wrapper
+    return decorator
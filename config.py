@@ -3,6 +3,7 @@
 TrendoAI uchun markazlashtirilgan konfiguratsiya fayli.
 Barcha muhim sozlamalar shu yerda saqlanadi.
 """
+import hashlib
 import os
 from dotenv import load_dotenv
 
@@ -28,10 +29,118 @@ if DATABASE_URI.startswith("postgres://"):
 
 # ========== AI SOZLAMALARI ==========
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_API_KEY2 = os.getenv("GEMINI_API_KEY2")  # Zaxira API kalit
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
 GEMINI_MODEL_BACKUP = os.getenv("GEMINI_MODEL_BACKUP", "gemini-2.5-flash-lite")
 AI_RETRY_ATTEMPTS = 3
 AI_RETRY_DELAY = 2
+# Kvota xatosidan (429) keyin fon generatsiyasi kutadi (soniya, ketma-ket xatolarda ikki baravar)
+AI_QUOTA_BACKOFF = int(os.getenv("AI_QUOTA_BACKOFF", "300"))
+AI_QUOTA_BACKOFF_MAX = 3600
+# Har bir (API kalit, model) sloti uchun daqiqasiga so'rovlar va bir martalik zaxira
+GEMINI_RPM = int(os.getenv("GEMINI_RPM", "15"))
+GEMINI_BURST = 3
+# Gemini klientlar puli: ketma-ket shuncha xatodan keyin slot o'chiriladi (circuit breaker)
+GEMINI_BREAKER_FAILURES = 3
+# O'chirilgan slot shuncha soniyadan keyin bitta sinov so'rovi bilan tekshiriladi
+GEMINI_BREAKER_RECOVERY = int(os.getenv("GEMINI_BREAKER_RECOVERY", "60"))
+# Barcha slotlar band bo'lsa, bo'shashini kutishning eng uzoq vaqti (soniya)
+GEMINI_SLOT_WAIT = 30
+# Kvota bloklari (429) bazada saqlanadi — boshqa jarayonlardagi blokni tekshirish oralig'i (soniya)
+AI_QUOTA_SYNC_INTERVAL = 5
+
+# ========== AI YUKLAMA BOSHQARUVI ==========
+# Jarayon bo'yicha bir vaqtdagi AI chaqiruvlari (barcha ustuvorlik sinflari)
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "4"))
+# Sinf chegaralari: fon generatsiyasi va admin chat uchun joy qoldiradi
+AI_CLASS_CONCURRENCY = {
+    'chat': AI_MAX_CONCURRENCY,
+    'admin': 2,
+    'background': 2,
+}
+# Faqat chat uchun zaxira joylar: admin va fon chaqiruvlari birgalikda
+# AI_MAX_CONCURRENCY - AI_CHAT_RESERVED dan oshmaydi (chat uzun generatsiyalar ortida qolmaydi)
+AI_CHAT_RESERVED = int(os.getenv("AI_CHAT_RESERVED", "1"))
+# Har bir sinf navbatining uzunligi — to'lsa so'rov darhol rad etiladi
+AI_QUEUE_LIMITS = {
+    'chat': 16,
+    'admin': 8,
+    'background': 32,
+}
+# Navbatda kutishning eng uzoq vaqti (soniya); chat uchun qisqa — 503 + Retry-After
+AI_QUEUE_DEADLINES = {
+    'chat': int(os.getenv("AI_CHAT_QUEUE_DEADLINE", "5")),
+    'admin': 30,
+    'background': 300,
+}
+
+# ========== AI VAZIFA PROFILLARI ==========
+# Har bir generator uchun: models — sifat jihatidan mos modellar (afzallik tartibida,
+# router ular orasidan latency_target'ga sig'adigan eng arzonini tanlaydi), fallback —
+# faqat models'dagi slotlar ishlamasa; max_output_tokens, temperature, timeout (soniya).
+# gemini-2.5-* da max_output_tokens "thinking" tokenlarini ham o'z ichiga oladi, o'rnatilgan
+# SDK esa thinking_config'ni qo'llab-quvvatlamaydi — shuning uchun chegaralar kutilgan javob
+# uzunligidan bir necha barobar yuqori: ular uzunlikni emas, qochib ketgan javobni cheklaydi
+# (uzunlik promptda beriladi). MAX_TOKENS bilan tugaganlar /admin/api/ai-stats da ko'rinadi
+AI_TASK_PROFILES = {
+    'seo_post': {
+        'models': [GEMINI_MODEL], 'fallback': [GEMINI_MODEL_BACKUP],
+        'max_output_tokens': 32768, 'temperature': 0.8, 'timeout': 180, 'latency_target': 120,
+    },
+    'custom': {
+        'models': [GEMINI_MODEL], 'fallback': [GEMINI_MODEL_BACKUP],
+        'max_output_tokens': 16384, 'temperature': 0.7, 'timeout': 90, 'latency_target': 60,
+    },
+    'marketing': {
+        'models': [GEMINI_MODEL_BACKUP, GEMINI_MODEL],
+        'max_output_tokens': 8192, 'temperature': 0.9, 'timeout': 30, 'latency_target': 15,
+    },
+    'portfolio': {
+        'models': [GEMINI_MODEL_BACKUP, GEMINI_MODEL],
+        'max_output_tokens': 8192, 'temperature': 0.7, 'timeout': 30, 'latency_target': 15,
+    },
+    'service': {
+        'models': [GEMINI_MODEL_BACKUP, GEMINI_MODEL],
+        'max_output_tokens': 8192, 'temperature': 0.7, 'timeout': 30, 'latency_target': 15,
+    },
+    'chat': {
+        'models': [GEMINI_MODEL, GEMINI_MODEL_BACKUP],
+        'max_output_tokens': 8192, 'temperature': 0.7, 'timeout': 20, 'latency_target': 8,
+    },
+    'chat_audio': {
+        'models': [GEMINI_MODEL, GEMINI_MODEL_BACKUP],
+        'max_output_tokens': 8192, 'temperature': 0.7, 'timeout': 25, 'latency_target': 10,
+    },
+    'bot': {
+        'models': [GEMINI_MODEL, GEMINI_MODEL_BACKUP],
+        'max_output_tokens': 16384, 'temperature': 0.7, 'timeout': 30, 'latency_target': 15,
+    },
+    # Buzilgan JSON javobni sxemaga moslab tuzatish (qayta generatsiyadan arzon)
+    'json_repair': {
+        'models': [GEMINI_MODEL_BACKUP], 'fallback': [GEMINI_MODEL],
+        'max_output_tokens': 32768, 'temperature': 0.0, 'timeout': 120, 'latency_target': 60,
+    },
+}
+# Narxlar (USD, 1M token uchun: kirish, chiqish) — arzon modelni tanlash va xarajat hisobi uchun
+AI_MODEL_PRICES = {
+    'gemini-2.5-pro': (1.25, 10.0),
+    'gemini-2.5-flash': (0.30, 2.50),
+    'gemini-2.5-flash-lite': (0.10, 0.40),
+}
+# p50/p95 ishonchli bo'lishi uchun (vazifa, model) bo'yicha kamida shuncha o'lchov kerak
+AI_ROUTER_MIN_SAMPLES = 5
+# Hedged so'rovlar (chat, bot): asosiy model o'z p95 vaqtida javob bermasa, boshqa slotga
+# (zaxira model yoki ikkinchi kalit) parallel so'rov yuboriladi — birinchi javob olinadi
+AI_HEDGE_ENABLED = os.getenv("AI_HEDGE_ENABLED", "true").lower() == "true"
+# Qo'shimcha so'rovlar ulushi: 0.1 — hedge'lar hedge qilinadigan so'rovlarning ~10% idan oshmaydi
+AI_HEDGE_BUDGET = float(os.getenv("AI_HEDGE_BUDGET", "0.1"))
+# Budjetning bir martalik zaxirasi (ketma-ket hedge'lar soni)
+AI_HEDGE_BURST = 3
+# p95 juda kichik bo'lsa ham shundan oldin hedge yuborilmaydi (soniya)
+AI_HEDGE_MIN_DELAY = 1.0
+# JSON javoblar (seo_post, portfolio, service): mahalliy va model orqali tuzatish ham
+# yordam bermasa, shuncha marta qayta generatsiya
+AI_JSON_REGENERATIONS = 1
 
 # ========== TELEGRAM SOZLAMALARI ==========
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
@@ -49,6 +158,20 @@ SECRET_KEY = os.getenv("SECRET_KEY", "trendoai-secret-key-change-in-production")
 VAPID_PUBLIC_KEY = os.getenv("VAPID_PUBLIC_KEY", "BJt75bqZyZdfqtfNkvQUT3uZpg6ytWSi0mg9riLZl2zOTIarMwxvxJNHCc8OvfVwh8Xe2o60cYXzqa3MBKYOT8s")
 VAPID_PRIVATE_KEY = os.getenv("VAPID_PRIVATE_KEY", "MIGHAgEAMBMGByqGSM49AgEGCCqGSM49AwEHBG0wawIBAQQgctR2TTZXKwU2B62L6mQUTlyqjdEeWBWOMD97+9Q6yjOhRANCAASbe+W6mcmXX6rXzZL0FE97maYOsrVkotJoPa4i2ZdszkyGqzMMb8STRwnPDr31cIfF3tqOtHGF86mtzASmDk/L")
 VAPID_CLAIMS_SUB = "mailto:admin@trendoai.uz"
+# Parallel yuborish: worker'lar soni, bitta so'rov timeout'i (soniya)
+PUSH_MAX_WORKERS = int(os.getenv("PUSH_MAX_WORKERS", "16"))
+PUSH_TIMEOUT = int(os.getenv("PUSH_TIMEOUT", "10"))
+# VAPID JWT amal qilish muddati (soniya, 24 soatdan oshmasligi kerak)
+PUSH_VAPID_TTL = 12 * 60 * 60
+# Bitta xabar obunachilarga shu oraliqqa (soniya) yoyib yuboriladi
+PUSH_DELIVERY_WINDOW = int(os.getenv("PUSH_DELIVERY_WINDOW", "300"))
+# Kichik partiyalar uchun eng past tezlik (xabar/soniya) va bir martalik zaxira
+PUSH_MIN_RATE = float(os.getenv("PUSH_MIN_RATE", "2"))
+PUSH_BURST = int(os.getenv("PUSH_BURST", "10"))
+# Push xizmati oflayn qurilma uchun xabarni shuncha saqlaydi (soniya)
+PUSH_TTL = int(os.getenv("PUSH_TTL", str(6 * 60 * 60)))
+# Yangi post xabarlari bitta topic'da — oflayn qurilmaga faqat oxirgisi yetadi
+PUSH_TOPIC_NEW_POST = "new-post"
 
 # ========== SCHEDULER SOZLAMALARI ==========
 TIMEZONE = "Asia/Tashkent"
@@ -56,6 +179,34 @@ SEO_POST_HOUR = 9
 SEO_POST_MINUTE = 0
 MARKETING_POST_HOUR = 12
 MARKETING_POST_MINUTE = 0
+# Post chop etiladigan soatlar (06:00 - 22:00, kuniga 17 ta)
+PUBLISH_HOURS = tuple(range(6, 23))
+# Bir nechta jarayondan faqat lider scheduler'ni yuritadi.
+# Lease muddati (soniya): lider o'lsa, shundan keyin boshqa jarayon egallaydi
+SCHEDULER_LEASE_TTL = int(os.getenv("SCHEDULER_LEASE_TTL", "60"))
+# Liderlikni yangilash / egallashga urinish oralig'i (soniya), TTL dan kichik bo'lishi shart
+SCHEDULER_LEADER_CHECK_INTERVAL = int(os.getenv("SCHEDULER_LEADER_CHECK_INTERVAL", "15"))
+# Kechikkan ishga tushirish shu muddat ichida bo'lsa baribir bajariladi (soniya)
+SCHEDULER_MISFIRE_GRACE = int(os.getenv("SCHEDULER_MISFIRE_GRACE", "3600"))
+# Worker jarayonidagi vazifalar saqlanadigan jadval (uxlash/qayta ishga tushishdan keyin tiklanadi)
+SCHEDULER_JOBSTORE_TABLE = "apscheduler_jobs"
+# Jarayon turi: "web" (gunicorn) yoki "worker" (worker.py)
+PROCESS_TYPE = os.getenv("TRENDOAI_PROCESS", "web")
+# Alohida worker bo'lmagan deploy uchun: scheduler'ni web jarayonida yuritish
+RUN_SCHEDULER_IN_WEB = os.getenv("RUN_SCHEDULER_IN_WEB", "false").lower() == "true"
+
+# ========== QORALAMA BUFERI ==========
+# Kelgusi shuncha nashr sloti uchun oldindan tayyorlangan qoralamalar saqlanadi
+DRAFT_BUFFER_SIZE = int(os.getenv("DRAFT_BUFFER_SIZE", "6"))
+# Band soatlarda bufer faqat shundan kam qolsa to'ldiriladi
+DRAFT_BUFFER_MIN = int(os.getenv("DRAFT_BUFFER_MIN", "2"))
+# Off-peak soatlar (TIMEZONE bo'yicha) — bufer to'liq to'ldiriladi
+DRAFT_OFFPEAK_HOURS = (23, 0, 1, 2, 3, 4, 5)
+# Producer tekshiruv oralig'i (daqiqa)
+DRAFT_FILL_INTERVAL = int(os.getenv("DRAFT_FILL_INTERVAL", "20"))
+DRAFT_MAX_ATTEMPTS = 2
+# Slot vaqtidan shuncha oldin ishga tushsa ham qoralama chop etiladi (soniya, soat farqi uchun)
+DRAFT_PUBLISH_TOLERANCE = 120
 
 # ========== CRON SOZLAMALARI ==========
 # Tashqi cron xizmatlari uchun secret key
@@ -72,6 +223,114 @@ FACEBOOK_PIXEL_ID = os.getenv("FACEBOOK_PIXEL_ID", "886188897254491")
 # ========== PAGINATION ==========
 POSTS_PER_PAGE = 10
 
+# ========== KO'RISHLAR HISOBLAGICHI ==========
+# Ko'rishlar xotirada yig'iladi va shu oraliqda (soniya) bazaga yoziladi
+VIEW_FLUSH_INTERVAL = int(os.getenv("VIEW_FLUSH_INTERVAL", "30"))
+
+# ========== SAHIFA KESHI ==========
+# Anonim foydalanuvchilar uchun to'liq sahifa keshi (bayt, soniya)
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+PAGE_CACHE_TTL = int(os.getenv("PAGE_CACHE_TTL", "3600"))
+# Boshqa worker'lardagi bekor qilishlarni tekshirish oralig'i (soniya)
+PAGE_CACHE_SYNC_INTERVAL = int(os.getenv("PAGE_CACHE_SYNC_INTERVAL", "5"))
+
+
+def _source_fingerprint():
+    """Shablonlar, statik fayllar va kod mazmunining xeshi — fayllar o'zgarsa o'zgaradi"""
+    root = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha1()
+    paths = [name for name in os.listdir(root) if name.endswith('.py')]
+    for folder in ('templates', 'static'):
+        for dirpath, dirnames, filenames in os.walk(os.path.join(root, folder)):
+            dirnames.sort()
+            paths.extend(os.path.relpath(os.path.join(dirpath, name), root) for name in filenames)
+    for path in sorted(paths):
+        digest.update(path.encode('utf-8'))
+        try:
+            with open(os.path.join(root, path), 'rb') as f:
+                digest.update(f.read())
+        except OSError:
+            continue
+    return digest.hexdigest()[:12]
+
+
+# Har deploy'da ETag'lar yangilanishi uchun reliz belgisi: Render/Heroku commit, aks holda
+# (Docker, VPS) ishga tushishda hisoblangan fayllar xeshi — bir xil kodda barcha worker'larda bir xil
+RELEASE_VERSION = os.getenv("RELEASE_VERSION") or os.getenv("RENDER_GIT_COMMIT") or os.getenv("SOURCE_VERSION") \
+    or _source_fingerprint()
+
+# ========== FON VAZIFALARI ==========
+# Har bir vazifa turi uchun bir vaqtda ishlaydigan vazifalar soni
+JOB_CONCURRENCY = {
+    'generate': int(os.getenv("JOB_CONCURRENCY_GENERATE", "1")),
+    'push': int(os.getenv("JOB_CONCURRENCY_PUSH", "2")),
+    'telegram': int(os.getenv("JOB_CONCURRENCY_TELEGRAM", "2")),
+    'draft': int(os.getenv("JOB_CONCURRENCY_DRAFT", "2")),
+    'publish': 1,
+}
+JOB_MAX_ATTEMPTS = 3
+# Qayta urinish: 60s, 120s, 240s ...
+JOB_RETRY_BASE_DELAY = int(os.getenv("JOB_RETRY_BASE_DELAY", "60"))
+JOB_POLL_INTERVAL = 2
+# Ishlayotgan vazifa heartbeat'i; shuncha vaqt yangilanmasa vazifa uzilgan hisoblanadi
+JOB_HEARTBEAT_INTERVAL = 30
+JOB_STALE_AFTER = 180
+
+# ========== NASHR KONVEYERI ==========
+# Bosqichlar bo'yicha worker oqimlari soni
+PIPELINE_WORKERS = {
+    'generate': int(os.getenv("PIPELINE_GENERATE_WORKERS", "2")),
+    'enrich': 2,
+    'persist': 1,
+    'announce': 1,
+    'notify': 1,
+}
+# Saqlangandan keyingi bosqichlar xatoda shuncha marta qayta urinadi
+PIPELINE_STAGE_RETRIES = {'announce': 2, 'notify': 2}
+# Saqlashgacha bo'lgan bosqichlarning eng uzoq davomiyligi (soniya). generate — seo_post
+# timeout'i (180s) x JSON qayta generatsiyasi x dublikat qayta urinishlari va zaxira model.
+# Post shu vaqtda saqlanmasa, kutayotgan vazifa xato bilan tugaydi
+PIPELINE_STAGE_TIMEOUTS = {
+    'generate': int(os.getenv("PIPELINE_GENERATE_TIMEOUT", "900")),
+    'enrich': 60,
+    'persist': 60,
+}
+
+# ========== MAVZULAR ROTATSIYASI ==========
+# Og'irligi 1 bo'lgan mavzu taxminan shuncha vaqtda bir marta navbatga keladi (soniya)
+TOPIC_ROTATION_INTERVAL = 7 * 24 * 60 * 60
+# Bir kunda bitta kategoriyadan eng ko'pi bilan shuncha avtomatik post
+TOPIC_CATEGORY_DAILY_QUOTA = int(os.getenv("TOPIC_CATEGORY_DAILY_QUOTA", "4"))
+# Boshqa jarayonlar/admin o'zgarishlarini olish uchun heap'larni qayta qurish oralig'i (soniya)
+TOPIC_REFRESH_INTERVAL = 300
+
+# ========== PARTIYAVIY GENERATSIYA ==========
+# generate_batch() uchun standart parallellik va barcha partiyalar uchun umumiy chegara
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "3"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+# Telegram/push e'lonlari orasidagi oraliq (soniya) — kanal bir vaqtda to'lib ketmasin
+BATCH_ANNOUNCE_STAGGER = int(os.getenv("BATCH_ANNOUNCE_STAGGER", "600"))
+
+# ========== DUBLIKATLAR ==========
+# MinHash bo'yicha Jaccard o'xshashligi shundan yuqori bo'lsa, post dublikat hisoblanadi
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", "0.5"))
+# Shingle uzunligi (ketma-ket so'zlar soni)
+DUPLICATE_SHINGLE_SIZE = 3
+# MinHash imzosi uzunligi va LSH bo'laklari (har bo'lakda NUM_PERM / BANDS qiymat).
+# 32 x 2 — ~0.18 o'xshashlikdan boshlab nomzod bo'ladi, threshold'da deyarli hech narsa o'tkazib yuborilmaydi
+DUPLICATE_NUM_PERM = 64
+DUPLICATE_BANDS = 32
+# Dublikat chiqqanda generatsiyani necha marta qayta urinish (keyin post rad etiladi)
+DUPLICATE_MAX_REGENERATIONS = int(os.getenv("DUPLICATE_MAX_REGENERATIONS", "1"))
+
+# ========== SITEMAP ==========
+# Bitta sitemap faylidagi URL'lar soni (protokol chegarasi 50 000)
+SITEMAP_CHUNK_SIZE = int(os.getenv("SITEMAP_CHUNK_SIZE", "50000"))
+# Server-side cursor'dan bir martada o'qiladigan qatorlar
+SITEMAP_STREAM_BATCH = 1000
+# Sitemap index bola sitemap'larning .xml.gz variantlarini ko'rsatsin
+SITEMAP_GZIP = os.getenv("SITEMAP_GZIP", "false").lower() == "true"
+
 # ========== KATEGORIYALAR ==========
 CATEGORIES = [
     "Web Saytlar",
@@ -0,0 +1,57 @@
+# content_renderer.py
+"""
+Markdown kontentni HTML'ga o'girish moduli.
+Post saqlanganda bir marta render qilinadi va natija bazada saqlanadi.
+"""
+import hashlib
+import html
+import re
+import markdown2
+
+# Markdown sozlamalari — o'zgartirilsa RENDERER_VERSION ham avtomatik o'zgaradi
+MARKDOWN_EXTRAS = ["fenced-code-blocks", "tables", "break-on-newline"]
+
+# Blog ro'yxatidagi qisqa matn uzunligi (belgi)
+EXCERPT_LENGTH = 150
+
+# Render mantig'i qo'lda o'zgartirilganda shu raqamni oshiring
+RENDERER_REVISION = 1
+
+
+def _compute_version():
+    """Renderer versiya belgisi: revision + markdown2 versiyasi + extras + excerpt uzunligi"""
+    raw = f"{RENDERER_REVISION}|{markdown2.__version__}|{','.join(sorted(MARKDOWN_EXTRAS))}|{EXCERPT_LENGTH}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:12]
+
+
+RENDERER_VERSION = _compute_version()
+
+
+def render_markdown(text):
+    """Markdown matnni HTML'ga o'girish"""
+    if not text:
+        return ""
+    return markdown2.markdown(text, extras=MARKDOWN_EXTRAS)
+
+
+_BLOCK_TAG_RE = re.compile(r'</?(?:p|h[1-6]|li|ul|ol|br|hr|div|pre|blockquote|table|thead|tbody|tr|td|th)\b[^>]*>', re.IGNORECASE)
+_TAG_RE = re.compile(r'<[^>]+>')
+_WS_RE = re.compile(r'\s+')
+
+
+def html_to_text(html_text):
+    """Render qilingan HTML'dan oddiy matn ajratib olish"""
+    if not html_text:
+        return ""
+    text = _BLOCK_TAG_RE.sub(' ', html_text)
+    text = _TAG_RE.sub('', text)
+    return _WS_RE.sub(' ', html.unescape(text)).strip()
+
+
+def build_excerpt(html_text, length=EXCERPT_LENGTH):
+    """Ro'yxatlar uchun qisqa matn (so'z chegarasida qisqartiriladi)"""
+    text = html_to_text(html_text)
+    if len(text) <= length:
+        return text
+    cut = text[:length].rsplit(' ', 1)[0]
+    return cut.rstrip(' .,;:!?-') + '...'
@@ -0,0 +1,329 @@
+# duplicate_index.py
+"""
+Deyarli bir xil postlarni aniqlash (MinHash + LSH).
+- Sarlavha va matn stem'laridan so'z shingle'lari (DUPLICATE_SHINGLE_SIZE ta so'z)
+- Har bir post uchun MinHash imzosi (DUPLICATE_NUM_PERM ta qiymat) post.minhash
+  ustunida saqlanadi — indeks qayta qurilganda qayta hisoblanmaydi
+- LSH: imzo DUPLICATE_BANDS ta bo'lakka bo'linadi, bir xil bo'lakli postlar
+  nomzod bo'ladi va faqat ular uchun Jaccard bahosi hisoblanadi
+- Indeks chop etilgan va buferdagi (publish_at) postlar bo'yicha, ORM
+  hodisalari orqali inkremental yangilanadi: flush paytida o'zgarish sessiyada
+  yig'iladi va faqat commit'dan keyin indeksga tushadi (rollback'da tashlanadi)
+"""
+import base64
+import hashlib
+import random
+import threading
+import time
+from array import array
+from itertools import repeat
+from operator import xor
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session, object_session
+from config import DUPLICATE_THRESHOLD, DUPLICATE_SHINGLE_SIZE, DUPLICATE_NUM_PERM, DUPLICATE_BANDS
+from text_normalizer import tokenize, stem
+
+# Boshqa worker/jarayonlardagi o'zgarishlarni tekshirish oralig'i (soniya)
+DUPLICATE_REFRESH_INTERVAL = 60
+
+_MAX_HASH = (1 << 64) - 1
+# Doimiy (deploy'lar orasida bir xil) "permutatsiya" maskalari: shingle xeshi blake2b
+# bo'lgani uchun XOR bilan aralashtirish yetarli va (a*x+b) % p dan ~5 baravar tez
+_rng = random.Random(20260101)
+_MASKS = [_rng.getrandbits(64) for _ in range(DUPLICATE_NUM_PERM)]
+_ROWS = max(1, DUPLICATE_NUM_PERM // DUPLICATE_BANDS)
+# Commit kutilayotgan o'zgarishlar uchun session.info kaliti
+_PENDING_KEY = 'duplicate_index_pending'
+
+
+def shingles(title, content, size=DUPLICATE_SHINGLE_SIZE):
+    """Stem'langan so'zlardan ketma-ket `size` talik guruhlar (64-bit xesh to'plami)"""
+    words = [stem(token) for token in tokenize(f"{title or ''} {content or ''}")]
+    if len(words) < size:
+        grams = {' '.join(words)} if words else set()
+    else:
+        grams = {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    return {
+        int.from_bytes(hashlib.blake2b(gram.encode('utf-8'), digest_size=8).digest(), 'big')
+        for gram in grams
+    }
+
+
+def minhash(title, content):
+    """MinHash imzosi (tuple)"""
+    hashes = list(shingles(title, content))
+    if not hashes:
+        return tuple([_MAX_HASH] * DUPLICATE_NUM_PERM)
+    return tuple(min(map(xor, hashes, repeat(mask))) for mask in _MASKS)
+
+
+def encode_signature(signature):
+    return base64.b64encode(array('Q', signature).tobytes()).decode('ascii')
+
+
+def decode_signature(value):
+    """Saqlangan imzo; parametrlar o'zgargan yoki buzilgan bo'lsa None"""
+    if not value:
+        return None
+    try:
+        signature = array('Q')
+        signature.frombytes(base64.b64decode(value))
+    except (ValueError, TypeError):
+        return None
+    return tuple(signature) if len(signature) == DUPLICATE_NUM_PERM else None
+
+
+def similarity(first, second):
+    """Ikki imzo bo'yicha Jaccard bahosi"""
+    return sum(1 for a, b in zip(first, second) if a == b) / DUPLICATE_NUM_PERM
+
+
+def _bands(signature):
+    for band in range(DUPLICATE_BANDS):
+        yield band, signature[band * _ROWS:(band + 1) * _ROWS]
+
+
+class DuplicateIndex:
+    """MinHash imzolari ustidagi LSH indeks"""
+
+    def __init__(self, threshold=DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        self._db = None
+        self._model = None
+        self._lock = threading.RLock()
+        self._buckets = [{} for _ in range(DUPLICATE_BANDS)]  # bo'lak -> {qiymatlar: {post_id}}
+        self._signatures = {}   # post_id -> imzo
+        self._titles = {}       # post_id -> (title, slug, is_published)
+        self._state = None
+        self._checked_at = 0.0
+        self._built = False
+
+    def init_app(self, app, db, model):
+        """Imzolarni saqlashdan oldin hisoblash va indeksni inkremental yangilash"""
+        self._db = db
+        self._model = model
+        event.listen(model, 'before_insert', self._before_save)
+        event.listen(model, 'before_update', self._before_save)
+        event.listen(model, 'after_insert', self._after_change)
+        event.listen(model, 'after_update', self._after_change)
+        event.listen(model, 'after_delete', self._after_delete)
+        event.listen(Session, 'after_commit', self._after_commit)
+        event.listen(Session, 'after_rollback', self._after_rollback)
+
+    @staticmethod
+    def _indexed(post):
+        return bool(post.is_published) or post.publish_at is not None
+
+    # ---------- Qurish ----------
+
+    def _state_query(self):
+        Post = self._model
+        return tuple(self._db.session.query(
+            func.count(Post.id),
+            func.max(func.coalesce(Post.updated_at, Post.created_at)),
+            func.max(Post.id),
+        ).filter((Post.is_published == True) | (Post.publish_at != None)).one())
+
+    def rebuild(self):
+        """Saqlangan imzolardan indeksni qurish; imzosi yo'q eski postlar uchun hisoblab yozish"""
+        Post = self._model
+        rows = self._db.session.query(
+            Post.id, Post.title, Post.slug, Post.is_published, Post.minhash
+        ).filter((Post.is_published == True) | (Post.publish_at != None)).all()
+
+        signatures, titles, missing = {}, {}, []
+        for post_id, title, slug, is_published, stored in rows:
+            titles[post_id] = (title, slug, bool(is_published))
+            signature = decode_signature(stored)
+            if signature is None:
+                missing.append(post_id)
+            else:
+                signatures[post_id] = signature
+
+        # Backfill: imzoni bir marta hisoblab, ustunga yozib qo'yamiz
+        for post_id in missing:
+            title, content = self._db.session.query(Post.title, Post.content).filter(Post.id == post_id).one()
+            signature = minhash(title, content)
+            signatures[post_id] = signature
+            with self._db.engine.begin() as conn:
+                conn.execute(
+                    self._db.update(Post).where(Post.id == post_id).values(minhash=encode_signature(signature))
+                )
+        if missing:
+            print(f"✅ {len(missing)} ta post uchun MinHash imzosi hisoblandi")
+
+        buckets = [{} for _ in range(DUPLICATE_BANDS)]
+        for post_id, signature in signatures.items():
+            for band, key in _bands(signature):
+                buckets[band].setdefault(key, set()).add(post_id)
+
+        with self._lock:
+            self._buckets, self._signatures, self._titles = buckets, signatures, titles
+            self._state = self._state_query()
+            self._checked_at = time.monotonic()
+            self._built = True
+        return len(signatures)
+
+    def _ensure_fresh(self):
+        if not self._built:
+            self.rebuild()
+            return
+        if time.monotonic() - self._checked_at < DUPLICATE_REFRESH_INTERVAL:
+            return
+        state = self._state_query()
+        with self._lock:
+            self._checked_at = time.monotonic()
+            stale = state != self._state
+        if stale:
+            self.rebuild()
+
+    # ---------- Inkremental yangilash ----------
+
+    def _before_save(self, mapper, connection, target):
+        state = inspect(target)
+        changed = state.attrs.title.history.has_changes() or state.attrs.content.history.has_changes()
+        if target.minhash is None or changed:
+            target.minhash = encode_signature(minhash(target.title, target.content))
+
+    def _add(self, post_id, signature):
+        self._signatures[post_id] = signature
+        for band, key in _bands(signature):
+            self._buckets[band].setdefault(key, set()).add(post_id)
+
+    def _remove(self, post_id):
+        signature = self._signatures.pop(post_id, None)
+        self._titles.pop(post_id, None)
+        if signature is None:
+            return
+        for band, key in _bands(signature):
+            bucket = self._buckets[band].get(key)
+            if bucket is not None:
+                bucket.discard(post_id)
+                if not bucket:
+                    del self._buckets[band][key]
+
+    def _stage(self, target, entry):
+        """O'zgarishni commit'gacha sessiyada saqlash (sessiyasiz bo'lsa darhol qo'llash)"""
+        session = object_session(target)
+        if session is None:
+            self._apply({target.id: entry})
+            return
+        session.info.setdefault(_PENDING_KEY, {})[target.id] = entry
+
+    def _apply(self, pending):
+        if not self._built:
+            return
+        with self._lock:
+            for post_id, entry in pending.items():
+                self._remove(post_id)
+                if entry is not None:
+                    signature, meta = entry
+                    self._add(post_id, signature)
+                    self._titles[post_id] = meta
+
+    def _after_change(self, mapper, connection, target):
+        if not self._built:
+            return
+        signature = decode_signature(target.minhash)
+        if self._indexed(target) and signature is not None:
+            entry = (signature, (target.title, target.slug, bool(target.is_published)))
+        else:
+            entry = None
+        self._stage(target, entry)
+
+    def _after_delete(self, mapper, connection, target):
+        if not self._built:
+            return
+        self._stage(target, None)
+
+    def _after_commit(self, session):
+        pending = session.info.pop(_PENDING_KEY, None)
+        if pending:
+            self._apply(pending)
+
+    def _after_rollback(self, session):
+        session.info.pop(_PENDING_KEY, None)
+
+    # ---------- So'rovlar ----------
+
+    def _candidates(self, signature, exclude=None):
+        ids = set()
+        for band, key in _bands(signature):
+            ids.update(self._buckets[band].get(key, ()))
+        ids.discard(exclude)
+        return ids
+
+    def find_duplicate(self, title, content, threshold=None):
+        """
+        Eng o'xshash mavjud post (o'xshashlik >= threshold bo'lsa) yoki None.
+        Qaytaradi: {'id', 'title', 'slug', 'similarity'}
+        """
+        threshold = self.threshold if threshold is None else threshold
+        signature = minhash(title, content)
+        self._ensure_fresh()
+        best_id, best = None, 0.0
+        with self._lock:
+            for post_id in self._candidates(signature):
+                score = similarity(signature, self._signatures[post_id])
+                if score > best:
+                    best_id, best = post_id, score
+            if best_id is None or best < threshold:
+                return None
+            title, slug, _ = self._titles.get(best_id, (None, None, False))
+        return {'id': best_id, 'title': title, 'slug': slug, 'similarity': round(best, 3)}
+
+    def clusters(self, threshold=None):
+        """
+        Mavjud dublikat guruhlari (union-find): har bir guruh — postlar ro'yxati,
+        eng katta guruhlar birinchi.
+        """
+        threshold = self.threshold if threshold is None else threshold
+        self._ensure_fresh()
+        with self._lock:
+            parent = {}
+
+            def find(post_id):
+                while parent.get(post_id, post_id) != post_id:
+                    parent[post_id] = parent.get(parent[post_id], parent[post_id])
+                    post_id = parent[post_id]
+                return post_id
+
+            best = {}
+            for post_id, signature in self._signatures.items():
+                for other in self._candidates(signature, exclude=post_id):
+                    if other < post_id:
+                        continue
+                    score = similarity(signature, self._signatures[other])
+                    if score >= threshold:
+                        root_a, root_b = find(post_id), find(other)
+                        if root_a != root_b:
+                            parent[max(root_a, root_b)] = min(root_a, root_b)
+                        best[post_id] = max(best.get(post_id, 0.0), score)
+                        best[other] = max(best.get(other, 0.0), score)
+
+            groups = {}
+            for post_id in best:
+                groups.setdefault(find(post_id), []).append(post_id)
+            result = []
+            for members in groups.values():
+                members.sort()
+                result.append([{
+                    'id': post_id,
+                    'title': self._titles.get(post_id, (None,))[0],
+                    'slug': self._titles.get(post_id, (None, None))[1],
+                    'is_published': self._titles.get(post_id, (None, None, False))[2],
+                    'similarity': round(best[post_id], 3),
+                } for post_id in members])
+        result.sort(key=len, reverse=True)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'posts': len(self._signatures),
+                'buckets': sum(len(bucket) for bucket in self._buckets),
+                'threshold': self.threshold,
+            }
+
+
+duplicate_index = DuplicateIndex()
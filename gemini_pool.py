@@ -0,0 +1,382 @@
+# gemini_pool.py
+"""
+Gemini klientlar puli: bir nechta (API kalit, model) sloti.
+- Har bir slotning o'z klienti (genai.configure global holatiga bog'liq emas),
+  o'z tezlik chegarasi (TokenBucket, GEMINI_RPM) va circuit breaker'i bor
+- Circuit breaker: closed → (GEMINI_BREAKER_FAILURES xato yoki kvota) → open →
+  (tiklanish vaqti) → half-open (bitta sinov so'rovi) → closed / yana open
+- So'rov eng sog'lom slotga yuboriladi: xato darajasi, band so'rovlar, kechikish
+- Xatoda uxlamasdan keyingi slotga o'tiladi; kutish faqat barcha slotlar band bo'lsa
+- Scheduler, /api/chat va Telegram bot oqimlaridan bir vaqtda chaqirish xavfsiz
+- Har bir chaqiruv ai_governor orqali o'tadi (ustuvorlik sinfi: chat/admin/background)
+- Kvota (429) bloki ai_quota_block jadvalida saqlanadi: bir jarayon ko'rgan 429 boshqa
+  web/worker jarayonlaridagi shu slotni ham (AI_QUOTA_SYNC_INTERVAL ichida) o'chiradi
+"""
+import threading
+import time
+from config import (
+    GEMINI_API_KEY, GEMINI_API_KEY2, GEMINI_MODEL, GEMINI_MODEL_BACKUP, GEMINI_RPM, GEMINI_BURST,
+    AI_RETRY_ATTEMPTS, AI_RETRY_DELAY, AI_QUOTA_BACKOFF, AI_QUOTA_BACKOFF_MAX,
+    GEMINI_BREAKER_FAILURES, GEMINI_BREAKER_RECOVERY, GEMINI_SLOT_WAIT, AI_TASK_PROFILES,
+    AI_QUOTA_SYNC_INTERVAL
+)
+from rate_limit import TokenBucket
+from ai_governor import ai_governor
+
+# Xato darajasi va kechikish uchun eksponensial o'rtacha koeffitsiyenti
+_EWMA_ALPHA = 0.2
+
+
+def is_quota_error(error):
+    """Gemini kvota/tezlik chegarasi xatosimi"""
+    text = str(error).lower()
+    return type(error).__name__ in ('ResourceExhausted', 'TooManyRequests') or '429' in text or 'quota' in text
+
+
+def _is_slot_error(error):
+    """
+    Slot sog'lig'iga ta'sir qiladigan xato. ValueError (bloklangan javob,
+    response.text yo'q) so'rovning o'ziga tegishli — breaker'ni ochmaydi.
+    """
+    return not isinstance(error, ValueError)
+
+
+class CircuitBreaker:
+    """closed / open / half-open holatlari (qulf chaqiruvchi tomonda)"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failures=GEMINI_BREAKER_FAILURES, recovery=GEMINI_BREAKER_RECOVERY,
+                 max_recovery=AI_QUOTA_BACKOFF_MAX):
+        self.failure_threshold = failures
+        self.recovery = recovery
+        self.max_recovery = max_recovery
+        self._state = self.CLOSED
+        self._failures = 0
+        self._trips = 0
+        self._open_until = 0.0
+        self._probing = False
+
+    @property
+    def state(self):
+        if self._state == self.OPEN and time.monotonic() >= self._open_until:
+            self._state = self.HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def allow(self):
+        """So'rov yuborish mumkinmi (half-open'da faqat bitta sinov)"""
+        state = self.state
+        return state == self.CLOSED or (state == self.HALF_OPEN and not self._probing)
+
+    def remaining(self):
+        """Open holatda sinovgacha qolgan soniyalar"""
+        return max(0.0, self._open_until - time.monotonic()) if self.state == self.OPEN else 0.0
+
+    def on_dispatch(self):
+        if self._state == self.HALF_OPEN:
+            self._probing = True
+
+    def release_probe(self):
+        """Sinov so'rovi slotga bog'liq bo'lmagan xato bilan tugadi"""
+        self._probing = False
+
+    def record_success(self):
+        self._state = self.CLOSED
+        self._failures = 0
+        self._trips = 0
+        self._probing = False
+
+    def hold_open(self, seconds):
+        """Boshqa jarayon ko'rgan kvota bloki: kamida `seconds` soniya ochiq turish"""
+        until = time.monotonic() + seconds
+        if self._state == self.OPEN and self._open_until >= until:
+            return
+        self._state = self.OPEN
+        self._open_until = until
+        self._probing = False
+
+    def record_failure(self, quota=False):
+        """Xatoni qayd etish; slot ochilgan bo'lsa ochiq turish vaqtini qaytaradi"""
+        self._failures += 1
+        self._probing = False
+        if quota or self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            # Ketma-ket ochilishlarda kutish ikki baravar oshadi
+            base = AI_QUOTA_BACKOFF if quota else self.recovery
+            delay = min(self.max_recovery, base * 2 ** self._trips)
+            self._trips += 1
+            self._failures = 0
+            self._state = self.OPEN
+            self._open_until = time.monotonic() + delay
+            return delay
+        return 0
+
+
+class GeminiSlot:
+    """Bitta (API kalit, model) juftligi"""
+
+    def __init__(self, api_key, model_name, label, rank=0):
+        self.api_key = api_key
+        self.model_name = model_name
+        self.label = label
+        self.rank = rank  # model afzalligi: 0 — asosiy, 1 — zaxira
+        self.bucket = TokenBucket(GEMINI_RPM / 60.0, GEMINI_BURST)
+        self.breaker = CircuitBreaker()
+        self.in_flight = 0
+        self.calls = 0
+        self.errors = 0
+        self.error_rate = 0.0
+        self.latency = 0.0
+        self._model = None
+
+    @property
+    def model(self):
+        """Slotning o'z klientiga bog'langan GenerativeModel"""
+        if self._model is None:
+            import google.generativeai as genai
+            from google.generativeai import client as genai_client
+            # genai.configure() jarayon bo'yicha global — har bir kalit uchun alohida klient
+            manager = genai_client._ClientManager()
+            manager.configure(api_key=self.api_key)
+            model = genai.GenerativeModel(self.model_name)
+            model._client = manager.make_client('generative')
+            self._model = model
+        return self._model
+
+    def score(self, rank=None):
+        """
+        Kichigi yaxshiroq: xato darajasi, model afzalligi (zaxira model faqat
+        asosiylari band/nosoz bo'lsa), band so'rovlar, kechikish.
+        rank — chaqiruvchi bergan model tartibi (standart: pul tartibi)
+        """
+        return (
+            round(self.error_rate, 1),
+            self.rank if rank is None else rank,
+            self.in_flight,
+            round(self.latency, 1),
+        )
+
+    def to_dict(self):
+        return {
+            'slot': self.label,
+            'model': self.model_name,
+            'state': self.breaker.state,
+            'reopens_in': round(self.breaker.remaining(), 1),
+            'in_flight': self.in_flight,
+            'calls': self.calls,
+            'errors': self.errors,
+            'error_rate': round(self.error_rate, 3),
+            'latency_ms': round(self.latency * 1000, 1),
+        }
+
+
+class GeminiPool:
+    """Slotlar ustidagi marshrutlovchi"""
+
+    def __init__(self, keys=(GEMINI_API_KEY, GEMINI_API_KEY2), models=(GEMINI_MODEL, GEMINI_MODEL_BACKUP)):
+        keys = [key for i, key in enumerate(keys) if key and key not in keys[:i]]
+        models = [name for i, name in enumerate(models) if name and name not in models[:i]]
+        # Tartib — afzallik: asosiy model barcha kalitlarda, keyin zaxira model
+        self.slots = [
+            GeminiSlot(key, name, f"key{k + 1}/{name}", rank)
+            for rank, name in enumerate(models) for k, key in enumerate(keys)
+        ]
+        self._lock = threading.Lock()
+        self._app = None
+        self._db = None
+        self._synced_at = 0.0
+
+    def init_app(self, app, db):
+        """Jarayonlar orasida umumiy kvota bloklari jadvali"""
+        self._app = app
+        self._db = db
+        try:
+            with app.app_context():
+                with db.engine.begin() as conn:
+                    conn.execute(db.text(
+                        "CREATE TABLE IF NOT EXISTS ai_quota_block ("
+                        "slot VARCHAR(200) PRIMARY KEY, blocked_until FLOAT NOT NULL)"
+                    ))
+        except Exception as e:
+            print(f"⚠️ AI kvota bloklari jadvali: {e}")
+
+    # ---------- Umumiy kvota bloklari ----------
+
+    def _publish_block(self, slot, seconds):
+        """Slotning kvota blokini bazaga yozish (mavjudidan uzoqroq bo'lsa)"""
+        if self._db is None:
+            return
+        try:
+            with self._app.app_context():
+                with self._db.engine.begin() as conn:
+                    conn.execute(self._db.text(
+                        "INSERT INTO ai_quota_block (slot, blocked_until) VALUES (:slot, :until) "
+                        "ON CONFLICT (slot) DO UPDATE SET blocked_until = excluded.blocked_until "
+                        "WHERE ai_quota_block.blocked_until < excluded.blocked_until"
+                    ), {'slot': slot.label, 'until': time.time() + seconds})
+        except Exception as e:
+            print(f"⚠️ Kvota blokini saqlashda xato: {e}")
+
+    def _sync_blocks(self):
+        """Boshqa jarayonlar yozgan faol kvota bloklarini slotlarga qo'llash"""
+        if self._db is None or time.monotonic() - self._synced_at < AI_QUOTA_SYNC_INTERVAL:
+            return
+        self._synced_at = time.monotonic()
+        now = time.time()
+        try:
+            with self._app.app_context():
+                with self._db.engine.connect() as conn:
+                    rows = conn.execute(self._db.text(
+                        "SELECT slot, blocked_until FROM ai_quota_block WHERE blocked_until > :now"
+                    ), {'now': now}).all()
+        except Exception as e:
+            print(f"⚠️ Kvota bloklarini o'qishda xato: {e}")
+            return
+        blocks = dict(rows)
+        with self._lock:
+            for slot in self.slots:
+                if slot.label in blocks:
+                    slot.breaker.hold_open(blocks[slot.label] - now)
+
+    # ---------- Slot tanlash ----------
+
+    def _acquire(self, exclude, deadline, models=None, avoid=(), cancel=None):
+        """Eng sog'lom bo'sh slotni band qilish; deadline'gacha topilmasa (yoki bekor qilinsa) None"""
+        while True:
+            if cancel is not None and cancel.is_set():
+                return None
+            with self._lock:
+                pool = [slot for slot in self.slots
+                        if (models is None or slot.model_name in models) and slot.label not in avoid]
+                allowed = [slot for slot in pool if slot.breaker.allow()]
+                fresh = [slot for slot in allowed if slot not in exclude]
+                # Bu so'rovda hali urinilmagan slotlar birinchi; half-open slot sinov so'rovini
+                # birinchi oladi — aks holda sog'lom slotlar bor ekan, u hech qachon tiklanmaydi
+                ordered = sorted(fresh or allowed, key=lambda s: (
+                    s.breaker.state != CircuitBreaker.HALF_OPEN,
+                    s.score(None if models is None else models.index(s.model_name)),
+                    self.slots.index(s),
+                ))
+                for slot in ordered:
+                    if slot.bucket.try_acquire():
+                        slot.breaker.on_dispatch()
+                        slot.in_flight += 1
+                        return slot
+                if allowed:
+                    wait = min(slot.bucket.wait_time() for slot in allowed)
+                elif pool:
+                    wait = min(slot.breaker.remaining() for slot in pool) or AI_RETRY_DELAY
+                else:
+                    return None
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or wait > remaining:
+                return None
+            time.sleep(wait)
+
+    def _release(self, slot, elapsed, error=None):
+        with self._lock:
+            slot.in_flight -= 1
+            slot.calls += 1
+            failed = error is not None and _is_slot_error(error)
+            slot.error_rate += _EWMA_ALPHA * ((1.0 if failed else 0.0) - slot.error_rate)
+            if error is None:
+                slot.latency += _EWMA_ALPHA * (elapsed - slot.latency) if slot.latency else elapsed
+                slot.breaker.record_success()
+                return 0
+            slot.errors += 1
+            if not failed:
+                slot.breaker.release_probe()
+                return 0
+            return slot.breaker.record_failure(quota=is_quota_error(error))
+
+    # ---------- Chaqiruv ----------
+
+    def call(self, func, attempts=None, max_wait=GEMINI_SLOT_WAIT, models=None, priority='background',
+             avoid=(), cancel=None):
+        """
+        func(model) ni eng sog'lom slotda bajarish. Xatoda darhol keyingi slotga o'tadi.
+        Avval ai_governor'dan `priority` sinfida joy olinadi — sig'masa AIOverloaded.
+
+        attempts: umumiy urinishlar (standart: max(AI_RETRY_ATTEMPTS, slotlar soni))
+        max_wait: bo'sh slot kutishning eng uzoq vaqti (soniya)
+        models: faqat shu modellardagi slotlar, afzallik tartibida
+        avoid: ishlatilmaydigan slotlar (label)
+        cancel: threading.Event — o'rnatilsa yangi urinish boshlanmaydi
+
+        Returns:
+            func natijasi yoki None (barcha urinishlar muvaffaqiyatsiz)
+        """
+        models = list(models) if models is not None else None
+        self._sync_blocks()
+        with ai_governor.slot(priority):
+            return self._call(func, attempts or max(AI_RETRY_ATTEMPTS, len(self.slots)), max_wait,
+                              models, avoid, cancel)
+
+    def _call(self, func, attempts, max_wait, models, avoid, cancel):
+        deadline = time.monotonic() + max_wait
+        tried = set()
+        last_error = None
+        for attempt in range(attempts):
+            slot = self._acquire(tried, deadline, models, avoid, cancel)
+            if slot is None:
+                if cancel is None or not cancel.is_set():
+                    print("⏳ Bo'sh Gemini sloti topilmadi")
+                break
+            if slot in tried:
+                # Barcha slotlar sinab bo'lindi — qayta urinishdan oldin qisqa pauza
+                time.sleep(min(AI_RETRY_DELAY, max(0.0, deadline - time.monotonic())))
+            tried.add(slot)
+            started = time.monotonic()
+            try:
+                result = func(slot.model)
+            except Exception as e:
+                last_error = e
+                opened = self._release(slot, time.monotonic() - started, e)
+                print(f"🔄 AI xatolik [{slot.label}] (urinish {attempt + 1}/{attempts}): {e}")
+                if opened:
+                    kind = "kvota tugadi" if is_quota_error(e) else "slot o'chirildi"
+                    if is_quota_error(e):
+                        self._publish_block(slot, opened)
+                    print(f"⏳ [{slot.label}] {kind} — {int(opened)}s dan keyin sinov so'rovi")
+                continue
+            self._release(slot, time.monotonic() - started)
+            return result
+        if last_error is not None:
+            print(f"❌ Barcha urinishlar muvaffaqiyatsiz. Oxirgi xato: {last_error}")
+        return None
+
+    def label_of(self, model):
+        """GenerativeModel qaysi slotga tegishli (label) yoki None"""
+        for slot in self.slots:
+            if slot._model is model:
+                return slot.label
+        return None
+
+    def blocked_remaining(self):
+        """
+        Barcha slotlar ochiq (o'chirilgan) bo'lsa, birinchisi tiklanguncha soniyalar.
+        Boshqa jarayonlardagi kvota bloklari ham hisobga olinadi.
+        """
+        self._sync_blocks()
+        with self._lock:
+            if not self.slots or any(slot.breaker.allow() for slot in self.slots):
+                return 0.0
+            return min(slot.breaker.remaining() for slot in self.slots)
+
+    def stats(self):
+        with self._lock:
+            return [slot.to_dict() for slot in self.slots]
+
+
+def _configured_models():
+    """Asosiy va zaxira model hamda vazifa profillarida tilga olingan barcha modellar"""
+    models = [GEMINI_MODEL, GEMINI_MODEL_BACKUP]
+    for profile in AI_TASK_PROFILES.values():
+        models.extend(profile.get('models', ()))
+        models.extend(profile.get('fallback', ()))
+    return tuple(models)
+
+
+gemini_pool = GeminiPool(models=_configured_models())
@@ -0,0 +1,298 @@
+# job_queue.py
+"""
+Bazada saqlanadigan fon vazifalari navbati (generate, push, telegram).
+- Har bir tur uchun parallel ishlash chegarasi (JOB_CONCURRENCY)
+- idempotency_key: bir xil kalit bilan qayta yuborilgan vazifa mavjudiga qo'shiladi
+- Xatoda eksponensial kutish bilan qayta urinish (JOB_MAX_ATTEMPTS)
+- Ishlayotgan vazifalar heartbeat yozadi; jarayon o'lib qolsa, vazifa
+  ishga tushishda (va davriy tekshiruvda) qayta navbatga qo'yiladi
+- Uzoq vazifalar checkpoint() bilan oraliq holatni payload'ga yozadi — qayta
+  urinish handler'ni shu qiymatlar bilan chaqiradi va ish qolgan joyidan davom etadi
+"""
+import json
+import os
+import random
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from config import (
+    JOB_CONCURRENCY, JOB_MAX_ATTEMPTS, JOB_RETRY_BASE_DELAY,
+    JOB_POLL_INTERVAL, JOB_HEARTBEAT_INTERVAL, JOB_STALE_AFTER
+)
+
+# Qayta urinishlar orasidagi eng uzoq kutish (soniya)
+_MAX_RETRY_DELAY = 3600
+
+
+class JobQueue:
+    """Bir nechta jarayon uchun xavfsiz, bazaga asoslangan vazifalar navbati"""
+
+    def __init__(self, limits=JOB_CONCURRENCY, poll_interval=JOB_POLL_INTERVAL):
+        self.limits = dict(limits)
+        self.poll_interval = poll_interval
+        self._handlers = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._running = {}      # job_id -> kind (shu jarayonda)
+        self._local = threading.local()   # handler oqimidagi joriy vazifa ID si
+        self._executor = None
+        self._thread = None
+        self._pid = None
+        self._app = None
+        self._db = None
+        self._model = None
+        self.worker_id = None
+
+    def init_app(self, app, db, model):
+        """Flask ilova va BackgroundJob modeli bilan bog'lash, uzilgan vazifalarni tiklash"""
+        self._app = app
+        self._db = db
+        self._model = model
+        with app.app_context():
+            recovered = self.recover()
+        if recovered:
+            print(f"♻️ {recovered} ta uzilgan fon vazifasi qayta navbatga qo'yildi")
+
+    def register(self, kind, handler):
+        """Vazifa turi uchun bajaruvchi funksiya: handler(**payload)"""
+        self._handlers[kind] = handler
+        self.limits.setdefault(kind, 1)
+
+    # ---------- Navbatga qo'yish va holat ----------
+
+    def enqueue(self, kind, payload=None, idempotency_key=None, max_attempts=JOB_MAX_ATTEMPTS, delay=0):
+        """
+        Vazifani navbatga qo'yish, ID qaytaradi.
+        idempotency_key bo'yicha vazifa allaqachon mavjud bo'lsa, o'sha vazifa ID si qaytadi.
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"Noma'lum vazifa turi: {kind}")
+        Job = self._model
+        now = datetime.now()
+        values = {
+            'kind': kind,
+            'payload': json.dumps(payload or {}, ensure_ascii=False),
+            'idempotency_key': idempotency_key,
+            'status': 'queued',
+            'attempts': 0,
+            'max_attempts': max_attempts,
+            'run_after': now + timedelta(seconds=delay),
+            'created_at': now,
+        }
+        with self._app.app_context():
+            try:
+                with self._db.engine.begin() as conn:
+                    job_id = conn.execute(
+                        self._db.insert(Job).values(**values).returning(Job.id)
+                    ).scalar()
+            except IntegrityError:
+                with self._db.engine.connect() as conn:
+                    return conn.execute(
+                        self._db.select(Job.id).where(Job.idempotency_key == idempotency_key)
+                    ).scalar()
+        self._ensure_worker()
+        self._wakeup.set()
+        return job_id
+
+    def current_job_id(self):
+        """Shu oqimda bajarilayotgan vazifa ID si (vazifadan tashqarida None)"""
+        return getattr(self._local, 'job_id', None)
+
+    def checkpoint(self, **progress):
+        """
+        Joriy (shu oqimda bajarilayotgan) vazifa payload'iga oraliq holatni qo'shish.
+        Jarayon o'lsa yoki vazifa xato bilan qayta navbatga tushsa, handler shu qiymatlar
+        bilan chaqiriladi. Vazifadan tashqarida chaqirilsa False.
+        """
+        job_id = self.current_job_id()
+        if job_id is None:
+            return False
+        Job = self._model
+        with self._db.engine.begin() as conn:
+            stored = conn.execute(self._db.select(Job.payload).where(Job.id == job_id)).scalar()
+            payload = json.loads(stored or '{}')
+            payload.update(progress)
+            conn.execute(
+                self._db.update(Job).where(Job.id == job_id, Job.worker == self.worker_id)
+                .values(payload=json.dumps(payload, ensure_ascii=False), heartbeat_at=datetime.now())
+            )
+        return True
+
+    def get(self, job_id):
+        """Vazifa holati (dict) yoki None"""
+        job = self._db.session.get(self._model, job_id)
+        return job.to_dict() if job else None
+
+    def recover(self):
+        """Heartbeat'i eskirgan 'running' vazifalarni qayta navbatga qo'yish"""
+        Job = self._model
+        stale_before = datetime.now() - timedelta(seconds=JOB_STALE_AFTER)
+        try:
+            with self._db.engine.begin() as conn:
+                result = conn.execute(
+                    self._db.update(Job)
+                    .where(Job.status == 'running', Job.heartbeat_at < stale_before)
+                    .values(status='queued', worker=None, run_after=datetime.now())
+                )
+            return result.rowcount
+        except Exception as e:
+            print(f"⚠️ Fon vazifalarini tiklashda xato: {e}")
+            return 0
+
+    def stats(self):
+        """Tur va holat bo'yicha vazifalar soni"""
+        Job = self._model
+        rows = self._db.session.query(Job.kind, Job.status, self._db.func.count(Job.id)).group_by(
+            Job.kind, Job.status
+        ).all()
+        counts = {}
+        for kind, status, count in rows:
+            counts.setdefault(kind, {})[status] = count
+        with self._lock:
+            local = dict(self._running)
+        return {'limits': self.limits, 'jobs': counts, 'running_here': len(local), 'worker': self.worker_id}
+
+    # ---------- Worker ----------
+
+    def start(self):
+        """Navbatni qayta ishlovchi oqimni ishga tushirish"""
+        self._ensure_worker()
+
+    def _ensure_worker(self):
+        # Gunicorn fork qilganda har bir worker o'z oqimi va pool'ini yaratadi
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self.worker_id = f"{socket.gethostname()}:{self._pid}"
+            self._running = {}
+            self._executor = ThreadPoolExecutor(
+                max_workers=max(1, sum(self.limits.values())), thread_name_prefix='job'
+            )
+            self._thread = threading.Thread(target=self._run, name='job-queue', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        next_heartbeat = 0.0
+        while True:
+            try:
+                with self._app.app_context():
+                    now = time.monotonic()
+                    if now >= next_heartbeat:
+                        self._heartbeat()
+                        self.recover()
+                        next_heartbeat = now + JOB_HEARTBEAT_INTERVAL
+                    for kind in self._handlers:
+                        self._claim_and_submit(kind)
+            except Exception as e:
+                print(f"⚠️ Fon vazifalari navbati xatosi: {e}")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _free_slots(self, kind):
+        Job = self._model
+        with self._lock:
+            local_free = self.limits[kind] - sum(1 for k in self._running.values() if k == kind)
+        if local_free <= 0:
+            return 0
+        # Boshqa jarayonlarda ishlayotganlarini ham hisobga olish
+        running = self._db.session.query(self._db.func.count(Job.id)).filter(
+            Job.kind == kind, Job.status == 'running'
+        ).scalar()
+        self._db.session.rollback()
+        return max(0, min(local_free, self.limits[kind] - running))
+
+    def _claim_and_submit(self, kind):
+        free = self._free_slots(kind)
+        if not free:
+            return
+        Job = self._model
+        now = datetime.now()
+        with self._db.engine.begin() as conn:
+            candidates = conn.execute(
+                self._db.select(Job.id).where(
+                    Job.kind == kind, Job.status == 'queued', Job.run_after <= now
+                ).order_by(Job.run_after, Job.id).limit(free)
+            ).scalars().all()
+        for job_id in candidates:
+            # Shartli UPDATE — vazifani faqat bitta jarayon oladi
+            with self._db.engine.begin() as conn:
+                claimed = conn.execute(
+                    self._db.update(Job)
+                    .where(Job.id == job_id, Job.status == 'queued')
+                    .values(status='running', worker=self.worker_id, attempts=Job.attempts + 1,
+                            started_at=now, heartbeat_at=now)
+                ).rowcount
+            if claimed:
+                with self._lock:
+                    self._running[job_id] = kind
+                self._executor.submit(self._execute, job_id)
+
+    def _heartbeat(self):
+        with self._lock:
+            job_ids = list(self._running)
+        if not job_ids:
+            return
+        Job = self._model
+        with self._db.engine.begin() as conn:
+            conn.execute(
+                self._db.update(Job).where(Job.id.in_(job_ids), Job.worker == self.worker_id)
+                .values(heartbeat_at=datetime.now())
+            )
+
+    def _execute(self, job_id):
+        Job = self._model
+        try:
+            with self._app.app_context():
+                job = self._db.session.get(Job, job_id)
+                kind, payload = job.kind, json.loads(job.payload or '{}')
+                attempts, max_attempts = job.attempts, job.max_attempts
+                self._db.session.rollback()
+                self._local.job_id = job_id
+                try:
+                    result = self._handlers[kind](**payload)
+                    if result is False:
+                        raise RuntimeError("Vazifa muvaffaqiyatsiz yakunlandi")
+                    self._finish(job_id, result)
+                except Exception as e:
+                    self._db.session.rollback()
+                    self._fail(job_id, e, attempts, max_attempts)
+        finally:
+            self._local.job_id = None
+            with self._lock:
+                self._running.pop(job_id, None)
+            self._wakeup.set()
+
+    def _finish(self, job_id, result):
+        Job = self._model
+        try:
+            stored = json.dumps(result, ensure_ascii=False, default=str)
+        except Exception:
+            stored = json.dumps(str(result), ensure_ascii=False)
+        with self._db.engine.begin() as conn:
+            conn.execute(
+                self._db.update(Job).where(Job.id == job_id)
+                .values(status='succeeded', result=stored, error=None, finished_at=datetime.now())
+            )
+
+    def _fail(self, job_id, error, attempts, max_attempts):
+        Job = self._model
+        now = datetime.now()
+        if attempts < max_attempts:
+            delay = min(_MAX_RETRY_DELAY, JOB_RETRY_BASE_DELAY * 2 ** (attempts - 1))
+            delay *= 1 + random.random() * 0.1
+            values = {'status': 'queued', 'worker': None, 'run_after': now + timedelta(seconds=delay)}
+            print(f"⚠️ Vazifa #{job_id} xato ({attempts}/{max_attempts}), {int(delay)}s dan keyin qayta: {error}")
+        else:
+            values = {'status': 'failed', 'finished_at': now}
+            print(f"❌ Vazifa #{job_id} muvaffaqiyatsiz ({attempts} urinish): {error}")
+        with self._db.engine.begin() as conn:
+            conn.execute(self._db.update(Job).where(Job.id == job_id).values(error=str(error)[:2000], **values))
+
+
+job_queue = JobQueue()
@@ -0,0 +1,169 @@
+# leader_election.py
+"""
+Bir nechta jarayon (gunicorn worker, instance) orasida lider tanlash.
+Faqat lider scheduler'ni ishga tushiradi, qolganlari kutib turadi.
+- PostgreSQL: sessiya darajasidagi advisory lock. Lider jarayon o'lsa,
+  ulanish uziladi va lock avtomatik bo'shaydi.
+- Boshqa bazalar (SQLite): heartbeat bilan yangilanadigan lease qatori.
+  Lider o'lsa, lease muddati tugagach boshqa jarayon egallaydi.
+"""
+import atexit
+import os
+import socket
+import threading
+import time
+import zlib
+from config import SCHEDULER_LEASE_TTL, SCHEDULER_LEADER_CHECK_INTERVAL
+
+
+class LeaderElection:
+    """Nom bo'yicha bitta lider: on_elected/on_demoted callback'lari bilan"""
+
+    def __init__(self, name, ttl=SCHEDULER_LEASE_TTL, interval=SCHEDULER_LEADER_CHECK_INTERVAL):
+        self.name = name
+        self.ttl = ttl
+        self.interval = interval
+        self.holder = None
+        self.is_leader = False
+        self._db = None
+        self._app = None
+        self._conn = None          # PostgreSQL: lock'ni ushlab turgan ulanish
+        self._thread = None
+        self._stop = threading.Event()
+        self._on_elected = None
+        self._on_demoted = None
+
+    def init_app(self, app, db):
+        """Lease jadvalini yaratish (PostgreSQL'da kerak emas)"""
+        self._app = app
+        self._db = db
+        with app.app_context():
+            if self._backend() == 'postgresql':
+                return
+            try:
+                with db.engine.begin() as conn:
+                    conn.execute(db.text(
+                        "CREATE TABLE IF NOT EXISTS scheduler_lease ("
+                        "name VARCHAR(100) PRIMARY KEY, holder VARCHAR(200) NOT NULL, expires_at FLOAT NOT NULL)"
+                    ))
+            except Exception as e:
+                print(f"⚠️ Scheduler lease jadvali: {e}")
+
+    def _backend(self):
+        return self._db.engine.dialect.name
+
+    # ---------- Boshqaruv ----------
+
+    def start(self, on_elected, on_demoted):
+        """Fon oqimida liderlikka urinish va uni saqlab turish"""
+        self._on_elected = on_elected
+        self._on_demoted = on_demoted
+        self.holder = f"{socket.gethostname()}:{os.getpid()}"
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f'leader-{self.name}', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Liderlikni bo'shatish (jarayon to'xtaganda)"""
+        self._stop.set()
+        if self.is_leader:
+            self._set_leader(False)
+        self._release()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with self._app.app_context():
+                    leader = self._try_acquire()
+            except Exception as e:
+                print(f"⚠️ Lider tanlashda xato: {e}")
+                leader = False
+            if leader != self.is_leader:
+                self._set_leader(leader)
+            self._stop.wait(self.interval)
+
+    def _set_leader(self, leader):
+        self.is_leader = leader
+        if leader:
+            print(f"👑 {self.holder} '{self.name}' lideri bo'ldi")
+            callback = self._on_elected
+        else:
+            print(f"⏸️ {self.holder} '{self.name}' liderligini yo'qotdi")
+            callback = self._on_demoted
+        try:
+            callback()
+        except Exception as e:
+            print(f"⚠️ Lider callback xatosi: {e}")
+
+    # ---------- Lock / lease ----------
+
+    def _try_acquire(self):
+        if self._backend() == 'postgresql':
+            return self._try_advisory_lock()
+        return self._try_lease()
+
+    def _try_advisory_lock(self):
+        # Lock allaqachon bizda — ulanish tirikligini tekshiramiz
+        if self._conn is not None:
+            try:
+                self._conn.execute(self._db.text("SELECT 1"))
+                # Autobegin ochgan tranzaksiyani yopamiz: aks holda ulanish "idle in transaction"
+                # bo'lib qoladi va idle_in_transaction_session_timeout uni (lock bilan) uzadi
+                self._conn.commit()
+                return True
+            except Exception:
+                self._close_conn()
+                return False
+        key = zlib.crc32(self.name.encode('utf-8'))
+        conn = self._db.engine.connect()
+        try:
+            acquired = conn.execute(self._db.text("SELECT pg_try_advisory_lock(:key)"), {'key': key}).scalar()
+            conn.commit()
+        except Exception:
+            conn.close()
+            raise
+        if acquired:
+            self._conn = conn
+            return True
+        conn.close()
+        return False
+
+    def _try_lease(self):
+        now = time.time()
+        with self._db.engine.begin() as conn:
+            # Bo'sh, muddati o'tgan yoki o'zimizniki bo'lsa — egallaymiz/uzaytiramiz
+            result = conn.execute(self._db.text(
+                "INSERT INTO scheduler_lease (name, holder, expires_at) VALUES (:name, :holder, :expires_at) "
+                "ON CONFLICT (name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at "
+                "WHERE scheduler_lease.holder = excluded.holder OR scheduler_lease.expires_at < :now"
+            ), {'name': self.name, 'holder': self.holder, 'expires_at': now + self.ttl, 'now': now})
+        return result.rowcount == 1
+
+    def _close_conn(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def _release(self):
+        if self._db is None:
+            return
+        try:
+            if self._conn is not None:
+                key = zlib.crc32(self.name.encode('utf-8'))
+                self._conn.execute(self._db.text("SELECT pg_advisory_unlock(:key)"), {'key': key})
+                self._conn.commit()
+                self._close_conn()
+                return
+            with self._app.app_context():
+                if self._backend() == 'postgresql':
+                    return
+                with self._db.engine.begin() as conn:
+                    conn.execute(self._db.text(
+                        "DELETE FROM scheduler_lease WHERE name = :name AND holder = :holder"
+                    ), {'name': self.name, 'holder': self.holder})
+        except Exception as e:
+            print(f"⚠️ Liderlikni bo'shatishda xato: {e}")
@@ -0,0 +1,281 @@
+# page_cache.py
+"""
+Anonim GET so'rovlar uchun to'liq sahifa keshi.
+Kalit: path + query string. Xotira hajmi bo'yicha cheklangan (LRU).
+Yozuvlar teg'lar (post:ID, category:X, posts, services, portfolio) bo'yicha
+bekor qilinadi. Teg o'zgarishlari bazadagi page_cache_tag jadvaliga ham
+yoziladi, shuning uchun boshqa worker/jarayonlar ham keshni yangilaydi.
+Oqimli (generator) javoblar yuborilish bilan birga yig'iladi va oxirigacha
+o'qilgandan keyin keshlanadi.
+"""
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, session, g, make_response
+from config import PAGE_CACHE_MAX_BYTES, PAGE_CACHE_TTL, PAGE_CACHE_SYNC_INTERVAL
+
+# Jarayonlar orasidagi soat farqi uchun zaxira (soniya)
+_SYNC_SLACK = 5
+
+
+class _Entry:
+    __slots__ = ('body', 'status', 'headers', 'tags', 'meta', 'stored_at', 'size')
+
+    def __init__(self, body, status, headers, tags, meta):
+        self.body = body
+        self.status = status
+        self.headers = headers
+        self.tags = tags
+        self.meta = meta
+        self.stored_at = time.time()
+        self.size = len(body)
+
+
+class PageCache:
+    """LRU sahifa keshi, teg bo'yicha bekor qilish bilan"""
+
+    def __init__(self, max_bytes=PAGE_CACHE_MAX_BYTES, ttl=PAGE_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._tag_keys = {}
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._db = None
+        self._synced_at = time.time()
+        self._next_sync = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # Har bir bekor qilishda oshadi — oqim davomida bekor qilingan javob keshlanmaydi
+        self._generation = 0
+
+    def init_app(self, app, db):
+        """Teg o'zgarishlari jadvalini yaratish"""
+        self._db = db
+        try:
+            with app.app_context():
+                with db.engine.begin() as conn:
+                    conn.execute(db.text(
+                        "CREATE TABLE IF NOT EXISTS page_cache_tag ("
+                        "tag VARCHAR(120) PRIMARY KEY, changed_at FLOAT NOT NULL)"
+                    ))
+                    conn.execute(db.text(
+                        "CREATE INDEX IF NOT EXISTS ix_page_cache_tag_changed_at ON page_cache_tag (changed_at)"
+                    ))
+        except Exception as e:
+            print(f"⚠️ Page cache tag jadvali: {e}")
+
+    # ---------- Kalit va shartlar ----------
+
+    @staticmethod
+    def _make_key():
+        args = '&'.join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+        return f"{request.path}?{args}"
+
+    @staticmethod
+    def _is_cacheable_request():
+        if request.method != 'GET':
+            return False
+        if session.get('logged_in') or session.get('_flashes'):
+            return False
+        return True
+
+    # ---------- Teglar (render paytida) ----------
+
+    def tag(self, *tags):
+        """Joriy sahifaga teg qo'shish (view ichidan chaqiriladi)"""
+        g.setdefault('page_cache_tags', set()).update(tags)
+
+    def set_meta(self, **meta):
+        """Kesh yozuviga qo'shimcha ma'lumot (masalan post_id) biriktirish"""
+        g.setdefault('page_cache_meta', {}).update(meta)
+
+    # ---------- Saqlash / o'qish ----------
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self.ttl and time.time() - entry.stored_at > self.ttl:
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _put(self, key, entry):
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            for tag in entry.tags:
+                self._tag_keys.setdefault(tag, set()).add(key)
+            while self._bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+
+    def _store_streamed(self, key, chunks, generation, headers, tags, meta):
+        """
+        Oqimni o'zgartirmasdan uzatib, qismlarni yig'ish. Javob oxirigacha yuborilsa,
+        max_bytes dan oshmasa va render boshlanganidan beri bekor qilish bo'lmasa — keshlanadi
+        """
+        parts = []
+        size = 0
+        try:
+            for chunk in chunks:
+                if parts is not None:
+                    data = chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+                    size += len(data)
+                    parts.append(data)
+                    if size > self.max_bytes:
+                        parts = None
+                yield chunk
+        finally:
+            # Mijoz uzilsa ham ichki oqim (stream_with_context) yopiladi
+            close = getattr(chunks, 'close', None)
+            if close:
+                close()
+        if parts is not None and generation == self._generation:
+            self._put(key, _Entry(b''.join(parts), 200, headers, tags, meta))
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= entry.size
+        for tag in entry.tags:
+            keys = self._tag_keys.get(tag)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_keys[tag]
+
+    def _drop_tags(self, tags):
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for key in list(self._tag_keys.get(tag, ())):
+                    self._drop(key)
+
+    # ---------- Bekor qilish ----------
+
+    def invalidate(self, *tags):
+        """Teg'lar bo'yicha keshni bekor qilish (barcha worker'lar uchun)"""
+        tags = [tag for tag in tags if tag]
+        if not tags:
+            return
+        self.invalidations += 1
+        self._drop_tags(tags)
+        if self._db is None:
+            return
+        try:
+            with self._db.engine.begin() as conn:
+                conn.execute(self._db.text(
+                    "INSERT INTO page_cache_tag (tag, changed_at) VALUES (:tag, :changed_at) "
+                    "ON CONFLICT (tag) DO UPDATE SET changed_at = excluded.changed_at"
+                ), [{'tag': tag, 'changed_at': time.time()} for tag in tags])
+        except Exception as e:
+            print(f"⚠️ Page cache invalidation yozilmadi: {e}")
+
+    def tag_versions(self, *tags):
+        """Teg'larning oxirgi o'zgarish vaqti (versiya hisoblagichi sifatida)"""
+        if self._db is None or not tags:
+            return {}
+        try:
+            with self._db.engine.connect() as conn:
+                rows = conn.execute(
+                    self._db.text("SELECT tag, changed_at FROM page_cache_tag WHERE tag IN :tags")
+                    .bindparams(self._db.bindparam('tags', expanding=True)),
+                    {'tags': list(tags)}
+                ).all()
+            return {tag: changed_at for tag, changed_at in rows}
+        except Exception as e:
+            print(f"⚠️ Teg versiyalarini o'qishda xato: {e}")
+            return {}
+
+    def clear(self):
+        """Butun keshni tozalash"""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._tag_keys.clear()
+            self._bytes = 0
+
+    def _sync(self):
+        """Boshqa jarayonlarda bekor qilingan teg'larni qo'llash"""
+        now = time.time()
+        if self._db is None or now < self._next_sync:
+            return
+        self._next_sync = now + PAGE_CACHE_SYNC_INTERVAL
+        try:
+            with self._db.engine.connect() as conn:
+                rows = conn.execute(self._db.text(
+                    "SELECT tag FROM page_cache_tag WHERE changed_at > :since"
+                ), {'since': self._synced_at - _SYNC_SLACK}).all()
+            self._synced_at = now
+            if rows:
+                self._drop_tags([row[0] for row in rows])
+        except Exception as e:
+            print(f"⚠️ Page cache sync xatosi: {e}")
+
+    # ---------- Dekorator ----------
+
+    def cached(self, *static_tags, on_hit=None):
+        """View natijasini keshlash. on_hit(meta) — keshdan berilganda chaqiriladi"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self._is_cacheable_request():
+                    return view(*args, **kwargs)
+
+                self._sync()
+                key = self._make_key()
+                entry = self._get(key)
+                if entry is not None:
+                    self.hits += 1
+                    if on_hit:
+                        on_hit(entry.meta)
+                    response = make_response(entry.body, entry.status)
+                    response.headers.update(entry.headers)
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                self.misses += 1
+                generation = self._generation
+                response = make_response(view(*args, **kwargs))
+                response.headers['X-Cache'] = 'MISS'
+                if response.status_code == 200 and not session.modified and not response.direct_passthrough:
+                    tags = set(static_tags) | g.get('page_cache_tags', set())
+                    headers = {'Content-Type': response.headers.get('Content-Type', 'text/html; charset=utf-8')}
+                    meta = g.get('page_cache_meta', {})
+                    if response.is_streamed:
+                        response.response = self._store_streamed(
+                            key, response.response, generation, headers, tags, meta
+                        )
+                    else:
+                        self._put(key, _Entry(response.get_data(), 200, headers, tags, meta))
+                return response
+            return wrapper
+        return decorator
+
+    def stats(self):
+        """Hit/miss statistikasi"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0,
+                'invalidations': self.invalidations,
+            }
+
+
+page_cache = PageCache()
@@ -0,0 +1,253 @@
+# publish_pipeline.py
+"""
+Post nashr qilish konveyeri: generate → enrich → persist → announce → notify.
+- Har bir bosqich o'z navbati va worker oqimlari bilan ishlaydi (PIPELINE_WORKERS)
+- generate (AI matn) va enrich (rasm) parallel boshlanadi, persist ikkalasini kutadi
+- persist — bitta commit; shundan keyingi bosqich xatolari generatsiyani qayta
+  ishga tushirmaydi (faqat qayd etiladi va keyingi bosqichga o'tiladi)
+- Har bir bosqich uchun vaqt metrikalari (o'rtacha, p95, maksimum)
+- Kutish vaqti bosqich timeout'laridan olinadi (PIPELINE_STAGE_TIMEOUTS); muddati
+  o'tgan post tashlab ketiladi — kechikkan worker uni saqlamaydi
+"""
+import os
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from config import PIPELINE_WORKERS, PIPELINE_STAGE_RETRIES, PIPELINE_STAGE_TIMEOUTS
+
+# Parallel boshlanadigan bosqichlar va ulardan keyingi ketma-ket bosqichlar
+PARALLEL_STAGES = ('generate', 'enrich')
+SEQUENTIAL_STAGES = ('persist', 'announce', 'notify')
+STAGES = PARALLEL_STAGES + SEQUENTIAL_STAGES
+# Shu bosqich muvaffaqiyatli tugagach natija tayyor hisoblanadi
+COMMIT_STAGE = 'persist'
+
+# p95 hisoblash uchun saqlanadigan oxirgi o'lchovlar
+_TIMING_WINDOW = 200
+
+
+class PipelineItem:
+    """Konveyerdan o'tayotgan bitta post: kirish ma'lumoti, natijalar va vaqtlar"""
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.data = {}
+        self.errors = {}
+        self.timings = {}
+        self.ok = False
+        self.persisted = threading.Event()
+        self.done = threading.Event()
+        self.started = time.monotonic()
+        self.abandoned = False
+        self.committed = False
+        self._lock = threading.Lock()
+        self._pending = len(PARALLEL_STAGES)
+
+    def wait(self, timeout=None):
+        """
+        persist tugashini kutish; post saqlangan bo'lsa True.
+        Muddat o'tsa post tashlab ketiladi va TimeoutError ko'tariladi (worker oqimi
+        o'lgan yoki osilib qolgan) — kutayotgan vazifa abadiy osilib qolmaydi
+        """
+        if self.persisted.wait(timeout):
+            return self.ok
+        with self._lock:
+            # Commit aynan muddat chegarasida tugagan — post bor, natija item.data'da
+            if self.committed:
+                return True
+            self.abandoned = True
+        raise TimeoutError(f"Post {timeout:.0f}s ichida saqlanmadi (konveyer javob bermayapti)")
+
+    @contextmanager
+    def committing(self):
+        """
+        persist bosqichi commit'ni shu blok ichida bajaradi. wait() bilan bitta lock ostida:
+        kutuvchi voz kechgan bo'lsa commit qilinmaydi, commit boshlangan bo'lsa voz kechmaydi
+        """
+        with self._lock:
+            if self.abandoned:
+                raise RuntimeError("Post tashlab ketilgan (kutish muddati o'tdi)")
+            yield
+            self.committed = True
+
+
+class StageMetrics:
+    """Bosqich statistikasi"""
+
+    def __init__(self):
+        self.processed = 0
+        self.failed = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=_TIMING_WINDOW)
+
+    def record(self, seconds, ok):
+        self.processed += 1
+        if not ok:
+            self.failed += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def to_dict(self):
+        recent = sorted(self.recent)
+        p95 = recent[min(len(recent) - 1, int(len(recent) * 0.95))] if recent else 0.0
+        return {
+            'processed': self.processed,
+            'failed': self.failed,
+            'avg_ms': round(self.total / self.processed * 1000, 1) if self.processed else 0.0,
+            'p95_ms': round(p95 * 1000, 1),
+            'max_ms': round(self.max * 1000, 1),
+        }
+
+
+class PublishPipeline:
+    """Bosqichlar navbatlar orqali bog'langan, jarayon ichidagi konveyer"""
+
+    def __init__(self, workers=PIPELINE_WORKERS, retries=PIPELINE_STAGE_RETRIES,
+                 timeouts=PIPELINE_STAGE_TIMEOUTS):
+        self.workers = {stage: max(1, workers.get(stage, 1)) for stage in STAGES}
+        self.retries = dict(retries)
+        self.timeouts = dict(timeouts)
+        self._handlers = {}
+        self._queues = {}
+        self._metrics = {stage: StageMetrics() for stage in STAGES}
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+
+    def register(self, stage, handler):
+        """Bosqich bajaruvchisi: handler(item) — item.data ni to'ldiradi, xatoda exception"""
+        if stage not in STAGES:
+            raise ValueError(f"Noma'lum bosqich: {stage}")
+        self._handlers[stage] = handler
+
+    def submit(self, **payload):
+        """Postni konveyerga qo'yish, PipelineItem qaytaradi"""
+        self._ensure_workers()
+        item = PipelineItem(payload)
+        for stage in PARALLEL_STAGES:
+            self._queues[stage].put(item)
+        return item
+
+    def commit_timeout(self):
+        """Post saqlanishigacha kutish muddati: parallel bosqichlarning eng uzuni + persist"""
+        parallel = max(self.timeouts.get(stage, 0) for stage in PARALLEL_STAGES)
+        return parallel + self.timeouts.get(COMMIT_STAGE, 0) or None
+
+    def stats(self):
+        """Bosqichlar bo'yicha worker soni, navbat uzunligi va vaqtlar"""
+        with self._lock:
+            return {
+                stage: dict(
+                    self._metrics[stage].to_dict(),
+                    workers=self.workers[stage],
+                    queued=self._queues[stage].qsize() if stage in self._queues else 0,
+                )
+                for stage in STAGES
+            }
+
+    # ---------- Worker'lar ----------
+
+    def _ensure_workers(self):
+        # Gunicorn fork qilganda har bir jarayon o'z oqimlarini yaratadi
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._queues = {stage: queue.Queue() for stage in STAGES}
+            self._threads = []
+            for stage in STAGES:
+                for n in range(self.workers[stage]):
+                    thread = threading.Thread(
+                        target=self._work, args=(stage,), name=f'pipeline-{stage}-{n}', daemon=True
+                    )
+                    thread.start()
+                    self._threads.append(thread)
+
+    def _work(self, stage):
+        jobs = self._queues[stage]
+        while True:
+            item = jobs.get()
+            try:
+                self._run_stage(stage, item)
+            except Exception as e:
+                print(f"⚠️ Konveyer xatosi ({stage}): {e}")
+                self._fail(item)
+
+    def _run_stage(self, stage, item):
+        # Kutuvchi voz kechgan — saqlashgacha bo'lgan ishni davom ettirmaymiz
+        if item.abandoned and (stage in PARALLEL_STAGES or stage == COMMIT_STAGE):
+            item.errors[stage] = 'tashlab ketildi (kutish muddati o\'tdi)'
+            self._advance(stage, item, False)
+            return
+        handler = self._handlers.get(stage)
+        attempts = 1 + self.retries.get(stage, 0)
+        started = time.monotonic()
+        ok = True
+        if handler is not None:
+            for attempt in range(attempts):
+                try:
+                    handler(item)
+                    item.errors.pop(stage, None)
+                    ok = True
+                    break
+                except Exception as e:
+                    ok = False
+                    item.errors[stage] = str(e)
+                    print(f"⚠️ {stage} bosqichi xato ({attempt + 1}/{attempts}): {e}")
+                    if attempt + 1 < attempts:
+                        time.sleep(2 ** attempt)
+        elapsed = time.monotonic() - started
+        item.timings[stage] = elapsed
+        with self._lock:
+            self._metrics[stage].record(elapsed, ok)
+        self._advance(stage, item, ok)
+
+    def _advance(self, stage, item, ok):
+        if stage in PARALLEL_STAGES:
+            with self._lock:
+                item._pending -= 1
+                ready = item._pending == 0
+            if ready:
+                # Parallel bosqichlardan birortasi muvaffaqiyatsiz — post saqlanmaydi
+                if any(name in item.errors for name in PARALLEL_STAGES):
+                    self._fail(item)
+                else:
+                    self._queues[SEQUENTIAL_STAGES[0]].put(item)
+            return
+
+        if stage == COMMIT_STAGE:
+            if not ok:
+                self._fail(item)
+                return
+            item.ok = True
+            item.persisted.set()
+
+        # persist'dan keyingi xatolar keyingi bosqichni to'xtatmaydi
+        position = SEQUENTIAL_STAGES.index(stage)
+        if position + 1 < len(SEQUENTIAL_STAGES):
+            self._queues[SEQUENTIAL_STAGES[position + 1]].put(item)
+        else:
+            self._complete(item)
+
+    def _fail(self, item):
+        item.ok = False
+        item.persisted.set()
+        self._complete(item)
+
+    def _complete(self, item):
+        if item.done.is_set():
+            return
+        item.done.set()
+        timings = ' | '.join(f"{stage} {seconds:.1f}s" for stage, seconds in item.timings.items())
+        total = time.monotonic() - item.started
+        status = "✅" if item.ok and not item.errors else ("⚠️" if item.ok else "❌")
+        print(f"⏱️ {status} Konveyer {total:.1f}s: {timings}")
+
+
+publish_pipeline = PublishPipeline()
@@ -0,0 +1,353 @@
+# push_delivery.py
+"""
+Web Push xabarlarini parallel va bir tekis (paced) yetkazish.
+- Cheklangan worker pool (PUSH_MAX_WORKERS)
+- Har bir push xizmati (FCM, Mozilla, Apple) uchun keep-alive HTTP sessiya
+- VAPID kalit bir marta o'qiladi, VAPID JWT har bir audience uchun muddati tugaguncha keshlanadi
+- 404/410 qaytargan obunalar bitta DELETE bilan o'chiriladi
+- Partiya token-bucket bilan PUSH_DELIVERY_WINDOW oralig'iga yoyiladi, shunda
+  hamma obunachi bir vaqtda saytga kirib serverni bosib qolmaydi
+- TTL va Topic sarlavhalari: oflayn qurilmaga bir xil topic'dagi faqat oxirgi xabar yetadi
+- DeliveryBatch.cursor — ID bo'yicha tartiblangan obunalardan qaysigacha yuborish yakunlangani;
+  fon vazifasi uni saqlab, qayta ishga tushishda qolganidan davom ettiradi
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from config import (
+    VAPID_PRIVATE_KEY, VAPID_CLAIMS_SUB,
+    PUSH_MAX_WORKERS, PUSH_TIMEOUT, PUSH_VAPID_TTL,
+    PUSH_DELIVERY_WINDOW, PUSH_MIN_RATE, PUSH_BURST, PUSH_TTL
+)
+from rate_limit import TokenBucket
+
+# JWT muddati tugashidan shuncha oldin yangisi imzolanadi (soniya)
+_VAPID_RENEW_MARGIN = 300
+# Bu statuslar obuna endi mavjud emasligini bildiradi
+_GONE_STATUSES = (404, 410)
+# Dispetcher navbat bo'sh bo'lmaganda eng uzoq kutish (soniya)
+_DISPATCH_TICK = 0.5
+# O'lchangan yuborish tezligi shu oxirgi oraliq bo'yicha hisoblanadi (soniya)
+_RATE_WINDOW = 60
+
+
+class DeliveryBatch:
+    """Bitta xabarning obunachilarga yetkazilishi"""
+
+    def __init__(self, subscriptions, payload, topic, ttl, window):
+        self.items = deque(subscriptions)
+        self.total = len(self.items)
+        self.data = json.dumps(payload)
+        self.topic = topic
+        self.ttl = ttl
+        self.bucket = TokenBucket(max(self.total / window, PUSH_MIN_RATE), PUSH_BURST) if window else None
+        self.superseded = set()   # shu topic'dagi yangi xabarni oladigan obunalar
+        self.sent = 0
+        self.failed = 0
+        self.collapsed = 0
+        self.gone = []
+        self.pending = 0
+        self.cursor = None        # shu ID gacha (shu jumladan) barcha obunalar yakunlangan
+        self._order = deque()     # yuborishga olingan ID'lar, navbat tartibida
+        self._settled = set()     # yakunlangan, lekin cursor hali yetmagan ID'lar
+        self.dispatched = False
+        self.started = time.monotonic()
+        self.report = None
+        self.done = threading.Event()
+
+    def wait(self, timeout=None):
+        """Yetkazish tugashini kutish, hisobotni qaytarish"""
+        self.done.wait(timeout)
+        return self.report
+
+    def take(self):
+        """Navbatdagi obunani yuborishga olish (dvigatel qulfi ostida)"""
+        subscription = self.items.popleft()
+        self._order.append(subscription[0])
+        return subscription
+
+    def settle(self, sub_id):
+        """Obuna yakunlandi (yuborildi, xato yoki almashtirildi) — cursor'ni surish (dvigatel qulfi ostida)"""
+        self._settled.add(sub_id)
+        while self._order and self._order[0] in self._settled:
+            self.cursor = self._order.popleft()
+            self._settled.discard(self.cursor)
+
+
+class PushDeliveryEngine:
+    """Obunachilarga push xabarlarni bir tekis, parallel yuboruvchi dvigatel"""
+
+    def __init__(self, max_workers=PUSH_MAX_WORKERS, timeout=PUSH_TIMEOUT):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._executor = None
+        self._dispatcher = None
+        self._pid = None
+        self._active = []      # yuborilayotgan partiyalar
+        self._topics = {}      # topic -> oxirgi partiya
+        self._in_flight = 0
+        self._completed = deque()   # oxirgi _RATE_WINDOW dagi tugagan so'rovlar vaqti
+        self._vapid = None
+        self._jwt_cache = {}   # audience -> (headers, expires_at)
+        self._sessions = {}    # origin -> requests.Session
+        self._app = None
+        self._db = None
+        self._model = None
+        self._dependents = ()
+        self.last_report = None
+
+    def init_app(self, app, db, model, dependents=()):
+        """
+        SQLAlchemy va PushSubscription modeli bilan bog'lash.
+        dependents — obuna o'chirilganda tozalanadigan FK ustunlari.
+        """
+        self._app = app
+        self._db = db
+        self._model = model
+        self._dependents = dependents
+
+    # ---------- Resurslar (bir marta yaratiladi) ----------
+
+    def _ensure_workers(self):
+        # Gunicorn fork qilganda har bir worker o'z pool va dispetcherini yaratadi
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid() and self._dispatcher.is_alive():
+                return
+            self._pid = os.getpid()
+            self._sessions = {}
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='push')
+            self._dispatcher = threading.Thread(target=self._run, name='push-dispatcher', daemon=True)
+            self._dispatcher.start()
+
+    def _get_vapid(self):
+        with self._lock:
+            if self._vapid is None:
+                from py_vapid import Vapid
+                key = str(VAPID_PRIVATE_KEY or '').strip()
+                if os.path.isfile(key):
+                    self._vapid = Vapid.from_file(private_key_file=key)
+                elif '-----BEGIN' in key:
+                    self._vapid = Vapid.from_pem(key.encode('utf-8'))
+                else:
+                    self._vapid = Vapid.from_string(private_key=key)
+            return self._vapid
+
+    def _vapid_headers(self, audience):
+        """Audience (push xizmati origin'i) uchun keshlangan VAPID sarlavhalari"""
+        now = time.time()
+        cached = self._jwt_cache.get(audience)
+        if cached and cached[1] - _VAPID_RENEW_MARGIN > now:
+            return cached[0]
+        expires_at = int(now) + PUSH_VAPID_TTL
+        claims = {'sub': VAPID_CLAIMS_SUB, 'aud': audience, 'exp': expires_at}
+        headers = self._get_vapid().sign(claims)
+        self._jwt_cache[audience] = (headers, expires_at)
+        return headers
+
+    def _session(self, origin):
+        """Push xizmati origin'i uchun qayta ishlatiladigan HTTP sessiya"""
+        with self._lock:
+            session = self._sessions.get(origin)
+            if session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._sessions[origin] = session
+            return session
+
+    # ---------- Navbatga qo'yish ----------
+
+    def enqueue(self, subscriptions, payload, topic=None, ttl=PUSH_TTL, window=PUSH_DELIVERY_WINDOW):
+        """
+        Xabarni fonda, window soniyaga yoyib yuborish (window=0 — kutmasdan).
+        subscriptions — (id, endpoint, p256dh, auth) qatorlari.
+        topic — shu topic'dagi hali yuborilmagan eski xabar yangisi bilan almashtiriladi.
+        """
+        batch = DeliveryBatch(subscriptions, payload, topic, ttl, window)
+        with self._lock:
+            if topic:
+                previous = self._topics.get(topic)
+                if previous is not None and not previous.dispatched:
+                    previous.superseded.update(sub[0] for sub in subscriptions)
+                self._topics[topic] = batch
+            self._active.append(batch)
+        self._ensure_workers()
+        self._wakeup.set()
+        return batch
+
+    def deliver(self, subscriptions, payload, topic=None, ttl=PUSH_TTL, window=PUSH_DELIVERY_WINDOW):
+        """enqueue() va tugashini kutish. Natija: hisobot"""
+        return self.enqueue(subscriptions, payload, topic, ttl, window).wait()
+
+    # ---------- Dispetcher ----------
+
+    def _run(self):
+        while True:
+            with self._lock:
+                batches = list(self._active)
+            if not batches:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            delay = _DISPATCH_TICK
+            for batch in batches:
+                while batch.items and (batch.bucket is None or batch.bucket.try_acquire()):
+                    with self._lock:
+                        subscription = batch.take()
+                    self._dispatch(batch, subscription)
+                if batch.items:
+                    delay = min(delay, batch.bucket.wait_time())
+                else:
+                    self._mark_dispatched(batch)
+            self._wakeup.wait(delay)
+            self._wakeup.clear()
+
+    def _dispatch(self, batch, subscription):
+        sub_id, endpoint, p256dh, auth = subscription
+        if sub_id in batch.superseded:
+            with self._lock:
+                batch.collapsed += 1
+                batch.settle(sub_id)
+            return
+        url = urlparse(endpoint)
+        origin = f"{url.scheme}://{url.netloc}"
+        try:
+            headers = dict(self._vapid_headers(origin))
+        except Exception as e:
+            print(f"VAPID error: {e}")
+            with self._lock:
+                batch.failed += 1
+                batch.settle(sub_id)
+            return
+        if batch.topic:
+            headers['Topic'] = batch.topic
+        subscription_info = {'endpoint': endpoint, 'keys': {'p256dh': p256dh, 'auth': auth}}
+        with self._lock:
+            batch.pending += 1
+            self._in_flight += 1
+        future = self._executor.submit(
+            self._send_one, subscription_info, batch.data, headers, batch.ttl, self._session(origin)
+        )
+        future.add_done_callback(lambda f: self._on_sent(batch, sub_id, f))
+
+    def _send_one(self, subscription_info, data, headers, ttl, session):
+        """Bitta obunaga yuborish: 'sent', 'gone' yoki 'failed'"""
+        from pywebpush import WebPusher
+        try:
+            response = WebPusher(subscription_info, requests_session=session).send(
+                data, headers, ttl=ttl, timeout=self.timeout
+            )
+        except Exception as e:
+            print(f"Individual push error: {e}")
+            return 'failed'
+        if response.status_code in _GONE_STATUSES:
+            return 'gone'
+        if response.status_code > 202:
+            print(f"Push failed: {response.status_code} {response.reason}")
+            return 'failed'
+        return 'sent'
+
+    def _trim_completed(self, now):
+        while self._completed and now - self._completed[0] > _RATE_WINDOW:
+            self._completed.popleft()
+
+    def _on_sent(self, batch, sub_id, future):
+        status = 'failed' if future.exception() else future.result()
+        with self._lock:
+            now = time.monotonic()
+            self._completed.append(now)
+            self._trim_completed(now)
+            self._in_flight -= 1
+            batch.pending -= 1
+            if status == 'sent':
+                batch.sent += 1
+            elif status == 'gone':
+                batch.gone.append(sub_id)
+            else:
+                batch.failed += 1
+            batch.settle(sub_id)
+            finished = batch.dispatched and batch.pending == 0
+        if finished:
+            self._finish(batch)
+
+    def _mark_dispatched(self, batch):
+        with self._lock:
+            if batch.dispatched:
+                return
+            batch.dispatched = True
+            self._active.remove(batch)
+            if batch.topic and self._topics.get(batch.topic) is batch:
+                del self._topics[batch.topic]
+            finished = batch.pending == 0
+        if finished:
+            self._finish(batch)
+
+    def _finish(self, batch):
+        with self._app.app_context():
+            pruned = self.prune(batch.gone)
+        duration = time.monotonic() - batch.started
+        attempted = batch.sent + batch.failed + len(batch.gone)
+        batch.report = {
+            'total': batch.total,
+            'sent': batch.sent,
+            'failed': batch.failed,
+            'collapsed': batch.collapsed,
+            'pruned': pruned,
+            'duration': round(duration, 3),
+            # O'rtacha tezlik — partiya PUSH_DELIVERY_WINDOW ga yoyilganini ko'rsatadi
+            'rate': round(attempted / duration, 2) if duration else 0.0,
+        }
+        self.last_report = batch.report
+        print(f"🔔 Push: {batch.sent}/{batch.total} yuborildi, {batch.failed} xato, "
+              f"{batch.collapsed} almashtirildi, {pruned} o'chirildi ({batch.report['duration']}s)")
+        batch.done.set()
+
+    # ---------- Tozalash va holat ----------
+
+    def prune(self, subscription_ids):
+        """Yaroqsiz obunalarni bitta so'rov bilan o'chirish"""
+        if not subscription_ids or self._db is None:
+            return 0
+        try:
+            for column in self._dependents:
+                self._db.session.execute(self._db.delete(column.table).where(column.in_(subscription_ids)))
+            result = self._db.session.execute(
+                self._db.delete(self._model).where(self._model.id.in_(subscription_ids))
+            )
+            self._db.session.commit()
+            return result.rowcount
+        except Exception as e:
+            self._db.session.rollback()
+            print(f"⚠️ Obunalarni o'chirishda xato: {e}")
+            return 0
+
+    def stats(self):
+        """
+        Yuborish tezligi (xabar/soniya): rate — oxirgi _RATE_WINDOW da tugagan so'rovlar
+        bo'yicha o'lchangan, configured_rate — faol partiyalar token-bucket'lari yig'indisi.
+        Navbat va jarayondagi so'rovlar ham qaytariladi
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._trim_completed(now)
+            return {
+                'active_batches': len(self._active),
+                'queued': sum(len(batch.items) for batch in self._active),
+                'in_flight': self._in_flight,
+                'rate': round(len(self._completed) / _RATE_WINDOW, 2),
+                'configured_rate': round(sum(batch.bucket.rate for batch in self._active if batch.bucket), 2),
+                'last_report': self.last_report,
+            }
+
+
+push_engine = PushDeliveryEngine()
@@ -0,0 +1,36 @@
+# rate_limit.py
+"""
+Umumiy tezlik cheklagichi (token bucket).
+- push_delivery — partiyani PUSH_DELIVERY_WINDOW oralig'iga yoyish
+- gemini_pool — har bir slot uchun GEMINI_RPM chegarasi
+Oqim xavfsizligi chaqiruvchi zimmasida (har ikkisi o'z lock'i ostida ishlatadi)
+"""
+import time
+
+
+class TokenBucket:
+    """Soniyasiga `rate` ta, eng ko'pi bilan `capacity` ta zaxira bilan"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self):
+        """Token bo'lsa oladi va True qaytaradi (kutmaydi)"""
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def wait_time(self):
+        """Keyingi token uchun kutish vaqti (soniya)"""
+        self._refill()
+        return max(0.0, (1 - self._tokens) / self.rate)
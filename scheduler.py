@@ -5,256 +5,695 @@ TrendoAI uchun moslashtirilgan.
 Har soatda 06:00 dan 22:00 gacha post chiqaradi.
 """
 from apscheduler.schedulers.background import BackgroundScheduler
-from ai_generator import generate_post_for_seo
+from apscheduler.schedulers.blocking import BlockingScheduler
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.events import EVENT_SCHEDULER_START
+from ai_generator import generate_post_for_seo, quota_backoff_remaining
 from telegram_poster import send_to_telegram_channel
-from config import SITE_URL, TIMEZONE, CATEGORIES
+from config import (
+    SITE_URL, TIMEZONE, CATEGORIES, SCHEDULER_MISFIRE_GRACE, SCHEDULER_JOBSTORE_TABLE,
+    PUBLISH_HOURS, DRAFT_BUFFER_SIZE, DRAFT_BUFFER_MIN, DRAFT_OFFPEAK_HOURS,
+    DRAFT_FILL_INTERVAL, DRAFT_MAX_ATTEMPTS, DRAFT_PUBLISH_TOLERANCE, DUPLICATE_MAX_REGENERATIONS
+)
+from text_normalizer import unique_topics
+from leader_election import LeaderElection
+from publish_pipeline import publish_pipeline
+from topic_rotation import topic_rotation
+import json
+import pickle
 import random
-from datetime import datetime
+import signal
+from types import SimpleNamespace
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
 
 # 80/20 QOIDASI BO'YICHA MAVZULAR (2026-YIL UCHUN YANGILANDI)
 # 80% - Mijozga qiymat beradigan foydali ma'lumotlar
 # 20% - Xizmatlarimiz haqida yengil eslatmalar
 
-TOPICS = [
+# Boshlang'ich mavzular: (kategoriya, mavzu). Bazadagi topic jadvali bo'sh bo'lsa shular
+# bilan to'ldiriladi; keyin mavzular admin paneldan qo'shiladi (deploy kerak emas).
+TOPIC_SEED = [
     # ============ AI AGENTLAR (2026 TREND) ============
-    "AI Agent nima: Sun'iy intellekt agentlari haqida to'liq qo'llanma 2026",
-    "CrewAI bilan multi-agent tizim yaratish: Amaliy loyiha",
-    "LangChain Agents: Aqlli AI yordamchi yaratish bosqichma-bosqich",
-    "AutoGPT va AgentGPT: Avtonom AI tizimlar qanday ishlaydi",
-    "AI Agent + Telegram Bot: Aqlli biznes assistenti yaratish",
-    "RAG (Retrieval-Augmented Generation): Ma'lumotlar bazasi bilan AI",
-    "AI Agent ish oqimlarini avtomatlashtirish: Real misollar",
-    "Multi-agent arxitektura 2026: AI Agentlar Hamkorligi",
-    "AI Agent xavfsizligi: Risklar va himoya usullari",
-    "Biznes uchun AI Agent: Xarajatlarni 70% kamaytirish",
-    
+    ('AI Chatbotlar', [
+        "AI Agent nima: Sun'iy intellekt agentlari haqida to'liq qo'llanma 2026",
+        "CrewAI bilan multi-agent tizim yaratish: Amaliy loyiha",
+        "LangChain Agents: Aqlli AI yordamchi yaratish bosqichma-bosqich",
+        "AutoGPT va AgentGPT: Avtonom AI tizimlar qanday ishlaydi",
+        "AI Agent + Telegram Bot: Aqlli biznes assistenti yaratish",
+        "RAG (Retrieval-Augmented Generation): Ma'lumotlar bazasi bilan AI",
+        "AI Agent ish oqimlarini avtomatlashtirish: Real misollar",
+        "Multi-agent arxitektura 2026: AI Agentlar Hamkorligi",
+        "AI Agent xavfsizligi: Risklar va himoya usullari",
+        "Biznes uchun AI Agent: Xarajatlarni 70% kamaytirish",
+    ]),
     # ============ YANGI AI MODELLARI (2026 YIL - REAL) ============
-    "GPT-5.2 vs Gemini 3 vs Claude Opus 4.5: 2026 yil eng kuchli AI modellari",
-    "GPT-5.2 Thinking: OpenAI ning yangi reasoning modeli qanday ishlaydi",
-    "Gemini 3 Pro va Deep Think: Google ning eng yangi AI modellari",
-    "Claude Opus 4.5: Anthropic ning coding va reasoning ustasi",
-    "Gemini 3 Flash Preview: Tezkor va arzon AI yechim 2026",
-    "OpenAI o1 vs GPT-5.2: Mantiqiy fikrlash modellarini solishtirish",
-    "Claude Sonnet 4.5 vs Claude Haiku 4.5: Qaysi biri sizga mos",
-    "AI modellarni tanlash 2026: Biznes ehtiyojlariga mos AI",
-    "Fine-tuning vs RAG: Qaysi usul sizga mos?",
-
-    
+    ("Texnik Yo'riqnomalar", [
+        "GPT-5.2 vs Gemini 3 vs Claude Opus 4.5: 2026 yil eng kuchli AI modellari",
+        "GPT-5.2 Thinking: OpenAI ning yangi reasoning modeli qanday ishlaydi",
+        "Gemini 3 Pro va Deep Think: Google ning eng yangi AI modellari",
+        "Claude Opus 4.5: Anthropic ning coding va reasoning ustasi",
+        "Gemini 3 Flash Preview: Tezkor va arzon AI yechim 2026",
+        "OpenAI o1 vs GPT-5.2: Mantiqiy fikrlash modellarini solishtirish",
+        "Claude Sonnet 4.5 vs Claude Haiku 4.5: Qaysi biri sizga mos",
+        "AI modellarni tanlash 2026: Biznes ehtiyojlariga mos AI",
+        "Fine-tuning vs RAG: Qaysi usul sizga mos?",
+    ]),
     # ============ WEB SAYTLAR (80% QIYMAT) ============
-    "2026-yil Landing page trendlari: Konversiyani 2x oshirish",
-    "Next.js 15 bilan professional sayt yaratish",
-    "Veb-sayt tezligi optimizatsiyasi: Core Web Vitals 2026",
-    "SEO 2026: Google AI Overview va yangi qoidalar",
-    "E-commerce sayt: Uzum, Wildberries integratsiyasi",
-    "Progressive Web App (PWA): Sayt-ilova yaratish",
-    "Headless CMS: Strapi, Sanity bilan ishlash",
-    "Veb-sayt xavfsizligi 2026: Zamonaviy himoya usullari",
-    
+    ('Web Saytlar', [
+        "2026-yil Landing page trendlari: Konversiyani 2x oshirish",
+        "Next.js 15 bilan professional sayt yaratish",
+        "Veb-sayt tezligi optimizatsiyasi: Core Web Vitals 2026",
+        "SEO 2026: Google AI Overview va yangi qoidalar",
+        "E-commerce sayt: Uzum, Wildberries integratsiyasi",
+        "Progressive Web App (PWA): Sayt-ilova yaratish",
+        "Headless CMS: Strapi, Sanity bilan ishlash",
+        "Veb-sayt xavfsizligi 2026: Zamonaviy himoya usullari",
+    ]),
     # ============ TELEGRAM BOTLAR (80% QIYMAT) ============
-    "Telegram Bot 2026: Yangi API imkoniyatlari",
-    "Telegram Mini App 2.0: Web ilovalar evolyutsiyasi",
-    "AI-powered Telegram bot: Gemini integratsiyasi",
-    "Telegram botda to'lov: Click, Payme, Uzum Pay",
-    "Telegram bot + CRM: Mijozlarni avtomatik boshqarish",
-    "Telegram bot monetizatsiya: Premium funksiyalar sotish",
-    "Telegram Stars: Botda pul ishlashning yangi usuli",
-    "Voice message bot: Ovozli xabarlarni AI bilan qayta ishlash",
-    
+    ('Telegram Botlar', [
+        "Telegram Bot 2026: Yangi API imkoniyatlari",
+        "Telegram Mini App 2.0: Web ilovalar evolyutsiyasi",
+        "AI-powered Telegram bot: Gemini integratsiyasi",
+        "Telegram botda to'lov: Click, Payme, Uzum Pay",
+        "Telegram bot + CRM: Mijozlarni avtomatik boshqarish",
+        "Telegram bot monetizatsiya: Premium funksiyalar sotish",
+        "Telegram Stars: Botda pul ishlashning yangi usuli",
+        "Voice message bot: Ovozli xabarlarni AI bilan qayta ishlash",
+    ]),
     # ============ AI CHATBOTLAR (80% QIYMAT) ============
-    "AI Chatbot 2026: Eng so'nggi texnologiyalar",
-    "Gemini API bilan o'zbek tilida chatbot yaratish",
-    "Chatbot + RAG: Kompaniya ma'lumotlari bilan AI",
-    "Voice AI chatbot: Telefonda gaplashuvchi sun'iy intellekt",
-    "WhatsApp AI chatbot integratsiyasi",
-    "Chatbot analytics: Samaradorlikni o'lchash 2026",
-    "24/7 mijoz xizmati: AI bilan xarajatlarni kamaytirish",
-    "Chatbot UX: Foydalanuvchi tajribasini yaxshilash",
-    
+    ('AI Chatbotlar', [
+        "AI Chatbot 2026: Eng so'nggi texnologiyalar",
+        "Gemini API bilan o'zbek tilida chatbot yaratish",
+        "Chatbot + RAG: Kompaniya ma'lumotlari bilan AI",
+        "Voice AI chatbot: Telefonda gaplashuvchi sun'iy intellekt",
+        "WhatsApp AI chatbot integratsiyasi",
+        "Chatbot analytics: Samaradorlikni o'lchash 2026",
+        "24/7 mijoz xizmati: AI bilan xarajatlarni kamaytirish",
+        "Chatbot UX: Foydalanuvchi tajribasini yaxshilash",
+    ]),
     # ============ BIZNES AVTOMATLASHTIRISH ============
-    "Biznes avtomatlashtirish 2026: AI bilan yangi imkoniyatlar",
-    "n8n vs Zapier vs Make: Qaysi platformani tanlash",
-    "CRM avtomatlashtirish: AmoCRM + AI yechimlar",
-    "Email marketing 2026: AI bilan personalizatsiya",
-    "HR avtomatlashtirish: Ishga qabul va onboarding",
-    "Moliyaviy avtomatlashtirish: Invoice va hisobotlar",
-    "Omborxona avtomatlashtirish: AI inventory management",
-    "Sotuv jarayonini avtomatlashtirish: Lead nurturing",
-    
+    ('Avtomatlashtirish', [
+        "Biznes avtomatlashtirish 2026: AI bilan yangi imkoniyatlar",
+        "n8n vs Zapier vs Make: Qaysi platformani tanlash",
+        "CRM avtomatlashtirish: AmoCRM + AI yechimlar",
+        "Email marketing 2026: AI bilan personalizatsiya",
+        "HR avtomatlashtirish: Ishga qabul va onboarding",
+        "Moliyaviy avtomatlashtirish: Invoice va hisobotlar",
+        "Omborxona avtomatlashtirish: AI inventory management",
+        "Sotuv jarayonini avtomatlashtirish: Lead nurturing",
+    ]),
     # ============ AMALIY CASE STUDIES ============
-    "Telegram bot bilan oylik 50 million so'm: Real kejs",
-    "AI chatbot mijoz xizmatida: 90% avtomatizatsiya",
-    "Landing page + AI bot = Konversiya 300% oshdi",
-    "Biznes avtomatlashtirish: 40 soat/oyni tejash",
-    "E-commerce AI: Sotuvni 200% oshirish strategiyasi",
-    
+    ('Case Studies', [
+        "Telegram bot bilan oylik 50 million so'm: Real kejs",
+        "AI chatbot mijoz xizmatida: 90% avtomatizatsiya",
+        "Landing page + AI bot = Konversiya 300% oshdi",
+        "Biznes avtomatlashtirish: 40 soat/oyni tejash",
+        "E-commerce AI: Sotuvni 200% oshirish strategiyasi",
+    ]),
     # ============ TEXNIK QO'LLANMALAR ============
-    "Python 3.13 yangiliklari: Dasturchilar uchun muhim o'zgarishlar",
-    "FastAPI + LangChain: AI backend yaratish",
-    "Docker bilan AI ilovalarni deploy qilish",
-    "PostgreSQL + pgvector: AI uchun vektor baza",
-    "Redis caching: AI ilovalar tezligini oshirish",
-    
+    ("Texnik Yo'riqnomalar", [
+        "Python 3.13 yangiliklari: Dasturchilar uchun muhim o'zgarishlar",
+        "FastAPI + LangChain: AI backend yaratish",
+        "Docker bilan AI ilovalarni deploy qilish",
+        "PostgreSQL + pgvector: AI uchun vektor baza",
+        "Redis caching: AI ilovalar tezligini oshirish",
+    ]),
     # ============ O'ZBEKISTON IT BOZORI ============
-    "O'zbekistonda IT freelance: 2026 imkoniyatlar",
-    "O'zbek tilidagi AI: Mahalliy yechimlar",
-    "IT startaplar uchun AI: Imkoniyatlar va grantlar",
-    "Raqamli O'zbekiston: Davlat xizmatlari avtomatlashtirish",
+    ('Case Studies', [
+        "O'zbekistonda IT freelance: 2026 imkoniyatlar",
+        "O'zbek tilidagi AI: Mahalliy yechimlar",
+        "IT startaplar uchun AI: Imkoniyatlar va grantlar",
+        "Raqamli O'zbekiston: Davlat xizmatlari avtomatlashtirish",
+    ]),
 ]
 
+# Tutuq belgisi/registr/qo'shimcha farqi bilan takrorlangan mavzularni olib tashlash
+TOPICS = unique_topics([topic for _, topics in TOPIC_SEED for topic in topics])
+
+
+def topic_seed():
+    """topic jadvali uchun (kategoriya, mavzu) juftliklari, takrorlarsiz"""
+    unique = set(TOPICS)
+    pairs = []
+    for category, topics in TOPIC_SEED:
+        for topic in topics:
+            if topic in unique:
+                unique.discard(topic)
+                pairs.append((category, topic))
+    return pairs
+
+
+def next_topic(category=None):
+    """
+    Navbatdagi mavzu va kategoriya (topic_rotation). Jadval bo'sh/ishlamasa —
+    avvalgidek tasodifiy tanlov.
+    """
+    from app import app
+    try:
+        with app.app_context():
+            picked = topic_rotation.pick(category)
+    except Exception as e:
+        print(f"⚠️ Mavzu rotatsiyasi xatosi: {e}")
+        picked = None
+    if picked is None:
+        return random.choice(TOPICS), category or random.choice(CATEGORIES)
+    return picked.title, category or picked.category or random.choice(CATEGORIES)
+
+
+
+# ========== NASHR KONVEYERI ==========
+# generate va enrich parallel; session faqat persist bosqichida ochiladi
+
+def generate_unique_post(topic):
+    """
+    AI matn generatsiyasi + dublikat tekshiruvi. Mavjud postga juda o'xshash
+    (DUPLICATE_THRESHOLD) chiqsa DUPLICATE_MAX_REGENERATIONS marta qayta
+    generatsiya qilinadi — o'xshash postlar sarlavhalari promptga "takrorlamang"
+    sifatida qo'shiladi; baribir o'xshash bo'lsa RuntimeError.
+    AI javob bermasa None.
+    """
+    from app import app
+    from duplicate_index import duplicate_index
+    avoid_titles = []
+    for attempt in range(1 + DUPLICATE_MAX_REGENERATIONS):
+        post_data = generate_post_for_seo(topic, avoid_titles=avoid_titles)
+        if not post_data:
+            return None
+        with app.app_context():
+            match = duplicate_index.find_duplicate(post_data['title'], post_data['content'])
+        if match is None:
+            return post_data
+        avoid_titles.append(match['title'] or post_data['title'])
+        print(f"🧬 Dublikat ({match['similarity']:.0%} ~ #{match['id']} '{(match['title'] or '')[:40]}'), "
+              f"urinish {attempt + 1}/{1 + DUPLICATE_MAX_REGENERATIONS}")
+    raise RuntimeError(f"Post #{match['id']} bilan dublikat ({match['similarity']:.0%}), rad etildi")
+
+
+def _stage_generate(item):
+    """AI matn generatsiyasi (bazaga tegmaydi)"""
+    post_data = generate_unique_post(item.payload['topic'])
+    if not post_data:
+        raise RuntimeError("AI javob bermadi")
+    item.data['post_data'] = post_data
+
+
+def _stage_enrich(item):
+    """Rasm olish — matn generatsiyasi bilan parallel"""
+    from image_fetcher import get_image_for_topic, get_fallback_image
+    topic = item.payload['topic']
+    try:
+        image_url = get_image_for_topic(topic)
+    except Exception as e:
+        print(f"⚠️ Rasm olishda xato: {e}")
+        image_url = get_fallback_image(topic)
+    print(f"🖼️ Rasm: {(image_url or '')[:50]}...")
+    item.data['image_url'] = image_url
+
+
+def _stage_persist(item):
+    """Bitta tranzaksiya va bitta commit: INSERT, flush bilan ID, slug"""
+    from app import app, db, Post, invalidate_post_cache
+    post_data = item.data['post_data']
+    with app.app_context():
+        post = Post(
+            title=post_data['title'],
+            content=post_data['content'],
+            topic=item.payload['topic'],
+            category=item.payload['category'],
+            keywords=post_data['keywords'],
+            image_url=item.data.get('image_url'),
+            **item.payload.get('fields', {})
+        )
+        post.reading_time = post.calculate_reading_time()
+        post.render_content()
+        try:
+            db.session.add(post)
+            db.session.flush()
+            post.slug = post.generate_slug()
+            # Kutuvchi muddat o'tib voz kechgan bo'lsa commit qilinmaydi (qayta urinish
+            # ikkinchi postni yaratmasin)
+            with item.committing():
+                db.session.commit()
+                # Keyingi bosqichlar uchun session'siz nusxa
+                item.data['post'] = SimpleNamespace(
+                    id=post.id, title=post.title, category=post.category,
+                    reading_time=post.reading_time, image_url=post.image_url,
+                )
+        except Exception:
+            db.session.rollback()
+            raise
+        if post.is_published:
+            invalidate_post_cache(post)
+    print(f"✅ Yangi post '{item.data['post'].title}' bazaga saqlandi.")
+
+
+def _stage_announce(item):
+    if item.payload.get('announce'):
+        announce_post(item.data['post'])
+
+
+def _stage_notify(item):
+    if item.payload.get('announce'):
+        notify_post(item.data['post'])
 
 
-def generate_and_publish_post(topic=None, category=None):
+publish_pipeline.register('generate', _stage_generate)
+publish_pipeline.register('enrich', _stage_enrich)
+publish_pipeline.register('persist', _stage_persist)
+publish_pipeline.register('announce', _stage_announce)
+publish_pipeline.register('notify', _stage_notify)
+
+
+def _post_url(post):
+    return f"{SITE_URL}/post/{post.id}"
+
+
+def announce_post(post, delay=0):
+    """
+    Telegram kanalga e'lon — alohida fon vazifasi (o'z chegarasi va qayta urinishlari bilan).
+    Post ID bo'yicha idempotent: qayta chaqirilsa ham ikki marta yuborilmaydi.
+    """
+    # Markdown maxsus belgilarni escape qilish
+    def escape_md(text):
+        if not text: return text
+        # Escape characters that have special meaning in Markdown V2
+        # _, *, [, ], (, ), ~, `, >, #, +, -, =, |, {, }, ., !
+        # We only escape those that are likely to appear in titles/categories
+        # and would cause formatting issues.
+        for char in ['_', '*', '[', ']', '`', '~', '>', '#', '+', '-', '=', '|', '{', '}', '.', '!']:
+            text = text.replace(char, '\\' + char)
+        return text
+
+    post_url = _post_url(post)
+    safe_title = escape_md(post.title)
+    safe_category = escape_md(post.category.replace(' ', '_')) # Replace spaces then escape
+
+    tg_caption = f"""📝 *Yangi Maqola!*
+    
+*{safe_title}*
+    
+🏷 Kategoriya: #{safe_category}
+⏱ O'qish vaqti: {post.reading_time} daqiqa
+    
+🔗 [Maqolani o'qish]({post_url})
+    
+#TrendoAI #Texnologiya"""
+
+    from job_queue import job_queue
+    job_queue.enqueue('telegram', {
+        'message': tg_caption,
+        'photo_url': post.image_url or None,
+    }, idempotency_key=f'telegram:post:{post.id}', delay=delay)
+    print("📨 Telegram vazifasi navbatga qo'yildi.")
+
+
+def notify_post(post, delay=0):
+    """Obunachilarga push — fon vazifasi, post ID bo'yicha idempotent"""
+    from job_queue import job_queue
+    job_queue.enqueue('push', {
+        'title': f"🆕 Yangi: {post.title}",
+        'message': f"{post.category} | O'qish uchun bosing!",
+        'url': _post_url(post),
+        'category': post.category,
+    }, idempotency_key=f'push:post:{post.id}', delay=delay)
+    print("📨 Push vazifasi navbatga qo'yildi.")
+
+
+def _record_topic(topic):
+    """Qo'lda berilgan mavzu jadvalda bo'lsa, navbati orqaga suriladi"""
+    from app import app
+    try:
+        with app.app_context():
+            topic_rotation.record(topic)
+    except Exception as e:
+        print(f"⚠️ Mavzu qayd etilmadi: {e}")
+
+
+def _post_by_generation_key(key):
+    """Shu kalit bilan avval saqlangan post (session'siz nusxa) yoki None"""
+    from app import app, db, Post
+    with app.app_context():
+        post = db.session.query(Post).filter(Post.generation_key == key).first()
+        found = post and SimpleNamespace(
+            id=post.id, title=post.title, category=post.category,
+            reading_time=post.reading_time, image_url=post.image_url,
+        )
+        db.session.rollback()
+    return found
+
+
+def generate_and_publish_post(topic=None, category=None, generation_key=None):
     """
     Yangi post generatsiya qilib, bazaga saqlaydi va Telegramga yuboradi.
     
     topic: Agar berilsa, ushbu mavzuda yozadi. Aks holda random tanlaydi.
     category: Agar berilsa, ushbu kategoriyani qo'yadi. Aks holda random tanlaydi.
+    generation_key: fon vazifasi kaliti — shu kalitli post bazada bo'lsa, qayta
+        generatsiya qilinmaydi, faqat (idempotent) e'lon vazifalari qo'yiladi.
+    
+    Post saqlangach True qaytadi; e'lon/push konveyerda davom etadi va ularning
+    xatosi generatsiyani qayta ishga tushirmaydi.
     """
+    if generation_key:
+        existing = _post_by_generation_key(generation_key)
+        if existing:
+            print(f"♻️ '{existing.title}' allaqachon saqlangan (#{existing.id}) — qayta generatsiya qilinmaydi")
+            announce_post(existing)
+            notify_post(existing)
+            return True
+
     current_time = datetime.now().strftime('%H:%M')
     print(f"\n{'='*60}")
     print(f"🚀 TrendoAI — Post generatsiyasi boshlandi... [{current_time}]")
     print(f"{'='*60}")
     
-    # Mavzu va kategoriya tanlash
-    selected_topic = topic if topic else random.choice(TOPICS)
-    selected_category = category if category else random.choice(CATEGORIES)
+    # Mavzu va kategoriya tanlash: berilmagan bo'lsa — rotatsiya navbatidan
+    if topic:
+        selected_topic = topic
+        selected_category = category if category else random.choice(CATEGORIES)
+        _record_topic(topic)
+    else:
+        selected_topic, selected_category = next_topic(category)
     
     print(f"📌 Mavzu: {selected_topic}")
     print(f"📂 Kategoriya: {selected_category}")
     
+    item = publish_pipeline.submit(
+        topic=selected_topic, category=selected_category,
+        fields={'is_published': True, 'generation_key': generation_key}, announce=True
+    )
+    if item.wait(publish_pipeline.commit_timeout()):
+        return True
+    print(f"❌ Post generatsiya qilishda xatolik yuz berdi: {item.errors}")
+    return False
+
+
+# ========== QORALAMA BUFERI ==========
+
+def _utc_naive(value):
+    """Aware datetime'ni bazadagi created_at kabi naive UTC ga"""
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def upcoming_slots(count, now=None):
+    """Keyingi `count` ta nashr sloti (PUBLISH_HOURS, naive UTC)"""
+    now = now or datetime.now(ZoneInfo(TIMEZONE))
+    slot = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    slots = []
+    while len(slots) < count:
+        if slot.hour in PUBLISH_HOURS:
+            slots.append(_utc_naive(slot))
+        slot += timedelta(hours=1)
+    return slots
+
+
+def _pending_draft_slots():
+    """Navbatda yoki ishlayotgan 'draft' vazifalarining slotlari (ISO satrlar)"""
+    from app import db, BackgroundJob
+    payloads = db.session.query(BackgroundJob.payload).filter(
+        BackgroundJob.kind == 'draft', BackgroundJob.status.in_(('queued', 'running'))
+    ).all()
+    slots = set()
+    for (payload,) in payloads:
+        try:
+            slots.add(json.loads(payload or '{}').get('publish_at'))
+        except ValueError:
+            pass
+    return slots
+
+
+def fill_draft_buffer():
+    """
+    Producer: kelgusi DRAFT_BUFFER_SIZE ta slot uchun qoralama vazifalarini navbatga qo'yish.
+    Off-peak soatlarda bufer to'liq to'ldiriladi, band soatlarda faqat DRAFT_BUFFER_MIN gacha.
+    Parallellik job_queue ('draft' chegarasi) bilan cheklanadi; Gemini kvotasi
+    tugaganda hech narsa qo'yilmaydi.
+    """
+    remaining = quota_backoff_remaining()
+    if remaining:
+        print(f"⏳ Gemini kvotasi: qoralama buferi {int(remaining)}s dan keyin to'ldiriladi")
+        return 0
+
     from app import app, db, Post
+    from job_queue import job_queue
+    now = datetime.now(ZoneInfo(TIMEZONE))
     with app.app_context():
-        try:
-            post_data = generate_post_for_seo(selected_topic)
-            
-            if post_data:
-                # Rasm olish
-                from image_fetcher import get_image_for_topic
-                image_url = get_image_for_topic(selected_topic)
-                print(f"🖼️ Rasm: {image_url[:50]}...")
-                
-                new_post = Post(
-                    title=post_data['title'],
-                    content=post_data['content'],
-                    topic=selected_topic,
-                    category=selected_category,
-                    keywords=post_data['keywords'],
-                    image_url=image_url,
-                    is_published=True
-                )
-                new_post.reading_time = new_post.calculate_reading_time()
-                
-                db.session.add(new_post)
-                db.session.commit()
-                
-                new_post.slug = new_post.generate_slug()
-                db.session.commit()
-                
-                print(f"✅ Yangi post '{new_post.title}' bazaga saqlandi.")
-                
-                # Telegramga yuborish
-                from telegram_poster import send_photo_to_channel, send_to_telegram_channel
-                
-                # Markdown maxsus belgilarni escape qilish
-                def escape_md(text):
-                    if not text: return text
-                    # Escape characters that have special meaning in Markdown V2
-                    # _, *, [, ], (, ), ~, `, >, #, +, -, =, |, {, }, ., !
-                    # We only escape those that are likely to appear in titles/categories
-                    # and would cause formatting issues.
-                    for char in ['_', '*', '[', ']', '`', '~', '>', '#', '+', '-', '=', '|', '{', '}', '.', '!']:
-                        text = text.replace(char, '\\' + char)
-                    return text
-                
-                post_url = f"{SITE_URL}/post/{new_post.id}"
-                safe_title = escape_md(new_post.title)
-                safe_category = escape_md(selected_category.replace(' ', '_')) # Replace spaces then escape
-                
-                tg_caption = f"""📝 *Yangi Maqola!*
-    
-*{safe_title}*
-    
-🏷 Kategoriya: #{safe_category}
-⏱ O'qish vaqti: {new_post.reading_time} daqiqa
-    
-🔗 [Maqolani o'qish]({post_url})
-    
-#TrendoAI #Texnologiya"""
-                
-                # Rasm bilan yoki rasmsiz yuborish
-                success = False
-                if image_url:
-                    success = send_photo_to_channel(image_url, tg_caption)
-                else:
-                    success = send_to_telegram_channel(tg_caption)
-                
-                if success:
-                    print("✅ Telegram kanalga yuborildi!")
-                else:
-                    print("⚠️ Telegram yuborishda muammo yuz berdi")
-                
-                # Push Notification yuborish
-                try:
-                    from app import notify_all_subscribers
-                    print("🔔 Push xabar yuborilmoqda...")
-                    push_count = notify_all_subscribers(
-                        title=f"🆕 Yangi: {new_post.title}",
-                        message=f"{selected_category} | O'qish uchun bosing!",
-                        url=post_url
-                    )
-                    print(f"✅ {push_count} ta obunachiga push yuborildi.")
-                except Exception as push_err:
-                     print(f"⚠️ Push xabar xatosi: {push_err}")
-                    
-                return True
-            else:
-                print("❌ Post generatsiya qilishda xatolik yuz berdi (AI javob bermadi).")
-                return False
-        except Exception as e:
-            print(f"❌ Xato yuz berdi: {str(e)}")
-            return False
-    
-    print(f"{'='*60}\n")
-
-
-# Scheduler yaratish
-scheduler = BackgroundScheduler(timezone=TIMEZONE)
-
-# Har soatda 06:00 dan 22:00 gacha post chiqarish
-# 17 ta soat = 17 ta post kuniga
-for hour in range(6, 23):  # 6, 7, 8... 22
-    scheduler.add_job(
-        generate_and_publish_post, 
-        'cron', 
-        hour=hour, 
-        minute=0,
-        id=f'hourly_post_{hour}',
-        name=f'TrendoAI Soatlik Post ({hour}:00)'
+        slots = upcoming_slots(DRAFT_BUFFER_SIZE, now)
+        ready = {row[0] for row in db.session.query(Post.publish_at).filter(
+            Post.is_published == False, Post.publish_at.in_(slots)
+        )}
+        pending = _pending_draft_slots()
+        db.session.rollback()
+
+        target = DRAFT_BUFFER_SIZE if now.hour in DRAFT_OFFPEAK_HOURS else DRAFT_BUFFER_MIN
+        missing = [slot for slot in slots if slot not in ready and slot.isoformat() not in pending]
+        wanted = max(0, target - len(ready) - len(pending))
+        for slot in missing[:wanted]:
+            job_queue.enqueue('draft', {'publish_at': slot.isoformat()}, max_attempts=DRAFT_MAX_ATTEMPTS)
+    queued = min(wanted, len(missing))
+    if queued:
+        print(f"📝 Qoralama buferi: {len(ready)} tayyor, {queued} ta yangi vazifa")
+    return queued
+
+
+def generate_draft(publish_at):
+    """'draft' vazifasi: berilgan slot uchun nashr qilinmagan post tayyorlash"""
+    from app import app, db, Post
+    slot = datetime.fromisoformat(publish_at)
+    if slot <= _utc_naive(datetime.now(timezone.utc)):
+        return {'skipped': 'slot o\'tib ketdi'}
+    # Kvota tugagan — vazifa xato bilan qaytib, job_queue kutib qayta urinadi
+    remaining = quota_backoff_remaining()
+    if remaining:
+        raise RuntimeError(f"Gemini kvotasi tugagan, {int(remaining)}s kutish kerak")
+
+    with app.app_context():
+        exists = db.session.query(Post.id).filter(
+            Post.is_published == False, Post.publish_at == slot
+        ).first()
+        if exists:
+            return {'skipped': 'slot band', 'post_id': exists[0]}
+        db.session.rollback()
+
+    # Rotatsiya tanlangan mavzuni band qiladi — buferda takrorlanmaydi
+    topic, category = next_topic()
+    item = publish_pipeline.submit(
+        topic=topic, category=category,
+        fields={'is_published': False, 'publish_at': slot}, announce=False
     )
+    if not item.wait(publish_pipeline.commit_timeout()):
+        return False
+    post = item.data['post']
+    print(f"📝 Qoralama tayyor: '{post.title}' → {publish_at} (UTC)")
+    return {'post_id': post.id, 'publish_at': publish_at}
+
+
+def publish_due_draft(fallback_key=None):
+    """
+    'publish' vazifasi: vaqti kelgan eng eski qoralamani chop etish va e'lon qilish.
+    Bufer bo'sh bo'lsa, odatdagi generatsiya vazifasi navbatga qo'yiladi.
+    """
+    from app import app, db, Post, invalidate_post_cache
+    from job_queue import job_queue
+    with app.app_context():
+        now = _utc_naive(datetime.now(timezone.utc))
+        # Qator qulfi — parallel 'publish' vazifasi bir qoralamani ikki marta ololmaydi.
+        # ORM orqali yangilanadi, shunda qidiruv/taklif indekslari ham yangilanadi
+        post = Post.query.filter(
+            Post.is_published == False, Post.publish_at != None,
+            Post.publish_at <= now + timedelta(seconds=DRAFT_PUBLISH_TOLERANCE)
+        ).order_by(Post.publish_at, Post.id).with_for_update(skip_locked=True).first()
+
+        if post is not None:
+            post.is_published = True
+            post.created_at = now
+            db.session.commit()
+            invalidate_post_cache(post)
+            print(f"✅ Qoralama chop etildi: '{post.title}'")
+            announce_post(post)
+            notify_post(post)
+            return {'post_id': post.id}
+
+    print("⚠️ Tayyor qoralama yo'q — post hozir generatsiya qilinadi")
+    job_id = job_queue.enqueue('generate', {}, idempotency_key=fallback_key)
+    return {'fallback_job': job_id}
+
+
+def _scheduled_time(job_id, now):
+    """Joriy ishga tushirish rejalashtirilgan vaqt (kechikish bo'lsa ham bir xil qiymat)"""
+    job = scheduler.get_job(job_id)
+    if job is not None:
+        fire_time = job.trigger.get_next_fire_time(None, now - timedelta(seconds=SCHEDULER_MISFIRE_GRACE))
+        if fire_time is not None and fire_time <= now:
+            return fire_time
+    return now.replace(second=0, microsecond=0)
+
+
+def fire_scheduled_post(job_id):
+    """
+    Cron ishga tushishi: buferdagi qoralamani chop etish vazifasini navbatga qo'yadi.
+    Kalit (job_id, rejalashtirilgan vaqt) — liderlik almashganda ikki jarayon
+    bir vaqtda ishga tushirsa ham post faqat bitta chop etiladi.
+    """
+    from job_queue import job_queue
+    scheduled = _scheduled_time(job_id, datetime.now(ZoneInfo(TIMEZONE)))
+    key = f"schedule:{job_id}:{scheduled.strftime('%Y-%m-%dT%H:%M')}"
+    queued_id = job_queue.enqueue('publish', {'fallback_key': f'{key}:generate'}, idempotency_key=key)
+    print(f"⏰ {job_id} ({scheduled.strftime('%H:%M')}) → vazifa #{queued_id}")
+    return queued_id
+
+
+def _hourly_jobs():
+    """(id, nom, soat) — har kuni PUBLISH_HOURS (06:00 - 22:00), 17 ta post kuniga"""
+    return [
+        (f'hourly_post_{hour}', f'TrendoAI Soatlik Post ({hour}:00)', hour)
+        for hour in PUBLISH_HOURS
+    ]
+
+
+def _stored_jobs(db):
+    """Doimiy job store jadvalidagi vazifalar: {id: (next_run_time epoch, job_state)}"""
+    try:
+        rows = db.session.execute(db.text(
+            f"SELECT id, next_run_time, job_state FROM {SCHEDULER_JOBSTORE_TABLE}"
+        )).all()
+        db.session.rollback()
+    except Exception:
+        db.session.rollback()
+        return {}
+    return {row[0]: (row[1], row[2]) for row in rows}
+
+
+def build_scheduler(scheduler_class=BackgroundScheduler, db=None):
+    """
+    Scheduler yaratish va soatlik vazifalarni qo'shish.
+    db berilsa, vazifalar bazadagi job store'da saqlanadi: jarayon uxlab/o'chib
+    qolganda o'tkazib yuborilgan ishga tushirishlar qayta ishga tushganda
+    (misfire_grace_time ichida) bitta qilib bajariladi.
+    """
+    jobstores = {}
+    stored = {}
+    if db is not None:
+        jobstores['default'] = SQLAlchemyJobStore(engine=db.engine, tablename=SCHEDULER_JOBSTORE_TABLE)
+        stored = _stored_jobs(db)
+    new_scheduler = scheduler_class(timezone=TIMEZONE, jobstores=jobstores, job_defaults={
+        'coalesce': True,
+        'misfire_grace_time': SCHEDULER_MISFIRE_GRACE,
+    })
+    job_ids = set()
+    for job_id, name, hour in _hourly_jobs():
+        job_ids.add(job_id)
+        options = {}
+        # Saqlangan navbatdagi vaqtni saqlab qolamiz — aks holda replace_existing
+        # o'tkazib yuborilgan ishga tushirishni kelajakka surib yuboradi
+        if stored.get(job_id, (None,))[0] is not None:
+            options['next_run_time'] = datetime.fromtimestamp(stored[job_id][0], ZoneInfo(TIMEZONE))
+        new_scheduler.add_job(
+            fire_scheduled_post,
+            'cron',
+            hour=hour,
+            minute=0,
+            args=[job_id],
+            id=job_id,
+            name=name,
+            replace_existing=True,
+            **options
+        )
+    # Qoralama buferini to'ldiruvchi producer (arzon: faqat so'rov va navbatga qo'yish)
+    job_ids.add('draft_producer')
+    new_scheduler.add_job(
+        fill_draft_buffer,
+        'interval',
+        minutes=DRAFT_FILL_INTERVAL,
+        id='draft_producer',
+        name='TrendoAI Qoralama buferi',
+        replace_existing=True
+    )
+    # Koddan olib tashlangan eski vazifalarni store'dan tozalash
+    stale = [job_id for job_id in stored if job_id not in job_ids]
+    if stale:
+        with db.engine.begin() as conn:
+            conn.execute(
+                db.text(f"DELETE FROM {SCHEDULER_JOBSTORE_TABLE} WHERE id IN :ids")
+                .bindparams(db.bindparam('ids', expanding=True)),
+                {'ids': stale}
+            )
+    return new_scheduler
+
+
+# Web jarayonidagi scheduler (faqat RUN_SCHEDULER_IN_WEB yoqilganda ishga tushadi).
+# Alohida worker jarayoni (worker.py) buni BlockingScheduler bilan almashtiradi.
+scheduler = build_scheduler()
+scheduler_leader = LeaderElection('trendoai-scheduler')
 
 print(f"📅 Scheduler sozlandi: Har kuni 06:00 - 22:00 oralig'ida 17 ta post")
 
 
+def start_with_leader_election(app, db):
+    """Scheduler'ni pauzada ishga tushirib, faqat lider bo'lganda davom ettirish"""
+    scheduler_leader.init_app(app, db)
+    scheduler.start(paused=True)
+    scheduler_leader.start(on_elected=scheduler.resume, on_demoted=scheduler.pause)
+
+
+def run_worker(app, db):
+    """
+    Alohida scheduler jarayoni: BlockingScheduler asosiy oqimni band qiladi
+    (bo'sh sikl yo'q), SIGTERM/SIGINT da ishlayotgan vazifalar tugashi kutilib to'xtaydi.
+    """
+    global scheduler
+    with app.app_context():
+        scheduler = build_scheduler(BlockingScheduler, db=db)
+
+    def shutdown(signum, frame):
+        print(f"🛑 Signal {signum}: scheduler to'xtatilmoqda...")
+        scheduler_leader.stop()
+        if scheduler.running:
+            scheduler.shutdown(wait=True)
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    # Liderlik scheduler ishga tushgandan keyin boshlanadi (resume uchun u running bo'lishi kerak)
+    scheduler_leader.init_app(app, db)
+    scheduler.add_listener(
+        lambda event: scheduler_leader.start(on_elected=scheduler.resume, on_demoted=scheduler.pause),
+        EVENT_SCHEDULER_START
+    )
+    print("🚀 TrendoAI Scheduler worker ishga tushdi!")
+    print(f"📊 Jami vazifalar: {len(_hourly_jobs())}")
+    # Lider saylanguncha pauzada; start() shutdown chaqirilguncha qaytmaydi
+    scheduler.start(paused=True)
+    print("Scheduler to'xtatildi.")
+
+
 def get_scheduled_jobs():
     """Barcha rejalashtirilgan vazifalarni qaytaradi."""
-    jobs = []
-    for job in scheduler.get_jobs():
-        jobs.append({
+    if scheduler.running:
+        return [{
             'id': job.id,
             'name': job.name,
             'next_run': str(job.next_run_time)
+        } for job in scheduler.get_jobs()]
+
+    # Scheduler alohida worker'da — ma'lumotni doimiy job store'dan o'qiymiz
+    from app import db
+    jobs = []
+    for job_id, (next_run, job_state) in _stored_jobs(db).items():
+        try:
+            name = pickle.loads(job_state).get('name', job_id)
+        except Exception:
+            name = job_id
+        jobs.append({
+            'id': job_id,
+            'name': name,
+            'next_run': str(datetime.fromtimestamp(next_run, ZoneInfo(TIMEZONE))) if next_run else None
         })
+    jobs.sort(key=lambda job: job['next_run'] or '')
     return jobs
 
 
 if __name__ == "__main__":
-    scheduler.start()
-    print("🚀 TrendoAI Scheduler ishga tushdi!")
-    print(f"📊 Jami vazifalar: {len(scheduler.get_jobs())}")
-    
-    try:
-        while True:
-            pass
-    except KeyboardInterrupt:
-        scheduler.shutdown()
-        print("Scheduler to'xtatildi.")
\ No newline at end of file
+    from worker import main
+    main()
@@ -0,0 +1,54 @@
+import sys
+import os
+import argparse
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Web'ga xos xizmatlar (webhook) ishga tushmasin
+os.environ.setdefault("TRENDOAI_PROCESS", "worker")
+
+from batch_generator import generate_batch
+from config import BATCH_CONCURRENCY, CATEGORIES
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bir nechta postni parallel generatsiya qilish")
+    parser.add_argument('topics', nargs='*', help="Mavzular")
+    parser.add_argument('--file', help="Har qatorda bitta mavzu bo'lgan fayl")
+    parser.add_argument('--random', type=int, default=0, help="Mavzular navbatidan (rotatsiya) N ta mavzu")
+    parser.add_argument('--category', choices=CATEGORIES, help="Barcha postlar uchun kategoriya")
+    parser.add_argument('--concurrency', type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument('--draft', action='store_true', help="Chop etmasdan qoralama sifatida saqlash")
+    parser.add_argument('--no-announce', action='store_true', help="Telegram/push e'lon qilinmasin")
+    parser.add_argument('--stagger', type=int, help="E'lonlar orasidagi oraliq (soniya)")
+    args = parser.parse_args()
+
+    topics = list(args.topics)
+    if args.file:
+        with open(args.file, encoding='utf-8') as f:
+            topics.extend(line.strip() for line in f if line.strip())
+    if args.random:
+        from scheduler import next_topic
+        topics.extend(next_topic(args.category)[0] for _ in range(args.random))
+    if not topics:
+        parser.error("Kamida bitta mavzu kerak (topics, --file yoki --random)")
+
+    options = {}
+    if args.stagger is not None:
+        options['stagger'] = args.stagger
+    summary = generate_batch(
+        topics,
+        concurrency=args.concurrency,
+        category=args.category,
+        publish=not args.draft,
+        announce=not args.no_announce,
+        **options
+    )
+    if summary['failed']:
+        print("❌ Muvaffaqiyatsiz mavzular:")
+        for topic in summary['failed']:
+            print(f"  - {topic}")
+    return 0 if summary['generated'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,38 +1,17 @@
 import sys
 import os
-import re
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from app import app, db, Portfolio
+from text_normalizer import slugify
 
 def generate_slug(title):
     """Sarlavhadan slug yaratish"""
     if not title:
         return None
     
-    # O'zbek harflarini translit qilish
-    translit_map = {
-        'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'yo',
-        'ж': 'j', 'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm',
-        'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
-        'ф': 'f', 'х': 'x', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sch',
-        'ъ': '', 'ы': 'i', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
-        'ў': 'o', 'қ': 'q', 'ғ': 'g', 'ҳ': 'h',
-        "'": '', "'": '', "ʻ": '', "ʼ": ''
-    }
-    
-    slug = title.lower()
-    
-    # Translit
-    for cyr, lat in translit_map.items():
-        slug = slug.replace(cyr, lat)
-        slug = slug.replace(cyr.upper(), lat.capitalize() if lat else '')
-    
-    # Faqat harflar, raqamlar va tire
-    slug = re.sub(r'[^a-z0-9\s-]', '', slug)
-    slug = re.sub(r'[\s_]+', '-', slug)
-    slug = re.sub(r'-+', '-', slug)
-    slug = slug.strip('-')
+    # O'zbek harflari translit va tutuq belgilari text_normalizer'da
+    slug = slugify(title)
     
     return slug if slug else None
 
@@ -0,0 +1,311 @@
+# search_engine.py
+"""
+Postlar bo'yicha to'liq matnli qidiruv (full-text search).
+PostgreSQL: tsvector ustuni + GIN indeks, ts_rank bo'yicha tartiblash.
+SQLite: FTS5 virtual jadval, bm25 bo'yicha tartiblash.
+Indeks post yaratilganda, tahrirlanganda va o'chirilganda avtomatik yangilanadi.
+Indeks ham, so'rov ham text_normalizer orqali bir xil shaklga keltiriladi.
+"""
+import math
+from markupsafe import escape, Markup
+from sqlalchemy import event, inspect as sa_inspect
+from content_renderer import render_markdown, html_to_text
+from text_normalizer import query_terms, index_text, iter_words
+
+# Indeks formati (normalizatsiya/tokenizatsiya o'zgarsa oshiring — to'liq qayta quriladi)
+INDEX_VERSION = 2
+
+# Snippet uzunligi (so'z) va topilgan so'zdan oldingi kontekst
+SNIPPET_WORDS = 30
+SNIPPET_LEAD_WORDS = 8
+
+# Sarlavha > kalit so'zlar > matn (bm25 og'irliklari)
+TITLE_WEIGHT = 10.0
+KEYWORDS_WEIGHT = 4.0
+BODY_WEIGHT = 1.0
+
+# Indeksni qayta qurishni talab qiladigan maydonlar
+_INDEXED_FIELDS = ('title', 'keywords', 'content', 'content_html', 'is_published')
+
+
+
+def build_snippet(text, terms, max_words=SNIPPET_WORDS):
+    """Asl matndan topilgan so'zlar atrofidagi parcha (<mark> bilan, xavfsiz HTML)"""
+    words = list(iter_words(text))
+    if not words:
+        return Markup('')
+
+    def _matches(normalized):
+        return any(normalized.startswith(term) for term in terms)
+
+    first = next((i for i, (_, _, norm) in enumerate(words) if _matches(norm)), 0)
+    start = max(0, first - SNIPPET_LEAD_WORDS)
+    window = words[start:start + max_words]
+
+    parts = ['...' if start > 0 else '']
+    cursor = window[0][0]
+    for begin, end, norm in window:
+        parts.append(str(escape(text[cursor:begin])))
+        word = str(escape(text[begin:end]))
+        parts.append(f'<mark>{word}</mark>' if _matches(norm) else word)
+        cursor = end
+    if start + max_words < len(words):
+        parts.append('...')
+    return Markup(''.join(parts).strip())
+
+
+class SearchResults:
+    """Qidiruv natijalari (Flask-SQLAlchemy pagination bilan bir xil interfeys)"""
+
+    def __init__(self, items, total, page, per_page, snippets=None):
+        self.items = items
+        self.total = total
+        self.page = page
+        self.per_page = per_page
+        self.snippets = snippets or {}
+
+    @property
+    def pages(self):
+        return max(1, math.ceil(self.total / self.per_page)) if self.total else 0
+
+    @property
+    def has_prev(self):
+        return self.page > 1
+
+    @property
+    def has_next(self):
+        return self.page < self.pages
+
+    @property
+    def prev_num(self):
+        return self.page - 1 if self.has_prev else None
+
+    @property
+    def next_num(self):
+        return self.page + 1 if self.has_next else None
+
+
+class SearchEngine:
+    """PostgreSQL va SQLite uchun yagona qidiruv interfeysi"""
+
+    def __init__(self):
+        self._app = None
+        self._db = None
+        self._model = None
+        self._listing_query = None
+        self.backend = None  # 'postgresql', 'sqlite' yoki 'like' (fallback)
+
+    def init_app(self, app, db, model, listing_query):
+        """Qidiruv sxemasini tayyorlash va o'zgarish hook'larini ulash"""
+        self._app = app
+        self._db = db
+        self._model = model
+        self._listing_query = listing_query
+
+        event.listen(model, 'after_insert', self._after_insert)
+        event.listen(model, 'after_update', self._after_update)
+        event.listen(model, 'after_delete', self._after_delete)
+
+        with app.app_context():
+            self._setup_schema()
+
+    # ---------- Sxema ----------
+
+    def _setup_schema(self):
+        dialect = self._db.engine.dialect.name
+        try:
+            with self._db.engine.begin() as conn:
+                conn.execute(self._db.text(
+                    "CREATE TABLE IF NOT EXISTS search_meta (key VARCHAR(50) PRIMARY KEY, value VARCHAR(100))"
+                ))
+                if dialect == 'postgresql':
+                    conn.execute(self._db.text("ALTER TABLE post ADD COLUMN IF NOT EXISTS search_vector tsvector"))
+                    conn.execute(self._db.text(
+                        "CREATE INDEX IF NOT EXISTS ix_post_search_vector ON post USING GIN (search_vector)"
+                    ))
+                elif dialect == 'sqlite':
+                    conn.execute(self._db.text(
+                        "CREATE VIRTUAL TABLE IF NOT EXISTS post_fts USING fts5("
+                        "title, keywords, body, tokenize = 'unicode61 remove_diacritics 2')"
+                    ))
+                else:
+                    raise RuntimeError(f"{dialect} uchun full-text qidiruv qo'llab-quvvatlanmaydi")
+            self.backend = dialect
+            print(f"✅ Qidiruv indeksi tayyor ({dialect})")
+        except Exception as e:
+            self.backend = 'like'
+            print(f"⚠️ Full-text qidiruv o'chirildi, LIKE ishlatiladi: {e}")
+
+    def rebuild(self, only_missing=True):
+        """Indeksni qayta qurish (only_missing=True — faqat indekslanmagan postlar)"""
+        if self.backend not in ('postgresql', 'sqlite'):
+            return 0
+        Post = self._model
+        session = self._db.session
+        count = 0
+        try:
+            stored_version = session.execute(
+                self._db.text("SELECT value FROM search_meta WHERE key = 'index_version'")
+            ).scalar()
+            if stored_version != str(INDEX_VERSION):
+                only_missing = False
+
+            if self.backend == 'sqlite':
+                if only_missing:
+                    indexed = session.execute(self._db.text("SELECT count(*) FROM post_fts")).scalar()
+                    published = Post.query.filter_by(is_published=True).count()
+                    if indexed == published:
+                        return 0
+                session.execute(self._db.text("DELETE FROM post_fts"))
+                posts = Post.query.filter_by(is_published=True).all()
+            else:
+                query = Post.query.filter_by(is_published=True)
+                if only_missing:
+                    query = query.filter(self._db.text("search_vector IS NULL"))
+                posts = query.all()
+
+            for post in posts:
+                self._index(session, post)
+                count += 1
+
+            if stored_version != str(INDEX_VERSION):
+                session.execute(self._db.text("DELETE FROM search_meta WHERE key = 'index_version'"))
+                session.execute(
+                    self._db.text("INSERT INTO search_meta (key, value) VALUES ('index_version', :v)"),
+                    {'v': str(INDEX_VERSION)}
+                )
+            session.commit()
+            if count:
+                print(f"✅ Qidiruv indeksi: {count} ta post indekslandi")
+        except Exception as e:
+            session.rollback()
+            print(f"⚠️ Qidiruv indeksini qurishda xato: {e}")
+        return count
+
+    # ---------- Indekslash ----------
+
+    @staticmethod
+    def _document(post):
+        body_html = post.content_html if post.content_html is not None else render_markdown(post.content)
+        return {
+            'id': post.id,
+            'title': index_text(post.title),
+            'keywords': index_text(post.keywords),
+            'body': index_text(html_to_text(body_html)),
+        }
+
+    def _index(self, conn, post):
+        if not post.is_published:
+            self._unindex(conn, post.id)
+            return
+        doc = self._document(post)
+        if self.backend == 'postgresql':
+            conn.execute(self._db.text(
+                "UPDATE post SET search_vector = "
+                "setweight(to_tsvector('simple', :title), 'A') || "
+                "setweight(to_tsvector('simple', :keywords), 'B') || "
+                "setweight(to_tsvector('simple', :body), 'D') "
+                "WHERE id = :id"
+            ), doc)
+        elif self.backend == 'sqlite':
+            conn.execute(self._db.text("DELETE FROM post_fts WHERE rowid = :id"), {'id': post.id})
+            conn.execute(self._db.text(
+                "INSERT INTO post_fts (rowid, title, keywords, body) VALUES (:id, :title, :keywords, :body)"
+            ), doc)
+
+    def _unindex(self, conn, post_id):
+        if self.backend == 'postgresql':
+            conn.execute(self._db.text("UPDATE post SET search_vector = NULL WHERE id = :id"), {'id': post_id})
+        elif self.backend == 'sqlite':
+            conn.execute(self._db.text("DELETE FROM post_fts WHERE rowid = :id"), {'id': post_id})
+
+    def _after_insert(self, mapper, connection, target):
+        if self.backend in ('postgresql', 'sqlite'):
+            self._index(connection, target)
+
+    def _after_update(self, mapper, connection, target):
+        if self.backend not in ('postgresql', 'sqlite'):
+            return
+        state = sa_inspect(target)
+        if any(state.attrs[field].history.has_changes() for field in _INDEXED_FIELDS):
+            self._index(connection, target)
+
+    def _after_delete(self, mapper, connection, target):
+        if self.backend in ('postgresql', 'sqlite'):
+            self._unindex(connection, target.id)
+
+    # ---------- Qidiruv ----------
+
+    def search(self, query, page=1, per_page=10):
+        """Qidiruv: relevantlik bo'yicha tartiblangan natijalar va snippet'lar"""
+        page = max(1, page)
+        terms = query_terms(query)
+        if not terms:
+            return SearchResults([], 0, page, per_page)
+
+        if self.backend == 'postgresql':
+            ids, total = self._search_postgres(terms, page, per_page)
+        elif self.backend == 'sqlite':
+            ids, total = self._search_sqlite(terms, page, per_page)
+        else:
+            return self._search_like(query, page, per_page)
+
+        if not ids:
+            return SearchResults([], total, page, per_page)
+
+        Post = self._model
+        posts = self._listing_query().filter(Post.id.in_(ids)).all()
+        order = {post_id: i for i, post_id in enumerate(ids)}
+        posts.sort(key=lambda p: order[p.id])
+
+        bodies = self._db.session.query(Post.id, Post.content_html).filter(Post.id.in_(ids)).all()
+        snippets = {post_id: build_snippet(html_to_text(body_html), terms) for post_id, body_html in bodies}
+        return SearchResults(posts, total, page, per_page, snippets)
+
+    def _search_postgres(self, terms, page, per_page):
+        # Prefix qidiruv: stem'langan so'z barcha qo'shimchali shakllarni qamrab oladi
+        ts_query = ' & '.join(f"{term}:*" for term in terms)
+        params = {
+            'q': ts_query,
+            'limit': per_page,
+            'offset': (page - 1) * per_page,
+        }
+        rows = self._db.session.execute(self._db.text(
+            "SELECT id FROM post "
+            "WHERE is_published = true AND search_vector @@ to_tsquery('simple', :q) "
+            "ORDER BY ts_rank(search_vector, to_tsquery('simple', :q)) DESC, created_at DESC "
+            "LIMIT :limit OFFSET :offset"
+        ), params).all()
+        total = self._db.session.execute(self._db.text(
+            "SELECT count(*) FROM post "
+            "WHERE is_published = true AND search_vector @@ to_tsquery('simple', :q)"
+        ), {'q': ts_query}).scalar()
+        return [row[0] for row in rows], total
+
+    def _search_sqlite(self, terms, page, per_page):
+        fts_query = ' '.join(f'"{term}"*' for term in terms)
+        params = {
+            'q': fts_query,
+            'limit': per_page,
+            'offset': (page - 1) * per_page,
+        }
+        rows = self._db.session.execute(self._db.text(
+            "SELECT rowid FROM post_fts WHERE post_fts MATCH :q "
+            f"ORDER BY bm25(post_fts, {TITLE_WEIGHT}, {KEYWORDS_WEIGHT}, {BODY_WEIGHT}) "
+            "LIMIT :limit OFFSET :offset"
+        ), params).all()
+        total = self._db.session.execute(self._db.text(
+            "SELECT count(*) FROM post_fts WHERE post_fts MATCH :q"
+        ), {'q': fts_query}).scalar()
+        return [row[0] for row in rows], total
+
+    def _search_like(self, query, page, per_page):
+        Post = self._model
+        pagination = self._listing_query().filter(
+            Post.is_published == True,
+            (Post.title.contains(query) | Post.content.contains(query) | Post.keywords.contains(query))
+        ).order_by(Post.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
+        return SearchResults(pagination.items, pagination.total, page, per_page)
+
+
+search_engine = SearchEngine()
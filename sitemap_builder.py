@@ -0,0 +1,70 @@
+# sitemap_builder.py
+"""
+Sitemap XML qismlarini oqim (generator) ko'rinishida yaratish.
+Sitemap index va bola sitemap'lar (har biri SITEMAP_CHUNK_SIZE tagacha URL)
+satrlarni bittalab chiqaradi — butun ro'yxat xotiraga yig'ilmaydi.
+"""
+import gzip
+import io
+from xml.sax.saxutils import escape
+from conditional_get import to_http_datetime
+
+SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+
+
+def format_lastmod(value):
+    """W3C datetime (UTC) yoki None"""
+    value = to_http_datetime(value)
+    if value is None:
+        return None
+    return value.strftime('%Y-%m-%dT%H:%M:%S+00:00')
+
+
+def url_entry(loc, lastmod=None, changefreq=None, priority=None):
+    """Bitta <url> elementi"""
+    parts = [f'  <url>\n    <loc>{escape(loc)}</loc>\n']
+    lastmod = format_lastmod(lastmod)
+    if lastmod:
+        parts.append(f'    <lastmod>{lastmod}</lastmod>\n')
+    if changefreq:
+        parts.append(f'    <changefreq>{changefreq}</changefreq>\n')
+    if priority:
+        parts.append(f'    <priority>{priority}</priority>\n')
+    parts.append('  </url>\n')
+    return ''.join(parts)
+
+
+def iter_urlset(entries):
+    """<urlset> hujjatini qism-qism chiqarish. entries — url_entry() satrlari"""
+    yield XML_HEADER
+    yield f'<urlset xmlns="{SITEMAP_NS}">\n'
+    for entry in entries:
+        yield entry
+    yield '</urlset>\n'
+
+
+def iter_sitemap_index(children):
+    """<sitemapindex> hujjati. children — (loc, lastmod) juftliklari"""
+    yield XML_HEADER
+    yield f'<sitemapindex xmlns="{SITEMAP_NS}">\n'
+    for loc, lastmod in children:
+        lastmod = format_lastmod(lastmod)
+        yield f'  <sitemap>\n    <loc>{escape(loc)}</loc>\n'
+        if lastmod:
+            yield f'    <lastmod>{lastmod}</lastmod>\n'
+        yield '  </sitemap>\n'
+    yield '</sitemapindex>\n'
+
+
+def gzip_chunks(chunks, compresslevel=6):
+    """Satr qismlarini gzip oqimiga yozib, siqilgan baytlarni tayyor bo'lishi bilan qaytarish"""
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=compresslevel, mtime=0) as gz:
+        for chunk in chunks:
+            gz.write(chunk.encode('utf-8'))
+            if buffer.tell():
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+    yield buffer.getvalue()
@@ -0,0 +1,211 @@
+# structured_output.py
+"""
+AI'dan JSON javob olish: vazifalar bo'yicha sxemalar va bardoshli ajratib olish.
+- SCHEMAS — har bir vazifa uchun javob sxemasi (response_mime_type="application/json"
+  va response_schema sifatida SDK'ga beriladi)
+- extract_json() — ```json``` bloklari, oldi/orqasidagi matn, satr ichidagi xom
+  yangi qatorlar, ortiqcha vergullar va uzilib qolgan (max_output_tokens) javoblarni
+  bitta o'tishda tiklaydi; uzilgan javobdan faqat to'liq tugagan maydonlar olinadi
+- Vazifalar bo'yicha parse natijalari statistikasi (json_stats)
+"""
+import json
+import re
+import threading
+
+SCHEMAS = {
+    'seo_post': {
+        'type': 'object',
+        'properties': {
+            'title': {'type': 'string'},
+            'keywords': {'type': 'string'},
+            'content': {'type': 'string'},
+        },
+        'required': ['title', 'keywords', 'content'],
+    },
+    'portfolio': {
+        'type': 'object',
+        'properties': {
+            'description': {'type': 'string'},
+            'technologies': {'type': 'string'},
+            'features': {'type': 'string'},
+            'details': {'type': 'string'},
+            'meta_description': {'type': 'string'},
+            'meta_keywords': {'type': 'string'},
+        },
+        'required': ['description', 'technologies', 'features', 'details', 'meta_description', 'meta_keywords'],
+    },
+    'service': {
+        'type': 'object',
+        'properties': {
+            'description': {'type': 'string'},
+            'full_description': {'type': 'string'},
+            'features': {'type': 'array', 'items': {'type': 'string'}},
+            'meta_desc': {'type': 'string'},
+            'icon': {'type': 'string'},
+            'slug': {'type': 'string'},
+        },
+        'required': ['description', 'full_description', 'features', 'meta_desc', 'icon', 'slug'],
+    },
+}
+
+# Natija turlari (statistika uchun)
+OUTCOMES = ('direct', 'extracted', 'repaired', 'model_repaired', 'regenerated', 'failed')
+
+_TRAILING_COMMA = re.compile(r',\s*([}\]])')
+
+
+def schema_for(task):
+    try:
+        return SCHEMAS[task]
+    except KeyError:
+        raise ValueError(f"'{task}' uchun JSON sxemasi yo'q") from None
+
+
+def _scan(text):
+    """
+    Birinchi JSON obyekt/massivni belgima-belgi o'qish.
+    Qaytaradi: (json matni, tiklandimi)
+
+    Uzilgan javobda faqat to'liq tugagan yuqori darajadagi maydonlar qoldiriladi:
+    ochiq satr yoki ichki massiv/obyekt yopib "to'ldirilmaydi" — yarim yozilgan
+    maqola tiklangan javob sifatida qabul qilinmasligi uchun.
+    """
+    start = min((i for i in (text.find('{'), text.find('[')) if i >= 0), default=-1)
+    if start < 0:
+        raise ValueError("Javobda JSON topilmadi")
+    chars = []
+    stack = []
+    in_string = escape = False
+    # Oxirgi xavfsiz kesish nuqtasi: yuqori darajadagi vergul oldi (oldingi maydon to'liq)
+    safe_point = None
+    for ch in text[start:]:
+        if in_string:
+            chars.append(ch)
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in '{[':
+            stack.append('}' if ch == '{' else ']')
+        elif ch in '}]':
+            if not stack or stack[-1] != ch:
+                break
+            stack.pop()
+            chars.append(ch)
+            if not stack:
+                return ''.join(chars), False
+            continue
+        elif ch == ',' and len(stack) == 1:
+            safe_point = len(chars)
+        chars.append(ch)
+
+    if not stack:
+        raise ValueError("JSON tiklab bo'lmadi")
+    # Javob uzilib qolgan (masalan max_output_tokens). Oxirgi qiymat yopilgan bo'lsa
+    # (satr, massiv yoki obyekt) — faqat tashqi qavsni yopamiz
+    root = stack[0]
+    tail = ''.join(chars).rstrip()
+    if not in_string and len(stack) == 1 and tail[-1:] in ('"', ']', '}'):
+        candidate = tail + root
+        try:
+            json.loads(candidate, strict=False)
+            return candidate, True
+        except ValueError:
+            pass
+    # Aks holda oxirgi maydon to'liq emas — uni tashlab yuboramiz
+    if safe_point is None:
+        return ''.join(chars[:1]) + root, True
+    return ''.join(chars[:safe_point]) + root, True
+
+
+def extract_json(text):
+    """
+    AI javobidan JSON ajratib olish.
+
+    Returns:
+        (data, outcome): outcome — 'direct' (to'g'ridan-to'g'ri), 'extracted'
+        (kod bloki/atrofdagi matn/xom yangi qatorlar), 'repaired' (uzilgan yoki
+        ortiqcha vergulli JSON tiklandi)
+
+    Raises:
+        ValueError: JSON tiklab bo'lmadi
+    """
+    if not text or not text.strip():
+        raise ValueError("Bo'sh javob")
+    cleaned = text.strip()
+    try:
+        return json.loads(cleaned), 'direct'
+    except ValueError:
+        pass
+
+    candidate, repaired = _scan(cleaned)
+    # strict=False — satr ichidagi xom yangi qator/tab (markdown kontentda ko'p uchraydi)
+    for attempt in (candidate, _TRAILING_COMMA.sub(r'\1', candidate)):
+        try:
+            data = json.loads(attempt, strict=False)
+        except ValueError:
+            repaired = True
+            continue
+        return data, 'repaired' if repaired else 'extracted'
+    raise ValueError("JSON tiklab bo'lmadi")
+
+
+def validate(task, data):
+    """Sxemadagi majburiy maydonlar mavjud va bo'sh emasligini tekshirish; kamchiliklar ro'yxati"""
+    schema = schema_for(task)
+    if not isinstance(data, dict):
+        return ['<obyekt emas>']
+    problems = []
+    for key in schema.get('required', ()):
+        value = data.get(key)
+        expected = schema['properties'].get(key, {}).get('type')
+        if value in (None, '', []):
+            problems.append(key)
+        elif expected == 'string' and not isinstance(value, str):
+            problems.append(key)
+        elif expected == 'array' and not isinstance(value, list):
+            problems.append(key)
+    return problems
+
+
+class JsonStats:
+    """Vazifalar bo'yicha JSON parse natijalari"""
+
+    def __init__(self):
+        self._counts = {}
+        self._truncated = {}
+        self._lock = threading.Lock()
+
+    def record(self, task, outcome):
+        with self._lock:
+            counts = self._counts.setdefault(task, dict.fromkeys(OUTCOMES, 0))
+            counts[outcome] += 1
+
+    def record_truncated(self, task):
+        """Javob max_output_tokens'da uzildi (tuzatilmaydi, qayta generatsiya qilinadi)"""
+        with self._lock:
+            self._truncated[task] = self._truncated.get(task, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            result = {}
+            for task, counts in self._counts.items():
+                total = sum(counts.values())
+                result[task] = dict(
+                    counts,
+                    total=total,
+                    truncated=self._truncated.get(task, 0),
+                    # Birinchi javob to'g'ridan-to'g'ri parse bo'lmagan ulush
+                    parse_failure_rate=round(1 - counts['direct'] / total, 3) if total else 0.0,
+                    # Tiklash ham, qayta generatsiya ham yordam bermagan ulush
+                    failure_rate=round(counts['failed'] / total, 3) if total else 0.0,
+                )
+            return result
+
+
+json_stats = JsonStats()
@@ -0,0 +1,171 @@
+# suggest_index.py
+"""
+Qidiruv maydoni uchun "yozish paytida" takliflar (search-as-you-type).
+Chop etilgan postlarning sarlavha va kalit so'zlaridan xotirada saralangan
+(token, post_id) massivi quriladi va prefix bo'yicha bisect bilan qidiriladi.
+Bazaga har so'rovda murojaat qilinmaydi. Matn o'zgarsa indeks qayta quriladi,
+ko'rishlar soni (saralash og'irligi) esa alohida, siyrakroq yangilanadi.
+"""
+import bisect
+import threading
+import time
+from sqlalchemy import event, func
+from text_normalizer import tokenize
+
+# Boshqa worker/jarayonlardagi o'zgarishlarni tekshirish oralig'i (soniya)
+SUGGEST_REFRESH_INTERVAL = 60
+# Ko'rishlar sonini (saralash uchun) yangilash oralig'i — indeksni qayta qurmaydi
+SUGGEST_VIEWS_REFRESH_INTERVAL = 600
+SUGGEST_DEFAULT_LIMIT = 8
+SUGGEST_MAX_LIMIT = 20
+
+
+class SuggestIndex:
+    """Sarlavha/kalit so'z tokenlari bo'yicha prefix indeks"""
+
+    def __init__(self):
+        self._db = None
+        self._model = None
+        self._lock = threading.RLock()
+        self._entries = []   # saralangan (token, post_id)
+        self._docs = {}      # post_id -> (title, slug, views)
+        self._tokens = {}    # post_id -> tokenlar (o'chirish uchun)
+        self._signature = None
+        self._checked_at = 0.0
+        self._views_at = 0.0
+        self._built = False
+
+    def init_app(self, app, db, model):
+        """Model o'zgarishlarini kuzatish (indeks birinchi so'rovda quriladi)"""
+        self._db = db
+        self._model = model
+        event.listen(model, 'after_insert', self._after_change)
+        event.listen(model, 'after_update', self._after_change)
+        event.listen(model, 'after_delete', self._after_delete)
+
+    # ---------- Qurish ----------
+
+    @staticmethod
+    def _doc_tokens(title, keywords):
+        tokens = set(tokenize(title))
+        tokens.update(tokenize(keywords))
+        return tokens
+
+    def _signature_query(self):
+        Post = self._model
+        return self._db.session.query(
+            func.count(Post.id),
+            func.max(func.coalesce(Post.updated_at, Post.created_at)),
+            func.max(Post.id),
+        ).filter(Post.is_published == True).one()
+
+    def rebuild(self):
+        """Indeksni bazadan to'liq qurish (faqat kerakli ustunlar o'qiladi)"""
+        Post = self._model
+        rows = self._db.session.query(
+            Post.id, Post.title, Post.slug, Post.keywords, Post.views
+        ).filter(Post.is_published == True).all()
+
+        entries, docs, tokens_by_post = [], {}, {}
+        for post_id, title, slug, keywords, views in rows:
+            tokens = self._doc_tokens(title, keywords)
+            docs[post_id] = (title, slug, views or 0)
+            tokens_by_post[post_id] = tokens
+            entries.extend((token, post_id) for token in tokens)
+        entries.sort()
+
+        with self._lock:
+            self._entries, self._docs, self._tokens = entries, docs, tokens_by_post
+            self._signature = tuple(self._signature_query())
+            self._checked_at = self._views_at = time.monotonic()
+            self._built = True
+        return len(docs)
+
+    def refresh_views(self):
+        """Faqat ko'rishlar sonini yangilash (ViewCounter flush'lari indeksni qayta qurdirmaydi)"""
+        Post = self._model
+        rows = self._db.session.query(Post.id, Post.views).filter(Post.is_published == True).all()
+        with self._lock:
+            for post_id, views in rows:
+                doc = self._docs.get(post_id)
+                if doc is not None:
+                    self._docs[post_id] = (doc[0], doc[1], views or 0)
+            self._views_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        if not self._built:
+            self.rebuild()
+            return
+        if time.monotonic() - self._checked_at < SUGGEST_REFRESH_INTERVAL:
+            return
+        signature = tuple(self._signature_query())
+        with self._lock:
+            self._checked_at = time.monotonic()
+            stale = signature != self._signature
+        if stale:
+            self.rebuild()
+        elif time.monotonic() - self._views_at >= SUGGEST_VIEWS_REFRESH_INTERVAL:
+            self.refresh_views()
+
+    # ---------- Inkremental yangilash ----------
+
+    def _remove(self, post_id):
+        for token in self._tokens.pop(post_id, ()):
+            i = bisect.bisect_left(self._entries, (token, post_id))
+            if i < len(self._entries) and self._entries[i] == (token, post_id):
+                del self._entries[i]
+        self._docs.pop(post_id, None)
+
+    def _after_change(self, mapper, connection, target):
+        if not self._built:
+            return
+        with self._lock:
+            self._remove(target.id)
+            if target.is_published:
+                tokens = self._doc_tokens(target.title, target.keywords)
+                self._tokens[target.id] = tokens
+                self._docs[target.id] = (target.title, target.slug, target.views or 0)
+                for token in tokens:
+                    bisect.insort(self._entries, (token, target.id))
+
+    def _after_delete(self, mapper, connection, target):
+        if not self._built:
+            return
+        with self._lock:
+            self._remove(target.id)
+
+    # ---------- Qidiruv ----------
+
+    def _ids_with_prefix(self, prefix):
+        """Prefix bilan boshlanadigan tokenlar oralig'i ikki bisect bilan — nusxa olinmaydi"""
+        entries = self._entries
+        start = bisect.bisect_left(entries, (prefix,))
+        end = bisect.bisect_left(entries, (prefix + chr(0x10FFFF),), start)
+        return {entries[i][1] for i in range(start, end)}
+
+    def suggest(self, query, limit=SUGGEST_DEFAULT_LIMIT):
+        """Prefix bo'yicha takliflar, ko'rishlar soni bo'yicha tartiblangan"""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        self._ensure_fresh()
+        limit = max(1, min(limit, SUGGEST_MAX_LIMIT))
+
+        with self._lock:
+            # Oxirgi so'z — prefix, oldingilari ham prefix (yozish davom etmoqda)
+            candidates = None
+            for term in terms:
+                ids = self._ids_with_prefix(term)
+                candidates = ids if candidates is None else candidates & ids
+                if not candidates:
+                    return []
+            docs = [(post_id, self._docs[post_id]) for post_id in candidates if post_id in self._docs]
+
+        docs.sort(key=lambda item: item[1][2], reverse=True)
+        return [
+            {'id': post_id, 'title': title, 'slug': slug, 'views': views}
+            for post_id, (title, slug, views) in docs[:limit]
+        ]
+
+
+suggest_index = SuggestIndex()
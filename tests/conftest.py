@@ -0,0 +1,6 @@
+# tests/conftest.py
+"""Testlar uchun umumiy sozlama: loyiha ildizi import yo'lida"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
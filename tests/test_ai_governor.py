@@ -0,0 +1,147 @@
+# tests/test_ai_governor.py
+"""AIGovernor: qabul qilish, rad etish va ustuvorlik tartibi"""
+import threading
+import time
+
+import pytest
+
+from ai_governor import AIGovernor, AIOverloaded
+
+
+def make_governor(concurrency=1, class_limits=None, queue_limits=None, deadlines=None, chat_reserved=0):
+    return AIGovernor(
+        concurrency=concurrency,
+        class_limits=class_limits or {},
+        queue_limits=queue_limits or {'chat': 2, 'admin': 2, 'background': 2},
+        deadlines=deadlines or {'chat': 10, 'admin': 10, 'background': 10},
+        chat_reserved=chat_reserved,
+    )
+
+
+def wait_queued(governor, priority, count, timeout=2.0):
+    """Oqim navbatga tushguncha kutish"""
+    until = time.monotonic() + timeout
+    while governor.stats()['classes'][priority]['queued'] < count:
+        assert time.monotonic() < until, "oqim navbatga tushmadi"
+        time.sleep(0.01)
+
+
+def hold_slot(governor, priority, order=None):
+    with governor.slot(priority):
+        if order is not None:
+            order.append(priority)
+
+
+def test_admits_while_capacity_is_free():
+    governor = make_governor(concurrency=2)
+    governor.acquire('background')
+    governor.acquire('chat')
+    stats = governor.stats()
+    assert stats['running'] == 2
+    assert stats['classes']['chat']['admitted'] == 1
+    governor.release('chat', 0.1)
+    governor.release('background', 0.1)
+    assert governor.stats()['running'] == 0
+
+
+def test_unknown_priority():
+    with pytest.raises(ValueError):
+        make_governor().acquire('bulk')
+
+
+def test_rejects_when_wait_exceeds_deadline():
+    governor = make_governor(deadlines={'chat': 1, 'admin': 10, 'background': 10})
+    governor.acquire('background')
+    with pytest.raises(AIOverloaded) as error:
+        governor.acquire('chat')
+    # O'lchov yo'q — standart xizmat vaqti (5s) bo'yicha baho
+    assert error.value.retry_after == 5
+    assert error.value.reason == "kutish muddati yetmaydi"
+    assert governor.stats()['classes']['chat']['rejected'] == 1
+
+
+def test_rejects_when_queue_is_full():
+    governor = make_governor(queue_limits={'chat': 1, 'admin': 1, 'background': 1})
+    governor.acquire('background')
+    waiter = threading.Thread(target=hold_slot, args=(governor, 'background'))
+    waiter.start()
+    wait_queued(governor, 'background', 1)
+    with pytest.raises(AIOverloaded) as error:
+        governor.acquire('background')
+    assert error.value.reason == "navbat to'la"
+    governor.release('background', 0.1)
+    waiter.join(2)
+    assert not waiter.is_alive()
+    assert governor.stats()['classes']['background']['admitted'] == 2
+
+
+def test_slow_background_does_not_inflate_chat_estimate():
+    governor = make_governor(
+        concurrency=2, class_limits={'background': 1},
+        deadlines={'chat': 1, 'admin': 10, 'background': 600},
+    )
+    # Uzun fon chaqiruvlari o'rtacha vaqtni oshiradi
+    governor.acquire('background')
+    governor.release('background', 120.0)
+    governor.acquire('background')
+    with governor.slot('chat'):
+        assert governor.stats()['classes']['chat']['running'] == 1
+    governor.release('background', 120.0)
+
+
+def test_freed_slot_goes_to_higher_priority_first():
+    governor = make_governor()
+    governor.acquire('background')
+    order = []
+    background = threading.Thread(target=hold_slot, args=(governor, 'background', order))
+    background.start()
+    wait_queued(governor, 'background', 1)
+    chat = threading.Thread(target=hold_slot, args=(governor, 'chat', order))
+    chat.start()
+    wait_queued(governor, 'chat', 1)
+
+    governor.release('background', 0.1)
+    background.join(2)
+    chat.join(2)
+    assert order == ['chat', 'background']
+
+
+def test_chat_keeps_reserved_slot():
+    governor = make_governor(
+        concurrency=4, class_limits={'admin': 2, 'background': 2}, chat_reserved=1,
+        deadlines={'chat': 5, 'admin': 10, 'background': 10},
+    )
+    governor.acquire('admin')
+    governor.acquire('admin')
+    governor.acquire('background')
+    # Admin va fon birgalikda 3 joydan oshmaydi — to'rtinchisi chat uchun
+    waiter = threading.Thread(target=hold_slot, args=(governor, 'background'))
+    waiter.start()
+    wait_queued(governor, 'background', 1)
+    with governor.slot('chat'):
+        assert governor.stats()['running'] == 4
+    governor.release('background', 0.1)
+    waiter.join(2)
+    assert not waiter.is_alive()
+
+
+def test_reservation_leaves_room_for_other_classes():
+    governor = make_governor(concurrency=1, chat_reserved=1)
+    assert governor.chat_reserved == 0
+    with governor.slot('background'):
+        assert governor.stats()['running'] == 1
+
+
+def test_estimate_includes_remaining_time_of_running_calls():
+    governor = make_governor(
+        concurrency=2, class_limits={'chat': 1}, deadlines={'chat': 5, 'admin': 10, 'background': 600},
+    )
+    governor.acquire('chat')
+    governor.release('chat', 40.0)
+    started = governor.acquire('chat')
+    # Navbat bo'sh, lekin yagona chat joyi ~40s band — kuttirmasdan rad etiladi
+    with pytest.raises(AIOverloaded) as error:
+        governor.acquire('chat')
+    assert error.value.retry_after >= 39
+    assert error.value.reason == "kutish muddati yetmaydi"
+    governor.release('chat', 0.1, started)
@@ -0,0 +1,92 @@
+# tests/test_circuit_breaker.py
+"""CircuitBreaker holat o'tishlari: closed → open → half-open → closed/open"""
+import pytest
+
+import gemini_pool
+from config import AI_QUOTA_BACKOFF
+from gemini_pool import CircuitBreaker
+
+
+class Clock:
+    """time moduli o'rniga boshqariladigan soat"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(gemini_pool, 'time', clock)
+    return clock
+
+
+def test_opens_after_threshold(clock):
+    breaker = CircuitBreaker(failures=3, recovery=30, max_recovery=600)
+    assert breaker.record_failure() == 0
+    assert breaker.record_failure() == 0
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.record_failure() == 30
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.remaining() == 30
+
+
+def test_half_open_allows_single_probe(clock):
+    breaker = CircuitBreaker(failures=1, recovery=30, max_recovery=600)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    breaker.on_dispatch()
+    assert not breaker.allow()
+    breaker.release_probe()
+    assert breaker.allow()
+
+
+def test_probe_success_closes(clock):
+    breaker = CircuitBreaker(failures=1, recovery=30, max_recovery=600)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.on_dispatch()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+    # Muvaffaqiyatdan keyin kutish yana boshlang'ich qiymatdan
+    assert breaker.record_failure() == 30
+
+
+def test_probe_failure_reopens_with_doubled_delay(clock):
+    breaker = CircuitBreaker(failures=3, recovery=30, max_recovery=100)
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.on_dispatch()
+    assert breaker.record_failure() == 60
+    assert breaker.state == CircuitBreaker.OPEN
+    clock.now += 60
+    assert breaker.allow()
+    breaker.on_dispatch()
+    # max_recovery bilan cheklanadi
+    assert breaker.record_failure() == 100
+
+
+def test_quota_error_opens_immediately(clock):
+    breaker = CircuitBreaker(failures=3, recovery=30, max_recovery=10 * AI_QUOTA_BACKOFF)
+    assert breaker.record_failure(quota=True) == AI_QUOTA_BACKOFF
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_hold_open_keeps_later_deadline(clock):
+    breaker = CircuitBreaker(failures=1, recovery=30, max_recovery=600)
+    breaker.hold_open(120)
+    assert breaker.state == CircuitBreaker.OPEN
+    breaker.hold_open(10)
+    assert breaker.remaining() == 120
+    clock.now += 120
+    assert breaker.state == CircuitBreaker.HALF_OPEN
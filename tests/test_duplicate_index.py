@@ -0,0 +1,44 @@
+# tests/test_duplicate_index.py
+"""MinHash imzolari va Jaccard bahosi"""
+from config import DUPLICATE_NUM_PERM, DUPLICATE_THRESHOLD
+from duplicate_index import decode_signature, encode_signature, minhash, shingles, similarity
+
+ARTICLE = (
+    "Sun'iy intellekt biznesda: mijozlarga xizmat ko'rsatish, savdo tahlili va marketingni "
+    "avtomatlashtirish. Kichik kompaniyalar ham chatbotlar yordamida xarajatlarni kamaytiradi, "
+    "javob vaqtini qisqartiradi va mijozlar ehtiyojini chuqurroq tushunadi."
+)
+OTHER = (
+    "Python dasturlash tilida ro'yxatlar, lug'atlar va to'plamlar bilan ishlash. Har bir "
+    "ma'lumot tuzilmasining murakkabligi, afzalliklari va qachon qaysi birini tanlash kerakligi."
+)
+
+
+def test_identical_texts():
+    assert similarity(minhash('Sarlavha', ARTICLE), minhash('Sarlavha', ARTICLE)) == 1.0
+
+
+def test_unrelated_texts():
+    assert similarity(minhash('AI', ARTICLE), minhash('Python', OTHER)) < 0.1
+
+
+def test_near_duplicate_exceeds_threshold():
+    edited = ARTICLE.replace("Kichik kompaniyalar", "Hatto kichik kompaniyalar")
+    assert similarity(minhash('AI biznesda', ARTICLE), minhash('AI biznesda', edited)) >= DUPLICATE_THRESHOLD
+
+
+def test_signature_length_and_empty_text():
+    assert len(minhash('', '')) == DUPLICATE_NUM_PERM
+    assert shingles('', '') == set()
+    assert shingles('bir ikki', '') and len(shingles('bir ikki', '')) == 1
+
+
+def test_signature_roundtrip():
+    signature = minhash('Sarlavha', ARTICLE)
+    assert decode_signature(encode_signature(signature)) == signature
+
+
+def test_decode_rejects_bad_values():
+    assert decode_signature(None) is None
+    assert decode_signature('!!!') is None
+    assert decode_signature(encode_signature(minhash('a', 'b c d')[:4])) is None
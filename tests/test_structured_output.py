@@ -0,0 +1,66 @@
+# tests/test_structured_output.py
+"""extract_json: kod bloklari, atrofdagi matn, vergullar va uzilgan javoblar"""
+import pytest
+
+from structured_output import extract_json, validate
+
+
+def test_direct():
+    assert extract_json('{"title": "A"}') == ({'title': 'A'}, 'direct')
+
+
+def test_code_fence_and_surrounding_text():
+    text = 'Mana javob:\n```json\n{"title": "A", "tags": [1, 2]}\n```\nYana savol bormi?'
+    assert extract_json(text) == ({'title': 'A', 'tags': [1, 2]}, 'extracted')
+
+
+def test_raw_newline_inside_string():
+    data, outcome = extract_json('```json\n{"content": "1-qator\n2-qator"}\n```')
+    assert data == {'content': '1-qator\n2-qator'}
+    assert outcome == 'extracted'
+
+
+def test_trailing_comma():
+    assert extract_json('{"a": [1, 2,], "b": 3,}') == ({'a': [1, 2], 'b': 3}, 'repaired')
+
+
+def test_braces_inside_strings():
+    data, _ = extract_json('Javob: {"content": "kod: } ] {", "title": "A"} tamom')
+    assert data == {'content': 'kod: } ] {', 'title': 'A'}
+
+
+def test_truncated_after_complete_value_closes_root():
+    data, outcome = extract_json('{"title": "A", "keywords": "k"')
+    assert data == {'title': 'A', 'keywords': 'k'}
+    assert outcome == 'repaired'
+
+
+def test_truncated_string_drops_partial_field():
+    text = '{"title": "A", "keywords": "k", "content": "Bu maqola yarmida uzil'
+    data, outcome = extract_json(text)
+    assert data == {'title': 'A', 'keywords': 'k'}
+    assert outcome == 'repaired'
+    # Yarim maqola qabul qilinmaydi — qayta generatsiya kerak
+    assert validate('seo_post', data) == ['content']
+
+
+def test_truncated_nested_value_is_not_completed():
+    data, _ = extract_json('{"description": "d", "features": ["bir", "ikk')
+    assert data == {'description': 'd'}
+
+
+def test_truncated_first_field():
+    assert extract_json('{"content": "uzil')[0] == {}
+
+
+@pytest.mark.parametrize('text', ['', '   ', 'JSON yo\'q'])
+def test_no_json(text):
+    with pytest.raises(ValueError):
+        extract_json(text)
+
+
+def test_validate_types():
+    data = {'description': 'd', 'full_description': 'f', 'features': 'bitta',
+            'meta_desc': 'm', 'icon': 'i', 'slug': ''}
+    assert validate('service', data) == ['features', 'slug']
+    assert validate('service', []) == ['<obyekt emas>']
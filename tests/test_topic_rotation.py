@@ -0,0 +1,120 @@
+# tests/test_topic_rotation.py
+"""TopicRotation.pick: og'irlikli LRU tartibi va kunlik kategoriya kvotasi"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+
+from topic_rotation import TopicRotation
+
+db = SQLAlchemy()
+
+
+class Topic(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(300), unique=True, nullable=False)
+    category = db.Column(db.String(50), nullable=True)
+    weight = db.Column(db.Float, default=1.0, nullable=False)
+    usage_count = db.Column(db.Integer, default=0, nullable=False)
+    last_used_at = db.Column(db.DateTime, nullable=True)
+    is_active = db.Column(db.Boolean, default=True, nullable=False)
+
+
+class Post(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    category = db.Column(db.String(50))
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'topics.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+def add_topics(*topics):
+    db.session.add_all([Topic(**topic) for topic in topics])
+    db.session.commit()
+
+
+def make_rotation(app, quota=2):
+    rotation = TopicRotation(interval=3600, quota=quota)
+    rotation.init_app(app, db, Topic, post_model=Post)
+    return rotation
+
+
+def titles(rotation, count, category=None):
+    return [rotation.pick(category).title for _ in range(count)]
+
+
+def test_never_used_first_then_least_recent(app):
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    add_topics(
+        {'title': 'eski', 'last_used_at': now - timedelta(hours=5)},
+        {'title': 'yangi', 'last_used_at': now - timedelta(hours=2)},
+        {'title': 'ishlatilmagan'},
+    )
+    assert titles(make_rotation(app), 3) == ['ishlatilmagan', 'eski', 'yangi']
+
+
+def test_weight_brings_topic_forward(app):
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    add_topics(
+        {'title': 'oddiy', 'last_used_at': now - timedelta(minutes=40)},
+        # 4x og'irlik — navbat interval/4 dan keyin keladi (oddiy'dan keyin ishlatilgan bo'lsa ham)
+        {'title': 'muhim', 'last_used_at': now - timedelta(minutes=30), 'weight': 4.0},
+    )
+    assert titles(make_rotation(app), 1) == ['muhim']
+
+
+def test_pick_updates_usage(app):
+    add_topics({'title': 'bitta'})
+    picked = make_rotation(app).pick()
+    topic = db.session.get(Topic, picked.id)
+    assert topic.usage_count == 1
+    assert topic.last_used_at is not None
+
+
+def test_category_quota(app):
+    add_topics(
+        {'title': 'A1', 'category': 'A'},
+        {'title': 'A2', 'category': 'A'},
+        {'title': 'B1', 'category': 'B'},
+    )
+    rotation = make_rotation(app, quota=1)
+    # A kvotasi to'ldi → B; hammasi to'lgach kvotasiz eng erta navbat
+    assert titles(rotation, 3) == ['A1', 'B1', 'A2']
+    assert rotation.stats()['categories']['A']['used_today'] == 2
+
+
+def test_repeated_topic_counts_against_quota(app):
+    add_topics({'title': 'A1', 'category': 'A'}, {'title': 'B1', 'category': 'B'})
+    rotation = make_rotation(app, quota=2)
+    assert titles(rotation, 4) == ['A1', 'B1', 'A1', 'B1']
+    used = rotation.stats()['categories']
+    assert used['A']['used_today'] == 2
+    assert used['B']['used_today'] == 2
+
+
+def test_todays_posts_count_against_quota(app):
+    add_topics({'title': 'A1', 'category': 'A'}, {'title': 'B1', 'category': 'B'})
+    db.session.add(Post(category='A'))
+    db.session.commit()
+    assert titles(make_rotation(app, quota=1), 1) == ['B1']
+
+
+def test_explicit_category_ignores_quota(app):
+    add_topics({'title': 'A1', 'category': 'A'}, {'title': 'B1', 'category': 'B'})
+    db.session.add(Post(category='A'))
+    db.session.commit()
+    assert titles(make_rotation(app, quota=1), 2, category='A') == ['A1', 'A1']
+
+
+def test_empty_table(app):
+    assert make_rotation(app).pick() is None
@@ -0,0 +1,121 @@
+# text_normalizer.py
+"""
+O'zbek tili uchun matn normalizatsiyasi va tokenizatsiyasi.
+Qidiruv indeksi, qidiruv so'rovlari, slug yaratish va mavzularni
+takrorlanishdan tozalash shu modul orqali ishlaydi.
+"""
+import re
+
+# Tutuq belgisi variantlari: o' o‘ oʻ o’ g` g´ ...
+APOSTROPHES = "'‘’ʻʼ`´′"
+
+# Kirill -> Lotin (scripts/generate_slugs.py dagi xarita asosida)
+_CYRILLIC_TO_LATIN = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'yo',
+    'ж': 'j', 'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm',
+    'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
+    'ф': 'f', 'х': 'x', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sch',
+    'ъ': "'", 'ы': 'i', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+    'ў': "o'", 'қ': 'q', 'ғ': "g'", 'ҳ': 'h',
+}
+
+
+def _build_translit_table():
+    table = {}
+    for cyr, lat in _CYRILLIC_TO_LATIN.items():
+        table[ord(cyr)] = lat
+        table[ord(cyr.upper())] = lat.capitalize() if lat[:1].isalpha() else lat
+    return table
+
+
+# Bitta str.translate jadvali: kirill harflar + tutuq belgilarini ASCII ' ga
+TRANSLIT_TABLE = _build_translit_table()
+TRANSLIT_TABLE.update({ord(ch): "'" for ch in APOSTROPHES if ch != "'"})
+
+# Qidiruv shakli uchun: kirill harflar + barcha tutuq belgilari olib tashlanadi
+SEARCH_TABLE = {code: value.replace("'", '') for code, value in TRANSLIT_TABLE.items()}
+SEARCH_TABLE[ord("'")] = ''
+
+# Yengil stemming uchun qo'shimchalar (uzunidan qisqasiga)
+SUFFIXES = (
+    'larning', 'laridan', 'larida', 'lariga', 'larini', 'lardan', 'larda', 'larga', 'larni',
+    'lari', 'lar', 'ning', 'dagi', 'gacha', 'dan', 'tan', 'ga', 'ka', 'qa', 'da', 'ta', 'ni',
+)
+MIN_STEM_LENGTH = 3
+MAX_SUFFIX_STRIPS = 2
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+_WORD_RE = re.compile(r"[\w" + APOSTROPHES + r"]+", re.UNICODE)
+
+
+def transliterate(text):
+    """Kirill matnni lotinga o'girish, tutuq belgilarini ' ga keltirish"""
+    return (text or '').translate(TRANSLIT_TABLE)
+
+
+def normalize(text):
+    """Qidiruv shakli: kichik harf, lotin, tutuq belgilarisiz (o'zbek -> ozbek)"""
+    return (text or '').translate(SEARCH_TABLE).lower()
+
+
+def stem(token):
+    """Yengil o'zbekcha suffix stemming (botlarda -> bot)"""
+    for _ in range(MAX_SUFFIX_STRIPS):
+        for suffix in SUFFIXES:
+            if token.endswith(suffix) and len(token) - len(suffix) >= MIN_STEM_LENGTH:
+                token = token[:-len(suffix)]
+                break
+        else:
+            break
+    return token
+
+
+def tokenize(text):
+    """Normalizatsiya qilingan tokenlar ro'yxati"""
+    return _TOKEN_RE.findall(normalize(text))
+
+
+def query_terms(text):
+    """Qidiruv so'rovidan takrorlanmas stem'lar (tartib saqlanadi)"""
+    terms = []
+    for token in tokenize(text):
+        term = stem(token)
+        if term and term not in terms:
+            terms.append(term)
+    return terms
+
+
+def index_text(text):
+    """Indekslash uchun matn (so'zlar orasidagi bo'shliqlar saqlanadi)"""
+    return normalize(text)
+
+
+def iter_words(text):
+    """Asl matndagi so'zlar va ularning qidiruv shakli: (start, end, normalized)"""
+    for match in _WORD_RE.finditer(text or ''):
+        yield match.start(), match.end(), normalize(match.group(0))
+
+
+def slugify(text):
+    """URL uchun slug (o'zbek-bot-yaratish)"""
+    slug = normalize(text)
+    slug = re.sub(r'[^a-z0-9\s-]', '', slug)
+    slug = re.sub(r'[-\s_]+', '-', slug)
+    return slug.strip('-')
+
+
+def topic_key(text):
+    """Mavzularni solishtirish kaliti: tartiblangan stem'lar to'plami"""
+    return ' '.join(sorted(set(stem(token) for token in tokenize(text))))
+
+
+def unique_topics(topics):
+    """Mavzular ro'yxatidan normalizatsiya bo'yicha takrorlanganlarini olib tashlash"""
+    seen = set()
+    result = []
+    for topic in topics:
+        key = topic_key(topic)
+        if key and key not in seen:
+            seen.add(key)
+            result.append(topic)
+    return result
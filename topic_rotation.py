@@ -0,0 +1,237 @@
+# topic_rotation.py
+"""
+Mavzularni navbat bilan tanlash (random.choice o'rniga).
+- Mavzular bazada (topic jadvali): foydalanish soni va oxirgi ishlatilgan vaqt
+- Og'irlikli LRU: mavzuning "navbati" = last_used + TOPIC_ROTATION_INTERVAL / weight,
+  eng erta navbatdagisi tanlanadi (hech ishlatilmaganlar birinchi)
+- Har bir kategoriya uchun alohida min-heap: tanlash va qayta qo'yish O(log n)
+- Kunlik kategoriya kvotasi (TOPIC_CATEGORY_DAILY_QUOTA) — bir kategoriya ustun kelmasin.
+  Hisoblagichlar heap'lar yonida saqlanadi: _load'da bugungi postlardan olinadi,
+  muvaffaqiyatli band qilishda oshiriladi (tanlovda so'rov yo'q)
+- Bir nechta jarayon: tanlov bazada shartli UPDATE bilan band qilinadi
+"""
+import heapq
+import threading
+import time
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+from sqlalchemy.exc import IntegrityError
+from config import (
+    TIMEZONE, TOPIC_ROTATION_INTERVAL, TOPIC_CATEGORY_DAILY_QUOTA, TOPIC_REFRESH_INTERVAL
+)
+
+# Bo'sh kategoriyali mavzular heap kaliti
+_NO_CATEGORY = ''
+# Boshqa jarayon band qilib qo'ygan bo'lsa, shuncha marta qayta urinish
+_MAX_CLAIM_ATTEMPTS = 5
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class PickedTopic:
+    """Tanlangan mavzu"""
+
+    def __init__(self, topic_id, title, category):
+        self.id = topic_id
+        self.title = title
+        self.category = category
+
+    def __repr__(self):
+        return f'<PickedTopic {self.title}>'
+
+
+class TopicRotation:
+    """Kategoriyalar bo'yicha heap'lar ustidagi og'irlikli LRU tanlovchi"""
+
+    def __init__(self, interval=TOPIC_ROTATION_INTERVAL, quota=TOPIC_CATEGORY_DAILY_QUOTA):
+        self.interval = interval
+        self.quota = quota
+        self._lock = threading.Lock()
+        self._heaps = {}        # kategoriya -> [(navbat, usage_count, id)]
+        self._current = {}      # id -> (navbat, usage_count, kategoriya, sarlavha)
+        self._used = {}         # kategoriya -> bugungi postlar soni
+        self._day = None
+        self._loaded_at = 0.0
+        self._seed = ()
+        self._db = None
+        self._model = None
+        self._post_model = None
+
+    def init_app(self, app, db, model, post_model=None, seed=()):
+        """
+        Topic modeli bilan bog'lash. post_model — kunlik kvota hisoblanadigan postlar
+        (category, created_at); seed — (kategoriya, sarlavha) juftliklari (jadval bo'sh bo'lsa)
+        """
+        self._db = db
+        self._model = model
+        self._post_model = post_model
+        self._seed = tuple(seed)
+
+    # ---------- Navbat ----------
+
+    def _due(self, last_used_at, weight):
+        last_used = last_used_at.replace(tzinfo=timezone.utc).timestamp() if last_used_at else 0.0
+        return last_used + self.interval / max(weight or 1.0, 0.01)
+
+    def _put(self, topic_id, title, category, weight, usage_count, last_used_at):
+        key = category or _NO_CATEGORY
+        entry = (self._due(last_used_at, weight), usage_count or 0, topic_id)
+        self._current[topic_id] = entry + (key, title, weight)
+        heapq.heappush(self._heaps.setdefault(key, []), entry)
+
+    def _peek(self, key):
+        """Heap tepasidagi amaldagi yozuv (eskirganlari tashlab yuboriladi)"""
+        heap = self._heaps.get(key)
+        while heap:
+            due, usage, topic_id = heap[0]
+            current = self._current.get(topic_id)
+            if current is not None and current[:3] == (due, usage, topic_id):
+                return heap[0]
+            heapq.heappop(heap)
+        return None
+
+    def _load(self):
+        """Faol mavzularni bazadan o'qib heap'larni qurish (heapify — O(n))"""
+        Topic = self._model
+        self._seed_if_empty()
+        rows = self._db.session.query(
+            Topic.id, Topic.title, Topic.category, Topic.weight, Topic.usage_count, Topic.last_used_at
+        ).filter(Topic.is_active == True).all()
+        self._db.session.rollback()
+        self._heaps = {}
+        self._current = {}
+        for topic_id, title, category, weight, usage_count, last_used_at in rows:
+            key = category or _NO_CATEGORY
+            entry = (self._due(last_used_at, weight), usage_count or 0, topic_id)
+            self._current[topic_id] = entry + (key, title, weight)
+            self._heaps.setdefault(key, []).append(entry)
+        for heap in self._heaps.values():
+            heapq.heapify(heap)
+        self._day, self._used = self._usage_today()
+        self._loaded_at = time.monotonic()
+
+    def _seed_if_empty(self):
+        Topic = self._model
+        if not self._seed or self._db.session.query(Topic.id).first() is not None:
+            return
+        try:
+            self._db.session.add_all([Topic(title=title, category=category) for category, title in self._seed])
+            self._db.session.commit()
+            print(f"✅ {len(self._seed)} ta boshlang'ich mavzu bazaga yozildi")
+        except IntegrityError:
+            # Boshqa jarayon allaqachon to'ldirdi
+            self._db.session.rollback()
+
+    def invalidate(self):
+        """Admin o'zgartirganda keyingi tanlovda heap'lar qayta quriladi"""
+        with self._lock:
+            self._loaded_at = 0.0
+
+    # ---------- Tanlash ----------
+
+    @staticmethod
+    def _today():
+        return datetime.now(ZoneInfo(TIMEZONE)).date()
+
+    def _usage_today(self):
+        """
+        Bugun (TIMEZONE bo'yicha) har bir kategoriyada nechta post yaratilgan.
+        Faqat _load'da chaqiriladi — boshqa jarayonlarning postlari ham shu yerda qo'shiladi
+        """
+        day = self._today()
+        Post = self._post_model
+        if Post is None:
+            return day, {}
+        day_start = datetime.combine(day, datetime.min.time(), ZoneInfo(TIMEZONE))
+        day_start = day_start.astimezone(timezone.utc).replace(tzinfo=None)
+        rows = self._db.session.query(Post.category, self._db.func.count(Post.id)).filter(
+            Post.created_at >= day_start
+        ).group_by(Post.category).all()
+        self._db.session.rollback()
+        return day, {category or _NO_CATEGORY: count for category, count in rows}
+
+    def _claim(self, topic_id, usage_count):
+        """Shartli UPDATE — boshqa jarayon shu orada olmagan bo'lsa band qilish"""
+        Topic = self._model
+        now = _utcnow()
+        with self._db.engine.begin() as conn:
+            claimed = conn.execute(
+                self._db.update(Topic)
+                .where(Topic.id == topic_id, Topic.usage_count == usage_count, Topic.is_active == True)
+                .values(usage_count=Topic.usage_count + 1, last_used_at=now)
+            ).rowcount
+        return claimed, now
+
+    def _reload_one(self, topic_id):
+        Topic = self._model
+        row = self._db.session.query(
+            Topic.title, Topic.category, Topic.weight, Topic.usage_count, Topic.last_used_at, Topic.is_active
+        ).filter(Topic.id == topic_id).first()
+        self._db.session.rollback()
+        self._current.pop(topic_id, None)
+        if row is not None and row.is_active:
+            self._put(topic_id, row.title, row.category, row.weight, row.usage_count, row.last_used_at)
+
+    def pick(self, category=None):
+        """
+        Navbatdagi mavzuni tanlab, foydalanilgan deb belgilash. Mavzu bo'lmasa None.
+        category berilsa — faqat shu kategoriyadan (kvota qo'llanilmaydi).
+        """
+        with self._lock:
+            # Yangi kun boshlansa hisoblagichlar ham qayta olinadi
+            if time.monotonic() - self._loaded_at > TOPIC_REFRESH_INTERVAL or self._day != self._today():
+                self._load()
+
+            if category is not None:
+                keys = [category]
+            else:
+                keys = [key for key in self._heaps
+                        if key == _NO_CATEGORY or self._used.get(key, 0) < self.quota]
+                # Hamma kategoriya kvotasini to'ldirgan — kvotasiz tanlaymiz
+                if not keys:
+                    keys = list(self._heaps)
+
+            for _ in range(_MAX_CLAIM_ATTEMPTS):
+                tops = [(top, key) for key in keys for top in (self._peek(key),) if top is not None]
+                if not tops:
+                    return None
+                (due, usage, topic_id), key = min(tops)
+                heapq.heappop(self._heaps[key])
+                _, _, _, _, title, weight = self._current[topic_id]
+                claimed, now = self._claim(topic_id, usage)
+                if claimed:
+                    self._put(topic_id, title, key or None, weight, usage + 1, now)
+                    self._used[key] = self._used.get(key, 0) + 1
+                    return PickedTopic(topic_id, title, key or None)
+                # Boshqa jarayon ishlatgan yoki o'chirilgan — bazadagi holat bilan qayta qo'yamiz
+                self._reload_one(topic_id)
+            return None
+
+    def record(self, title):
+        """Qo'lda berilgan mavzu ishlatilganini qayd etish (jadvalda bo'lsa)"""
+        Topic = self._model
+        with self._db.engine.begin() as conn:
+            updated = conn.execute(
+                self._db.update(Topic).where(Topic.title == title)
+                .values(usage_count=Topic.usage_count + 1, last_used_at=_utcnow())
+            ).rowcount
+        if updated:
+            self.invalidate()
+        return bool(updated)
+
+    def stats(self):
+        """Kategoriyalar bo'yicha faol mavzular va bugungi foydalanish"""
+        with self._lock:
+            sizes = {key: sum(1 for entry in self._current.values() if entry[3] == key)
+                     for key in self._heaps}
+            used = dict(self._used) if self._day == self._today() else {}
+        return {
+            'quota': self.quota,
+            'categories': {key or None: {'topics': count, 'used_today': used.get(key, 0)}
+                           for key, count in sizes.items()},
+        }
+
+
+topic_rotation = TopicRotation()
@@ -0,0 +1,110 @@
+# view_counter.py
+"""
+Post ko'rishlar sonini xotirada yig'ib, bazaga partiya (batch) qilib yozish.
+Sahifa ochilganda UPDATE+COMMIT qilinmaydi — hisoblagichlar har VIEW_FLUSH_INTERVAL
+soniyada va jarayon to'xtaganda bitta atomik UPDATE bilan yoziladi.
+"""
+import atexit
+import os
+import re
+import threading
+from config import VIEW_FLUSH_INTERVAL
+
+# Qidiruv robotlari va texnik so'rovlar — ko'rish sifatida hisoblanmaydi
+CRAWLER_UA_RE = re.compile(
+    r'bot|crawl|spider|slurp|facebookexternalhit|whatsapp|preview|'
+    r'monitor|pingdom|uptime|lighthouse|headless|curl|wget|python-requests|httpx|go-http-client',
+    re.IGNORECASE
+)
+
+
+def is_crawler(user_agent):
+    """User-Agent robotga tegishli ekanini tekshirish"""
+    if not user_agent:
+        return True
+    return bool(CRAWLER_UA_RE.search(user_agent))
+
+
+class ViewCounter:
+    """Post ID bo'yicha ko'rishlarni birlashtiruvchi write-behind hisoblagich"""
+
+    def __init__(self, flush_interval=VIEW_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._app = None
+        self._db = None
+
+    def init_app(self, app, db):
+        """Flask ilova va SQLAlchemy bilan bog'lash"""
+        self._app = app
+        self._db = db
+        atexit.register(self.shutdown)
+
+    def record(self, post_id, user_agent=None):
+        """Bitta ko'rishni xotiraga yozish (bazaga murojaat qilinmaydi)"""
+        if is_crawler(user_agent):
+            return False
+        with self._lock:
+            self._pending[post_id] = self._pending.get(post_id, 0) + 1
+        self._ensure_worker()
+        return True
+
+    def pending(self, post_id=None):
+        """Hali bazaga yozilmagan ko'rishlar"""
+        with self._lock:
+            if post_id is None:
+                return sum(self._pending.values())
+            return self._pending.get(post_id, 0)
+
+    def flush(self):
+        """Yig'ilgan ko'rishlarni bitta tranzaksiyada bazaga yozish"""
+        with self._lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+
+        params = [{'post_id': post_id, 'n': n} for post_id, n in batch.items()]
+        try:
+            with self._app.app_context():
+                with self._db.engine.begin() as conn:
+                    conn.execute(
+                        self._db.text("UPDATE post SET views = COALESCE(views, 0) + :n WHERE id = :post_id"),
+                        params
+                    )
+            return sum(batch.values())
+        except Exception as e:
+            print(f"⚠️ Ko'rishlarni yozishda xato: {e}")
+            # Yo'qotmaslik uchun qaytarib qo'yamiz
+            with self._lock:
+                for post_id, n in batch.items():
+                    self._pending[post_id] = self._pending.get(post_id, 0) + n
+            return 0
+
+    def shutdown(self):
+        """To'xtashda qolgan hisoblagichlarni yozish"""
+        self._stop.set()
+        if self._app is not None:
+            self.flush()
+
+    def _ensure_worker(self):
+        # Gunicorn fork qilganda har bir worker o'z oqimini ishga tushiradi
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='view-counter-flush', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+
+view_counter = ViewCounter()
@@ -0,0 +1,21 @@
+# worker.py
+"""
+TrendoAI scheduler worker — alohida jarayon (Procfile: worker).
+Soatlik post vazifalarini BlockingScheduler bilan yuritadi va fon vazifalari
+navbatini (generate/push/telegram) qayta ishlaydi. Web jarayonlari scheduler
+ishga tushirmaydi.
+"""
+import os
+
+# app import qilinishidan oldin — web'ga xos xizmatlar (webhook) ishga tushmasin
+os.environ["TRENDOAI_PROCESS"] = "worker"
+
+
+def main():
+    from app import app, db
+    from scheduler import run_worker
+    run_worker(app, db)
+
+
+if __name__ == "__main__":
+    main()